@@ -2,57 +2,65 @@
 Basic API for serving the processed graph.
 """
 
-import json
-import pymongo
-import collections
-from typing import Dict, List
+import contextlib
+from typing import AsyncIterator, List
 
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Path, Query
 from fastapi.staticfiles import StaticFiles
 
 # Use this to serve a public/index.html, see https://github.com/tiangolo/fastapi/issues/130
-from starlette.responses import FileResponse
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
 
+import cache
 import config
+import documents
+import index
+import neighbours
+import search
+import store
+import suggest
+import timeline
+import trajectory
+
+# Graph storage, blocking calls are run in a bounded thread pool
+if config.GRAPH_STORE == "file":
+    graph_store = store.create_store("file", path=config.GRAPHS_FILE_PATH, provenance_path=config.PROVENANCE_FILE_PATH)
+else:
+    graph_store = store.create_store("mongo", uri=config.MONGO_URI, database_name=config.DATABASE_NAME,
+                                     max_pool_size=config.MONGO_MAX_POOL_SIZE)
+async_graph_store = store.AsyncGraphStore(graph_store, max_workers=config.GRAPH_STORE_WORKERS)
+
+# Prepared graphs and responses of hot timestamps are held in memory
+graph_cache = cache.GraphCache(graph_store.get_graph,
+                               max_elements=config.GRAPH_CACHE_MAX_ELEMENTS,
+                               max_responses=config.RESPONSE_CACHE_SIZE)
+
+# Set up the query index in a single pass over all graphs, or load it from the snapshot. Run with "gunicorn --preload",
+# the index is built once in the master process and inherited by all forked workers.
+api_index = index.load_or_build(config.API_INDEX_PATH, graph_store.fingerprint(), graph_store.iter_graphs())
+timeline_dates = api_index.timeline_dates
+graph_search = api_index.search
+vis_timeline = timeline.Timeline(timeline_dates, last_modified=api_index.created)
+query_suggestions = suggest.SuggestionIndex(api_index.suggestions)
+
+# Weights of all terms over time, written by the pipeline, optional
+trajectories = trajectory.load_table(config.TRAJECTORY_TABLE_PATH)
+
+# Documents are read from an on-disk index on request, which is (re)built from the indexed documents if necessary. Reads
+# may block as well, and are run in the thread pool of the graph store
+document_store = documents.DocumentStore.load_or_build(config.INDEXED_DOCUMENTS_PATH, config.DOCUMENT_STORE_PATH,
+                                                       cache_size=config.DOCUMENT_CACHE_SIZE)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    yield
+    async_graph_store.shutdown()
 
-# Database input
-dbClient = pymongo.MongoClient("mongodb://localhost:27017/")
-database = dbClient[config.DATABASE_NAME]
-timeline_dates = database.graphs.find().distinct("_id")
-
-# Set up query index
-query_label_to_graphs = collections.defaultdict(set)
-for graph in database.graphs.find({}, {"nodes.label"}):
-    for node in graph["nodes"]:
-        query_label_to_graphs[node["label"].lower()].add(graph["_id"])
-
-index_file = config.INDEXED_DOCUMENTS_PATH
-with open(index_file, "r") as f:
-    docs = json.load(f)
-
-# Generate corresponding wikipedia page urls
-links = {k: (value["url"] if "url" in value.keys() else "https://www.wikipedia.org/") for k, value in docs.items()}
-
-# Generate a list of weighted terms
-query_suggestions = collections.defaultdict(float)
-# Inefficient?
-for timestamp in timeline_dates:
-    graph = database.graphs.find({"_id": timestamp})[0]
-    for node in graph["nodes"]:
-        query_suggestions[node["label"]] += node["value"]
-
-query_suggestions = {k: v for k, v in sorted(query_suggestions.items(), key=lambda item: item[1], reverse=True)}
-
-# Generate article titles
-article_titles = {k: value["article_title"] for k, value in docs.items()}
-section_titles = {k: value["title"] for k, value in docs.items()}
-
-for doc_id, title in article_titles.items():
-    if title == section_titles[doc_id]:
-        section_titles[doc_id] = "Summary"
 
 # API initialization
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.mount("/public", StaticFiles(directory="public"), name="public")
 
 
@@ -99,83 +107,75 @@ async def get_fontawesome_js():
 
 # Timeline getter
 @app.get("/timeline")
-async def get_timeline() -> List:
+async def get_timeline(request: Request, start: str = None, end: str = None, granularity: str = None) -> Response:
     """
     Returns timeline elements according to the desired visjs format
+    @param start: Only return elements from this date on (YYYY[-MM[-DD]])
+    @param end: Only return elements up to this date, including all elements within its period
+    @param granularity: Only return elements of these granularities, any combination of "Y", "M" and "D"
     @return: Dict of vis.js compatible timeline entries
     """
-    # {id: 1, content: 'item 1', start: '2014-04-20'},
-    id_count = 0
-    timestamps = []
-    for timestamp in timeline_dates:
-        # Day granularity
-        if len(timestamp.split("-")) == 3:
-            timestamps.append({"id": id_count, "content": timestamp[5:] + "  ", "start": timestamp,
-                               "type": "point", "group": "D", "title": timestamp})
-        # Month granularity
-        elif len(timestamp.split("-")) == 2:
-            # Discern length of months by even/odd/February
-            if timestamp.split("-")[1] in ("01", "03", "05", "07", "08", "10", "12"):
-                timestamps.append({"id": id_count, "content": timestamp, "group": "M",
-                                   "start": timestamp + "-01", "end": timestamp + "-31",
-                                   "title": timestamp})
-            elif timestamp.split("-")[1] == "02":
-                timestamps.append({"id": id_count, "content": timestamp, "group": "M",
-                                   "start": timestamp + "-01", "end": timestamp + "-28",
-                                   "title": timestamp})
-            else:
-                timestamps.append({"id": id_count, "content": timestamp, "group": "M",
-                                   "start": timestamp + "-01", "end": timestamp + "-30",
-                                   "title": timestamp})
-        # Year granularity
-        else:
-            timestamps.append({"id": id_count, "content": timestamp, "group": "Y",
-                               "start": timestamp + "-01-01", "end": timestamp + "-12-31",
-                               "title": timestamp})
-
-        id_count += 1
-
-    return timestamps
+    return vis_timeline.window(start, end, granularity).response(request)
 
 
 # Network getter
 @app.get("/graphs/{timestamp}")
-async def get_graph(timestamp: str, limit: int = 10) -> Dict:
+async def get_graph(request: Request, timestamp: str, limit: int = 10, format: str = "json") -> Response:
     """
     Returns a network for a given timestamp
     @param timestamp: Formatted as Y2020-M04-D30, or a subset thereof (year-month/year only)
     @param limit: Number of nodes that will be returned
+    @param format: "json" for lists of node and edge objects, "columnar" for one array per node and edge field
     @return:
     """
-    try:
-        # return data[timestamp]
-
-        # Select the top N "heaviest" nodes
-        # nodes = data[timestamp]["nodes"]
-        # [0] since _id is primary key, and hence, only one result can be returned
-        graph = database.graphs.find({"_id": timestamp})[0]
-        nodes = graph["nodes"]
-        # Ignore first node, which is the date itself
-        nodes = sorted(nodes, key=lambda x: x["value"], reverse=True)[:limit]
+    if format not in cache.GRAPH_FORMATS:
+        raise HTTPException(status_code=400, detail="Unknown format: " + format)
+    payload = graph_cache.cached_payload(timestamp, limit, format)
+    if payload is None:
+        # Not cached yet, the graph might need to be fetched from the store
+        payload = await async_graph_store.run(graph_cache.payload, timestamp, limit, format)
+    return payload.response(request)
+
+
+@app.get("/graphs/{timestamp}/neighbourhood/{label}")
+async def get_neighbourhood(timestamp: str, label: str, hops: int = Query(1, ge=0, le=5),
+                            limit: int = Query(50, ge=1)):
+    """
+    Returns the nodes within a number of hops of a node, and all edges between them
+    @param timestamp: Timestamp of the graph
+    @param label: Label of the center node
+    @param hops: Maximal distance of returned nodes to the center node
+    @param limit: Maximal number of nodes that will be returned, heavier neighbours are preferred
+    @return: Nodes with their distance "hops" to the center node, and edges
+    """
+    graph = graph_cache.graphs.get(timestamp)
+    if graph is None:
+        graph = await async_graph_store.run(graph_cache.prepared, timestamp)
+    neighbourhood = graph.neighbourhood(label, hops, limit) if graph is not None else None
+    if neighbourhood is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return neighbourhood
 
-        # Create set so it is easier to search
-        check_nodes_id = set([node["id"] for node in nodes])
-        # Simple O(M + C) iteration to check for valid edges
-        edges = []
 
-        # for edge in data[timestamp]["edges"]:
-        for edge in graph["edges"]:
-            if edge["from"] in check_nodes_id and edge["to"] in check_nodes_id:
-                if edge["from"] != edge["to"]:  # Ignore self-loops
-                    edges.append(edge)
+@app.get("/edges/{edge_id}/provenance")
+async def get_edge_provenance(edge_id: int, offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=1000)):
+    """
+    Returns the co-occurring sentences of an edge, one page at a time
+    @param edge_id: Id of the edge, as returned with the graph
+    @param offset: Number of sentences to skip
+    @param limit: Maximal number of sentences that will be returned
+    @return: Total number of sentences as "count", and the sentences of the page as "sentences"
+    """
+    provenance = await async_graph_store.run(graph_store.get_provenance, edge_id, offset, limit)
+    if provenance is None:
+        raise HTTPException(status_code=404, detail="Edge not found")
+    return {"edge_id": edge_id, "offset": offset, "limit": limit, **provenance}
 
-        return {"nodes": nodes,
-                "edges": edges}
 
-    except KeyError:
-        print("KeyError encountered")
-        return {"nodes": [],
-                "edges": []}
+def _found(value):
+    if value is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return value
 
 
 @app.get("/text/{doc_id}")
@@ -185,7 +185,7 @@ async def get_text(doc_id: int):
     @param doc_id: Value held in indexed_document.json
     @return: Corresponding document content.
     """
-    return docs[str(doc_id)]
+    return _found(await async_graph_store.run(document_store.get_document, doc_id))
 
 
 @app.get("/text_link/{doc_id}")
@@ -195,7 +195,7 @@ async def get_text_link(doc_id: int):
     @param doc_id: Value held in indexed_document.json
     @return: Corresponding document link.
     """
-    return links[str(doc_id)]
+    return _found(await async_graph_store.run(document_store.get_link, doc_id))
 
 
 @app.get("/text_title/{doc_id}")
@@ -205,41 +205,76 @@ async def get_text_title(doc_id: int):
     @param doc_id: Value held in indexed documents
     @return: Corresponding document title
     """
-    return article_titles[str(doc_id)] + " - " + section_titles[str(doc_id)]
+    return _found(await async_graph_store.run(document_store.get_title, doc_id))
 
 
 @app.get("/query/query_graph_nodes/")
-async def query_graph_nodes(query_terms: List[str] = Query(None)):
+async def query_graph_nodes(query_terms: List[str] = Query(None), exclude_terms: List[str] = Query(None),
+                            mode: str = "and", start: str = None, end: str = None, ranked: bool = False):
     """
-    Search in nodes of graphs for a query term
-    @query_term: The query term
-    @return: All timestamps for which the corresponding graph contains the query term
+    Search in nodes of graphs for query terms
+    @param query_terms: The query terms
+    @param exclude_terms: Terms the graphs must not contain
+    @param mode: "and" if the graphs have to contain all query terms, "or" if any query term suffices
+    @param start: Only return timestamps from this date on (YYYY[-MM[-DD]])
+    @param end: Only return timestamps up to this date, including all timestamps within its period
+    @param ranked: Sort the timestamps by the summed weight of the query terms instead of chronologically
+    @return: All timestamps for which the corresponding graph matches the query
     """
+    if mode not in search.QUERY_MODES:
+        raise HTTPException(status_code=400, detail="Unknown mode: " + mode)
     if not query_terms:
         return []
     query_terms = [x.lower() for x in query_terms]
-    resulting_timestamps = set(timeline_dates)
-    for term in query_terms:
-        resulting_timestamps.intersection_update(query_label_to_graphs[term])
+    exclude_terms = [x.lower() for x in exclude_terms] if exclude_terms else []
+    return graph_search.query(query_terms, exclude_terms, mode=mode, start=start, end=end, ranked=ranked)
+
 
-    return resulting_timestamps
+@app.get("/query/neighbours/{term}")
+async def query_neighbours(term: str, start: str = None, end: str = None, granularity: str = None,
+                           limit: int = Query(10, ge=1)):
+    """
+    Neighbours of a term in all graphs of a date range
+    @param term: The term
+    @param start: Only visit graphs from this date on (YYYY[-MM[-DD]])
+    @param end: Only visit graphs up to this date, including all graphs within its period
+    @param granularity: Only visit graphs of these granularities, any combination of "Y", "M" and "D"
+    @param limit: Maximal number of neighbours per graph and overall
+    @return: The heaviest neighbours in every graph containing the term, and the neighbours with the highest support
+    over all these graphs
+    """
+    return await async_graph_store.run(neighbours.neighbours_over_time, graph_cache, graph_search, term, start, end,
+                                       granularity, limit)
+
+
+@app.get("/query/trajectory/{term}")
+async def query_trajectory(term: str, granularity: str = "Y", start: str = None, end: str = None):
+    """
+    Time series of the weight of a term, including the terms it co-occurs with most
+    @param term: The term
+    @param granularity: Only timestamps of these granularities, any combination of "Y", "M" and "D"
+    @param start: Only return timestamps from this date on (YYYY[-MM[-DD]])
+    @param end: Only return timestamps up to this date, including all timestamps within its period
+    @return: Timestamps, weights and counts of the term as parallel arrays, and its strongest partners per timestamp
+    """
+    if trajectories is None:
+        raise HTTPException(status_code=404, detail="No trajectory table configured")
+    result = trajectories.trajectory(term, granularity, start, end)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Term not found")
+    return result
 
 
 @app.get("/query/suggest/{phrase}")
-async def suggest_nodes(phrase: str = Query(None, max_length=40), limit: int = 5):
+async def suggest_nodes(phrase: str = Path(..., max_length=40), limit: int = Query(5, ge=1),
+                        mode: str = Query("substring", pattern="^(prefix|substring)$")):
     """
     Suggest the most popular terms based on aggregates over all graphs
     @param phrase: A partial string to match nodes on.
     @param limit: How many nodes to return.
+    @param mode: "substring" matches the phrase anywhere in the node label, "prefix" only at its beginning.
     @return: A list of nodes that match the phrase, sorted descending by importance.
     """
-
-    suggestions = []
-    for label in query_suggestions.keys():
-        if phrase.lower() in label.lower():
-            suggestions.append(label)
-
-        if len(suggestions) >= limit:
-            break
-
-    return suggestions
+    if mode == "prefix":
+        return query_suggestions.prefix(phrase, limit)
+    return query_suggestions.substring(phrase, limit)
@@ -0,0 +1,267 @@
+"""
+In-memory caches for the API, s.t. hot graphs are not fetched from the database and prepared again for every request.
+"""
+
+import bisect
+import collections
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import responses
+
+# Wire formats of graph responses, see PreparedGraph.response and PreparedGraph.columnar
+GRAPH_FORMATS = ("json", "columnar")
+
+
+class LRUCache:
+    """
+    Thread-safe cache that evicts the least recently used entries once the total size of all entries exceeds max_size.
+    By default every entry has size 1, i.e., max_size is the maximal number of entries.
+    """
+
+    def __init__(self, max_size: int, size_of: Callable[[Any], int] = None) -> None:
+        self.max_size = max_size
+        self.size_of = size_of if size_of else (lambda value: 1)
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self.size_of(value)
+        # entries larger than the whole cache are not stored at all
+        if size > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value, or computes and caches it. The computation runs outside of the lock, hence concurrent
+        misses for the same key may compute the value more than once. None is never cached.
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PreparedGraph:
+    """
+    A graph as stored in the database, prepared for answering requests with a node limit. Nodes are sorted by descending
+    weight, and edges (without self-loops) by the larger weight rank of their two nodes. Hence, the response for a
+    limit n consists of the first n nodes and a prefix of the edges. Additionally, the adjacency of every node is stored
+    as a list of (neighbour id, edge position) pairs, sorted by descending weight of the neighbours, and nodes can be
+    looked up by their lower-cased label. Neighbourhood queries thus only touch the nodes and edges they return.
+    """
+    __slots__ = ("nodes", "edges", "edge_ranks", "adjacency", "ranks", "label_ids")
+
+    nodes: List[Dict]
+    edges: List[Dict]
+    edge_ranks: List[int]
+    adjacency: Dict[int, List[Tuple[int, int]]]
+    ranks: Dict[int, int]
+    label_ids: Dict[str, int]
+
+    def __init__(self, graph: Dict) -> None:
+        self.nodes = sorted(graph["nodes"], key=lambda x: x["value"], reverse=True)
+        rank = {node["id"]: r for r, node in enumerate(self.nodes)}
+        self.ranks = rank
+        self.label_ids = {}
+        for node in self.nodes:
+            self.label_ids.setdefault(node["label"].lower(), node["id"])
+
+        ranked_edges = []
+        for edge in graph["edges"]:
+            if edge["from"] != edge["to"] and edge["from"] in rank and edge["to"] in rank:
+                ranked_edges.append((max(rank[edge["from"]], rank[edge["to"]]), edge))
+        # stable sort, s.t. edges keep their stored order within the same rank
+        ranked_edges.sort(key=lambda x: x[0])
+        self.edge_ranks = [r for r, _ in ranked_edges]
+        self.edges = [edge for _, edge in ranked_edges]
+
+        self.adjacency = collections.defaultdict(list)
+        for position, edge in enumerate(self.edges):
+            self.adjacency[edge["from"]].append((edge["to"], position))
+            self.adjacency[edge["to"]].append((edge["from"], position))
+        for neighbours in self.adjacency.values():
+            neighbours.sort(key=lambda x: rank[x[0]])
+        self.adjacency = dict(self.adjacency)
+
+    def size(self) -> int:
+        return len(self.nodes) + len(self.edges)
+
+    def node(self, node_id: int) -> Dict:
+        return self.nodes[self.ranks[node_id]]
+
+    def neighbours(self, label: str) -> Optional[List[Tuple[Dict, Dict]]]:
+        """
+        @param label: Label of the node, case-insensitive
+        @return: (neighbour node, edge) pairs, heaviest neighbour first, or None if the graph does not contain the label
+        """
+        node_id = self.label_ids.get(label.lower())
+        if node_id is None:
+            return None
+        return [(self.node(neighbour), self.edges[position])
+                for neighbour, position in self.adjacency.get(node_id, [])]
+
+    def neighbourhood(self, label: str, hops: int, limit: int) -> Optional[Dict]:
+        """
+        Breadth-first search from the node of label, visiting heavier neighbours first.
+        @param label: Label of the center node, case-insensitive
+        @param hops: Maximal distance of returned nodes to the center node
+        @param limit: Maximal number of returned nodes, including the center node
+        @return: The nodes with their distance "hops" to the center node, and all edges between them, or None if the
+        graph does not contain the label
+        """
+        center = self.label_ids.get(label.lower())
+        if center is None:
+            return None
+
+        distances = {center: 0}
+        queue = collections.deque([center])
+        while queue and len(distances) < limit:
+            node_id = queue.popleft()
+            if distances[node_id] >= hops:
+                continue
+            for neighbour, _ in self.adjacency.get(node_id, []):
+                if neighbour not in distances:
+                    if len(distances) >= limit:
+                        break
+                    distances[neighbour] = distances[node_id] + 1
+                    queue.append(neighbour)
+
+        positions = sorted(set(position
+                               for node_id in distances
+                               for neighbour, position in self.adjacency.get(node_id, [])
+                               if neighbour in distances))
+        return {"nodes": [dict(self.node(node_id), hops=distance) for node_id, distance in distances.items()],
+                "edges": [self.edges[position] for position in positions]}
+
+    def response(self, limit: int) -> Dict:
+        """
+        @param limit: Number of nodes that will be returned
+        @return: The limit heaviest nodes and all edges between them
+        """
+        limit = max(limit, 0)
+        return {"nodes": self.nodes[:limit],
+                "edges": self.edges[:bisect.bisect_left(self.edge_ranks, limit)]}
+
+    def columnar(self, limit: int) -> Dict:
+        """
+        Compact encoding of response, in which nodes and edges are stored as parallel arrays, one per field, s.t. the
+        field names are not repeated for every element.
+        @param limit: Number of nodes that will be returned
+        @return: Dict with "format": "columnar", and "nodes" and "edges" as field name to the list of its values
+        """
+        response = self.response(limit)
+        return {"format": "columnar",
+                "nodes": _to_columns(response["nodes"]),
+                "edges": _to_columns(response["edges"])}
+
+
+def _to_columns(rows: List[Dict]) -> Dict[str, List]:
+    fields = {}
+    for row in rows:
+        for field in row.keys():
+            fields.setdefault(field, None)
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+
+class GraphCache:
+    """
+    Caches prepared graphs, bounded by their total number of nodes and edges, as well as the serialised responses for
+    (timestamp, limit, format) combinations.
+    """
+
+    def __init__(self, load_graph: Callable[[str], Optional[Dict]], max_elements: int, max_responses: int) -> None:
+        """
+        @param load_graph: Returns the stored graph with fields "nodes" and "edges" for a timestamp, or None
+        @param max_elements: Maximal number of nodes and edges of all cached graphs together
+        @param max_responses: Maximal number of cached responses
+        """
+        self.load_graph = load_graph
+        self.graphs = LRUCache(max_elements, size_of=PreparedGraph.size)
+        self.payloads = LRUCache(max_responses)
+
+    def prepared(self, timestamp: str) -> Optional[PreparedGraph]:
+        def load() -> Optional[PreparedGraph]:
+            graph = self.load_graph(timestamp)
+            return PreparedGraph(graph) if graph is not None else None
+
+        return self.graphs.get_or_compute(timestamp, load)
+
+    def response(self, timestamp: str, limit: int) -> Dict:
+        """
+        @param timestamp: Timestamp of the graph
+        @param limit: Number of nodes that will be returned
+        @return: The graph reduced to its limit heaviest nodes, or an empty graph if it does not exist. The content is
+        shared with the cache and must not be changed.
+        """
+        graph = self.prepared(timestamp)
+        if graph is None:
+            return {"nodes": [], "edges": []}
+        return graph.response(limit)
+
+    def cached_payload(self, timestamp: str, limit: int, graph_format: str = "json") \
+            -> Optional[responses.EncodedPayload]:
+        """
+        Returns the serialised response only if it is cached, i.e., never blocks on loading or serialising the graph.
+        """
+        return self.payloads.get((timestamp, limit, graph_format))
+
+    def payload(self, timestamp: str, limit: int, graph_format: str = "json") -> responses.EncodedPayload:
+        """
+        @param timestamp: Timestamp of the graph
+        @param limit: Number of nodes that will be returned
+        @param graph_format: One of GRAPH_FORMATS
+        @return: The serialised response, see response. Payloads of missing graphs are not cached.
+        """
+        if graph_format not in GRAPH_FORMATS:
+            raise ValueError("Unknown graph format: " + str(graph_format))
+
+        def compute() -> Optional[responses.EncodedPayload]:
+            graph = self.prepared(timestamp)
+            if graph is None:
+                return None
+            content = graph.columnar(limit) if graph_format == "columnar" else graph.response(limit)
+            payload = responses.EncodedPayload.from_json(content)
+            # compress ahead of time, s.t. the compression runs here instead of on the event loop
+            if len(payload.body) >= responses.MIN_COMPRESSION_SIZE:
+                payload.encoded("gzip")
+            return payload
+
+        payload = self.payloads.get_or_compute((timestamp, limit, graph_format), compute)
+        if payload is None:
+            empty = PreparedGraph({"nodes": [], "edges": []})
+            content = empty.columnar(limit) if graph_format == "columnar" else empty.response(limit)
+            return responses.EncodedPayload.from_json(content)
+        return payload
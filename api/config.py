@@ -1,2 +1,21 @@
 DATABASE_NAME = "TICCO_DB"
 INDEXED_DOCUMENTS_PATH = ""
+# On-disk index of the indexed documents, rebuilt when they change, and number of documents held in memory
+DOCUMENT_STORE_PATH = "indexed_documents.sqlite"
+DOCUMENT_CACHE_SIZE = 1024
+# Graph storage backend: "mongo", or "file" to serve the timecentricgraphs.json under GRAPHS_FILE_PATH
+# and the timecentricprovenance.json under PROVENANCE_FILE_PATH directly
+GRAPH_STORE = "mongo"
+GRAPHS_FILE_PATH = ""
+PROVENANCE_FILE_PATH = ""
+MONGO_URI = "mongodb://localhost:27017/"
+MONGO_MAX_POOL_SIZE = 50
+# Number of threads running blocking store calls, s.t. they do not block the event loop
+GRAPH_STORE_WORKERS = 16
+# Maximal number of nodes and edges of all graphs held in memory, and of cached (timestamp, limit, format) responses
+GRAPH_CACHE_MAX_ELEMENTS = 2000000
+RESPONSE_CACHE_SIZE = 4096
+# Snapshot of the query index, rebuilt if the stored graphs change. Leave empty to build it on every start.
+API_INDEX_PATH = "api_index.pickle"
+# Directory of the term trajectory table written by the pipeline ("trajectories" in the output folder), optional
+TRAJECTORY_TABLE_PATH = ""
@@ -0,0 +1,144 @@
+"""
+Document store for the text endpoints. The indexed_documents.json created by the pipeline is converted once into an
+SQLite database, s.t. workers only read the requested documents from disk instead of holding the whole corpus in
+memory.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+import cache
+
+# Link of documents without a "url" field
+DEFAULT_LINK = "https://www.wikipedia.org/"
+
+
+def _source_signature(path: str) -> str:
+    stat = os.stat(path)
+    return "{}:{}".format(stat.st_size, stat.st_mtime_ns)
+
+
+def build_database(source_path: str, database_path: str) -> None:
+    """
+    Converts an indexed_documents.json into an SQLite database with one row per document, holding the document as JSON
+    and its precomputed link and title.
+    @param source_path: Location of the indexed_documents.json
+    @param database_path: Location of the database, replaced atomically
+    """
+    with open(source_path, "r") as f:
+        docs = json.load(f)
+
+    # Write to a temporary file first, s.t. concurrently starting workers never read a partial database
+    temp_path = database_path + ".{}.tmp".format(os.getpid())
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        connection.execute("CREATE TABLE documents (id INTEGER PRIMARY KEY, content TEXT, link TEXT, title TEXT)")
+        connection.execute("INSERT INTO meta VALUES ('source', ?)", (_source_signature(source_path),))
+        connection.executemany("INSERT INTO documents VALUES (?, ?, ?, ?)",
+                               ((int(doc_id), json.dumps(doc, ensure_ascii=False), _link(doc), _title(doc))
+                                for doc_id, doc in docs.items()))
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_path, database_path)
+
+
+def _link(doc: Dict) -> str:
+    return doc["url"] if "url" in doc.keys() else DEFAULT_LINK
+
+
+def _title(doc: Dict) -> str:
+    # the first section of an article has the article title as section title
+    section_title = doc["title"]
+    if doc["article_title"] == section_title:
+        section_title = "Summary"
+    return doc["article_title"] + " - " + section_title
+
+
+def is_up_to_date(source_path: str, database_path: str) -> bool:
+    """
+    @return: True if the database exists and was built from the current version of the source file
+    """
+    if not os.path.isfile(database_path):
+        return False
+    connection = sqlite3.connect("file:{}?mode=ro".format(database_path), uri=True)
+    try:
+        row = connection.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        connection.close()
+    return row is not None and row[0] == _source_signature(source_path)
+
+
+class DocumentStore:
+    """
+    Read-only access to the documents in the SQLite database. Every thread uses its own connection, and recently
+    requested documents are kept in an LRU cache.
+    """
+
+    def __init__(self, database_path: str, cache_size: int = 1024) -> None:
+        """
+        @param database_path: Location of the database created by build_database
+        @param cache_size: Maximal number of cached documents
+        """
+        self.database_path = database_path
+        self.documents = cache.LRUCache(cache_size)
+        self._local = threading.local()
+
+    @classmethod
+    def load_or_build(cls, source_path: str, database_path: str, cache_size: int = 1024) -> "DocumentStore":
+        """
+        Opens the database, and (re)builds it first if it does not exist or the source file changed.
+        @param source_path: Location of the indexed_documents.json
+        @param database_path: Location of the database
+        @param cache_size: Maximal number of cached documents
+        @return: The store
+        """
+        if not is_up_to_date(source_path, database_path):
+            build_database(source_path, database_path)
+        return cls(database_path, cache_size)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect("file:{}?mode=ro".format(self.database_path), uri=True)
+            self._local.connection = connection
+        return connection
+
+    def _row(self, doc_id: int) -> Optional[tuple]:
+        def fetch() -> Optional[tuple]:
+            return self._connection().execute("SELECT content, link, title FROM documents WHERE id = ?",
+                                              (doc_id,)).fetchone()
+
+        return self.documents.get_or_compute(doc_id, fetch)
+
+    def get_document(self, doc_id: int) -> Optional[Dict]:
+        """
+        @param doc_id: ID of the document
+        @return: The document, or None if it does not exist
+        """
+        row = self._row(doc_id)
+        return json.loads(row[0]) if row is not None else None
+
+    def get_link(self, doc_id: int) -> Optional[str]:
+        """
+        @param doc_id: ID of the document
+        @return: The url of the document, or a default link if it has none. None if the document does not exist
+        """
+        row = self._row(doc_id)
+        return row[1] if row is not None else None
+
+    def get_title(self, doc_id: int) -> Optional[str]:
+        """
+        @param doc_id: ID of the document
+        @return: The title as "article title - section title", or None if the document does not exist
+        """
+        row = self._row(doc_id)
+        return row[2] if row is not None else None
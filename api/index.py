@@ -0,0 +1,98 @@
+"""
+Query index of the API: the dates of the timeline, the graphs each label occurs in, and the aggregated weight of each
+label for query suggestions. The index is built in a single pass over all stored graphs and can be persisted as a
+snapshot, s.t. workers do not have to query the whole database on startup. The snapshot holds the fingerprint of the
+stored graphs it was built from (see store.GraphStore.fingerprint), and is rebuilt once they change.
+"""
+
+from __future__ import annotations
+
+import collections
+import os
+import pickle
+import time
+from typing import Dict, Iterable, List, Optional
+
+import search
+
+
+class ApiIndex:
+    # snapshots of other versions are rebuilt
+    version = 4
+
+    created: float
+    fingerprint: Optional[str]
+    num_graphs: int
+    timeline_dates: List[str]
+    search: search.GraphSearchIndex
+    suggestions: Dict[str, float]
+
+    def __init__(self, timeline_dates: List[str], label_weights: Dict[str, Dict[str, float]],
+                 suggestions: Dict[str, float]) -> None:
+        """
+        @param timeline_dates: Timestamps of all graphs in chronological order
+        @param label_weights: Lower-cased label to its weight in every graph (timestamp) it occurs in
+        @param suggestions: Label to its summed weight over all graphs, sorted by descending weight
+        """
+        self.created = time.time()
+        self.fingerprint = None
+        self.num_graphs = len(timeline_dates)
+        self.timeline_dates = timeline_dates
+        self.search = search.GraphSearchIndex(timeline_dates, label_weights)
+        self.suggestions = suggestions
+
+    @classmethod
+    def from_graphs(cls, graphs: Iterable[Dict]) -> ApiIndex:
+        """
+        Builds the index in a single pass.
+        @param graphs: Stored graphs with field "_id" (the timestamp) and "nodes" with fields "label" and "value"
+        @return: The index
+        """
+        timeline_dates = []
+        label_weights = collections.defaultdict(lambda: collections.defaultdict(float))
+        suggestions = collections.defaultdict(float)
+        for graph in graphs:
+            timestamp = graph["_id"]
+            timeline_dates.append(timestamp)
+            for node in graph["nodes"]:
+                label_weights[node["label"].lower()][timestamp] += node["value"]
+                suggestions[node["label"]] += node["value"]
+
+        # YYYY[-MM[-DD]] strings sort chronologically, with a year before its months
+        timeline_dates.sort()
+        suggestions = {k: v for k, v in sorted(suggestions.items(), key=lambda item: item[1], reverse=True)}
+        return cls(timeline_dates, label_weights, suggestions)
+
+    def save(self, path: str) -> None:
+        # Write to a temporary file first, s.t. concurrently starting workers never read a partial snapshot
+        temp_path = path + ".{}.tmp".format(os.getpid())
+        with open(temp_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> ApiIndex:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def load_or_build(path: str, fingerprint: Optional[str], graphs: Iterable[Dict]) -> ApiIndex:
+    """
+    Loads the index snapshot, or builds the index and stores the snapshot if it does not exist or was built from other
+    graphs.
+    @param path: Location of the snapshot, no snapshot is used if empty
+    @param fingerprint: Fingerprint of the stored graphs, see store.GraphStore.fingerprint. A snapshot is never reused
+    if None.
+    @param graphs: Stored graphs, only iterated if the index has to be built
+    @return: The index
+    """
+    if path and fingerprint is not None and os.path.isfile(path):
+        index = ApiIndex.load(path)
+        if getattr(index, "version", None) == ApiIndex.version and index.fingerprint == fingerprint:
+            return index
+
+    index = ApiIndex.from_graphs(graphs)
+    index.fingerprint = fingerprint
+    if path:
+        index.save(path)
+    return index
@@ -0,0 +1,61 @@
+"""
+Neighbours of a term across the graphs of a date range. Only the graphs containing the term are visited, using the
+postings of the search index, and within each graph only the adjacency of the term.
+"""
+
+import collections
+from typing import Dict, Optional
+
+import cache
+import search
+
+GRANULARITIES = "YMD"
+
+
+def granularity_of(timestamp: str) -> str:
+    """
+    @param timestamp: YYYY[-MM[-DD]]
+    @return: "Y", "M" or "D"
+    """
+    return GRANULARITIES[timestamp.count("-")]
+
+
+def neighbours_over_time(graph_cache: cache.GraphCache, graph_search: search.GraphSearchIndex, term: str,
+                         start: Optional[str] = None, end: Optional[str] = None, granularity: Optional[str] = None,
+                         limit: int = 10) -> Dict:
+    """
+    @param graph_cache: Prepared graphs
+    @param graph_search: Index of the graphs each label occurs in
+    @param term: Label of the node, case-insensitive
+    @param start: First timestamp of the date range, see GraphSearchIndex.date_range
+    @param end: Last timestamp of the date range, see GraphSearchIndex.date_range
+    @param granularity: Only visit graphs of these granularities, any combination of "Y", "M" and "D"
+    @param limit: Maximal number of neighbours per graph and overall
+    @return: For every graph containing the term, its heaviest neighbours with the support of the connecting edge
+    ("value") and their node weight ("weight"), as well as the neighbours with the highest support over all graphs
+    """
+    term = term.lower()
+    timestamps = graph_search.graphs_with(term, start, end)
+    if granularity:
+        timestamps = [timestamp for timestamp in timestamps if granularity_of(timestamp) in granularity.upper()]
+
+    per_timestamp = []
+    support = collections.defaultdict(int)
+    occurrences = collections.defaultdict(int)
+    for timestamp in timestamps:
+        graph = graph_cache.prepared(timestamp)
+        neighbours = graph.neighbours(term) if graph is not None else None
+        if neighbours is None:
+            continue
+        for node, edge in neighbours:
+            support[node["label"]] += edge["value"]
+            occurrences[node["label"]] += 1
+        per_timestamp.append({"timestamp": timestamp,
+                              "neighbours": [{"label": node["label"], "value": edge["value"], "weight": node["value"]}
+                                             for node, edge in neighbours[:limit]]})
+
+    overall = sorted(support.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return {"term": term,
+            "timestamps": per_timestamp,
+            "neighbours": [{"label": label, "value": value, "timestamps": occurrences[label]}
+                           for label, value in overall]}
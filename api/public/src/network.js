@@ -5,6 +5,7 @@ let default_num_nodes = 10;  // Resets for a new network
 let date_re = /\d{4}(-d{2}(-d{2})?)?/;  // YYYY-MM-DD format as per preprocessing
 let curr_graph = "1862";  // Default graph setting
 let curr_context;  // Holds entity-specific documents
+let provenance_limit = 1000;  // Maximal number of sentences fetched per clicked edge
 
 
 // Color schema
@@ -14,7 +15,35 @@ let highlightColor = "#E3B019";
 let highlightBorderColor = "#3F580E";
 
 
+// URL of a graph in the compact columnar format
+function graphUrl(timestamp, limit) {
+  return "/graphs/" + timestamp + "?limit=" + limit + "&format=columnar";
+}
+
+
+// Converts parallel arrays, one per field, back into a list of objects
+function decodeColumns(columns) {
+  let fields = Object.keys(columns);
+  let length = fields.length > 0 ? columns[fields[0]].length : 0;
+  let rows = [];
+  for (let i = 0; i < length; i++) {
+    let row = {};
+    for (let field of fields) {
+      if (columns[field][i] !== null) {
+        row[field] = columns[field][i];
+      }
+    }
+    rows.push(row);
+  }
+  return rows;
+}
+
+
 function displayNetwork(data) {
+  if (data.format === "columnar") {
+    data = {nodes: decodeColumns(data.nodes), edges: decodeColumns(data.edges)};
+  }
+
   // DOM element where the Timeline will be attached
   let container = document.getElementById('network');
 
@@ -104,29 +133,39 @@ function displayNetwork(data) {
 
   // On click display relevant text with highlight
   network.on("click", function(params) {
-    // Collect all sentences that are associated
+    // Collect all sentences that are associated, fetching the provenance of edges that do not carry it inline
     let sents = [];
+    let requests = [];
     for (let curr_edge_hash of params.edges) {
       let temp_edge = edges.get(curr_edge_hash);
       let curr_from_label = nodes.get(temp_edge.from)["label"];
       let curr_to_label = nodes.get(temp_edge.to)["label"];
-      if (temp_edge.sent_functionality) {
-        for (let cooc of temp_edge.sent_functionality) {
+      let addSentences = function(sent_functionality) {
+        for (let cooc of sent_functionality) {
           cooc["from_label"] = curr_from_label;
           cooc["to_label"] = curr_to_label;
           sents.push(cooc);
         }
+      };
+      if (temp_edge.sent_functionality) {
+        addSentences(temp_edge.sent_functionality);
+      } else if (temp_edge.id !== undefined) {
+        requests.push(jQuery.getJSON("/edges/" + temp_edge.id + "/provenance?limit=" + provenance_limit,
+          function(provenance) {
+            addSentences(provenance.sentences);
+          }));
       }
     }
 
     // Check whether click was on node/edge
-    if (sents.length > 0) {
-      // group by individual documentIDs
-      curr_context = groupBy(sents, sent => sent.doc_id);
-      // Put all the collected elements into the dropdown menu
-      overwriteArticles(curr_context);
-
-    }
+    $.when.apply($, requests).always(function() {
+      if (sents.length > 0) {
+        // group by individual documentIDs
+        curr_context = groupBy(sents, sent => sent.doc_id);
+        // Put all the collected elements into the dropdown menu
+        overwriteArticles(curr_context);
+      }
+    });
   });
 
   // On right click start a query containing the term of the node
@@ -208,14 +247,14 @@ $("#more").click(function() {
     alert("Performance of graph rendering will drop significantly!")
   }
   num_nodes = num_nodes + increment;
-  jQuery.getJSON("/graphs/" + curr_graph + "?limit=" + num_nodes, displayNetwork);
+  jQuery.getJSON(graphUrl(curr_graph, num_nodes), displayNetwork);
 });
 
 $("#less").click(function() {
   // Assert no negative number of nodes is rendered
   if (num_nodes - increment >= 0) {
     num_nodes = num_nodes - increment;
-    jQuery.getJSON("/graphs/" + curr_graph + "?limit=" + num_nodes, displayNetwork);
+    jQuery.getJSON(graphUrl(curr_graph, num_nodes), displayNetwork);
   }
 });
 
@@ -225,7 +264,7 @@ $("#select-related").on("change", function() {
   // Reset parameters and render new graph
   curr_graph = newGraphID;
   num_nodes = default_num_nodes;
-  jQuery.getJSON("/graphs/" + newGraphID + "?limit=" + num_nodes, displayNetwork);
+  jQuery.getJSON(graphUrl(newGraphID, num_nodes), displayNetwork);
   highlight_dates([curr_graph]);
 });
 
@@ -66,7 +66,7 @@ function displayTimeline(data) {
       num_nodes = default_num_nodes;
 
       // Rendering step
-      jQuery.getJSON("/graphs/" + selected_time + "?limit=" + num_nodes, displayNetwork);
+      jQuery.getJSON(graphUrl(selected_time, num_nodes), displayNetwork);
 
     }
   });
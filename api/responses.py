@@ -0,0 +1,133 @@
+"""
+Pre-encoded HTTP responses with validators (ETag, Last-Modified) and negotiated compression.
+"""
+
+import email.utils
+import gzip
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESSION_SIZE = 1024
+
+
+def encode_json(content: Any) -> bytes:
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """
+    Parses an Accept-Encoding header into encoding -> quality.
+    """
+    result = {}
+    for part in (accept_encoding or "").split(","):
+        fields = part.strip().split(";")
+        if not fields[0]:
+            continue
+        quality = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        result[fields[0].strip().lower()] = quality
+    return result
+
+
+def _opaque_tag(etag: str) -> str:
+    # weak comparison of entity tags ignores the weakness indicator
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+class EncodedPayload:
+    """
+    A response body that is serialised once and compressed at most once per encoding. Responses answer conditional
+    requests with 304 Not Modified.
+    """
+
+    def __init__(self, body: bytes, media_type: str = "application/json", last_modified: float = None) -> None:
+        """
+        @param body: The serialised body
+        @param media_type: Content type of the body
+        @param last_modified: Time of the last change of the content as seconds since the epoch, defaults to now
+        """
+        self.body = body
+        self.media_type = media_type
+        self.last_modified = int(last_modified if last_modified is not None else time.time())
+        # weak validator, since the same content is sent with different encodings
+        self.etag = 'W/"' + hashlib.sha1(body).hexdigest() + '"'
+        self._encoded = {"identity": body}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_json(cls, content: Any, last_modified: float = None) -> "EncodedPayload":
+        return cls(encode_json(content), "application/json", last_modified)
+
+    def encoded(self, encoding: str) -> bytes:
+        """
+        @param encoding: "identity", "gzip" or "br"
+        @return: The body in the given encoding
+        """
+        body = self._encoded.get(encoding)
+        if body is None:
+            if encoding == "gzip":
+                body = gzip.compress(self.body, compresslevel=6)
+            elif encoding == "br" and brotli is not None:
+                body = brotli.compress(self.body)
+            else:
+                raise ValueError("Unsupported encoding: " + encoding)
+            with self._lock:
+                self._encoded[encoding] = body
+        return body
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """
+        @param accept_encoding: Accept-Encoding header of the request
+        @return: The preferred supported encoding, brotli over gzip over identity
+        """
+        if len(self.body) < MIN_COMPRESSION_SIZE:
+            return "identity"
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding in (["br"] if brotli is not None else []) + ["gzip"]:
+            if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                return encoding
+        return "identity"
+
+    def not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or _opaque_tag(self.etag) in [_opaque_tag(tag) for tag in tags]
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return email.utils.parsedate_to_datetime(if_modified_since).timestamp() >= self.last_modified
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag,
+                   "Last-Modified": email.utils.formatdate(self.last_modified, usegmt=True),
+                   "Cache-Control": "no-cache",
+                   "Vary": "Accept-Encoding"}
+        if self.not_modified(request):
+            return Response(status_code=304, headers=headers)
+
+        encoding = self.negotiate(request.headers.get("accept-encoding"))
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.encoded(encoding), media_type=self.media_type, headers=headers)
@@ -0,0 +1,150 @@
+"""
+Inverted index from node labels to the graphs they occur in, for boolean multi-term queries over the timeline.
+"""
+
+import bisect
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# little-endian words, s.t. bit i of the bitmap is bit i % 8 of byte i // 8 on every platform
+_WORD = np.dtype("<u8")
+
+# how the query terms are combined, see GraphSearchIndex.query
+QUERY_MODES = ("and", "or")
+
+
+class GraphSearchIndex:
+    """
+    Graphs are identified by their position in the chronological timeline, s.t. a date range is a contiguous range of
+    graph ids. For every label, the sorted ids of the graphs containing it and the weight of the label in these graphs
+    are stored. Similar to roaring bitmaps, labels that occur in many graphs additionally keep a dense bitmap (packed
+    into uint64 words), and the bitmaps of all other labels are created from their ids when they are queried. Queries
+    combine the bitmaps of their terms with bitwise AND, OR and AND NOT.
+    """
+    timeline_dates: List[str]
+    num_words: int
+    label_ids: Dict[str, int]
+    graph_ids: List[np.ndarray]
+    weights: List[np.ndarray]
+    dense_bitmaps: Dict[int, np.ndarray]
+
+    def __init__(self, timeline_dates: List[str], label_weights: Dict[str, Dict[str, float]]) -> None:
+        """
+        @param timeline_dates: Timestamps of all graphs in chronological order
+        @param label_weights: Lower-cased label to the weight of the label in every graph (timestamp) containing it
+        """
+        self.timeline_dates = timeline_dates
+        self.num_words = (len(timeline_dates) + 63) // 64
+        positions = {timestamp: position for position, timestamp in enumerate(timeline_dates)}
+
+        self.label_ids = {}
+        self.graph_ids = []
+        self.weights = []
+        self.dense_bitmaps = {}
+        for label, graph_weights in label_weights.items():
+            ids = np.fromiter((positions[timestamp] for timestamp in graph_weights.keys()), dtype=np.int32,
+                              count=len(graph_weights))
+            weights = np.fromiter(graph_weights.values(), dtype=np.float64, count=len(graph_weights))
+            order = np.argsort(ids)
+            label_id = len(self.graph_ids)
+            self.label_ids[label] = label_id
+            self.graph_ids.append(ids[order])
+            self.weights.append(weights[order])
+            # a dense bitmap needs less memory than the ids once the label occurs in more than 1/32 of all graphs
+            if len(ids) * 32 > len(timeline_dates):
+                self.dense_bitmaps[label_id] = self._to_bitmap(ids)
+
+    def _to_bitmap(self, ids: np.ndarray) -> np.ndarray:
+        bitmap = np.zeros(self.num_words, dtype=_WORD)
+        ids = ids.astype(np.uint64)
+        np.bitwise_or.at(bitmap, ids >> np.uint64(6), np.uint64(1) << (ids & np.uint64(63)))
+        return bitmap
+
+    def _bitmap(self, label: str) -> np.ndarray:
+        label_id = self.label_ids.get(label)
+        if label_id is None:
+            return np.zeros(self.num_words, dtype=_WORD)
+        bitmap = self.dense_bitmaps.get(label_id)
+        if bitmap is None:
+            return self._to_bitmap(self.graph_ids[label_id])
+        return bitmap.copy()
+
+    def _range_bitmap(self, start: int, end: int) -> np.ndarray:
+        bits = np.zeros(self.num_words * 64, dtype=bool)
+        bits[start:end] = True
+        return np.packbits(bits, bitorder="little").view(_WORD)
+
+    def date_range(self, start: Optional[str] = None, end: Optional[str] = None) -> (int, int):
+        """
+        @param start: First timestamp as YYYY[-MM[-DD]], inclusive
+        @param end: Last timestamp as YYYY[-MM[-DD]], inclusive, including all timestamps within its period
+        @return: Range [start, end) of graph ids
+        """
+        first = bisect.bisect_left(self.timeline_dates, start) if start else 0
+        last = bisect.bisect_right(self.timeline_dates, end + "\U0010ffff") if end else len(self.timeline_dates)
+        return first, last
+
+    def graphs_with(self, term: str, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """
+        @param term: Lower-cased label
+        @param start: First timestamp of the date range, see date_range
+        @param end: Last timestamp of the date range, see date_range
+        @return: Timestamps of the graphs within the date range that contain the term, in chronological order
+        """
+        label_id = self.label_ids.get(term)
+        if label_id is None:
+            return []
+        graph_ids = self.graph_ids[label_id]
+        first, last = self.date_range(start, end)
+        positions = np.searchsorted(graph_ids, [first, last])
+        return [self.timeline_dates[i] for i in graph_ids[positions[0]:positions[1]].tolist()]
+
+    def query(self, terms: List[str], exclude_terms: List[str] = None, mode: str = "and", start: str = None,
+              end: str = None, ranked: bool = False) -> List[str]:
+        """
+        @param terms: Lower-cased labels the graphs have to contain
+        @param exclude_terms: Lower-cased labels the graphs must not contain
+        @param mode: "and" if the graphs have to contain all terms, "or" if any term suffices, see QUERY_MODES
+        @param start: First timestamp of the date range, see date_range
+        @param end: Last timestamp of the date range, see date_range
+        @param ranked: Sort the results by the summed weight of the terms instead of chronologically
+        @return: Timestamps of the matching graphs
+        """
+        if mode not in QUERY_MODES:
+            raise ValueError("Unknown query mode: " + mode)
+        if not terms:
+            return []
+
+        result = self._bitmap(terms[0])
+        for term in terms[1:]:
+            if mode == "or":
+                result |= self._bitmap(term)
+            else:
+                result &= self._bitmap(term)
+        for term in exclude_terms or []:
+            result &= ~self._bitmap(term)
+        if start or end:
+            result &= self._range_bitmap(*self.date_range(start, end))
+
+        ids = np.flatnonzero(np.unpackbits(result.view(np.uint8), bitorder="little"))
+        if ranked:
+            ids = ids[np.argsort(-self.scores(terms, ids), kind="stable")]
+        return [self.timeline_dates[i] for i in ids.tolist()]
+
+    def scores(self, terms: List[str], ids: np.ndarray) -> np.ndarray:
+        """
+        @param terms: Lower-cased labels
+        @param ids: Graph ids
+        @return: Summed weight of the terms in every graph
+        """
+        scores = np.zeros(len(ids), dtype=np.float64)
+        for term in set(terms):
+            label_id = self.label_ids.get(term)
+            if label_id is None:
+                continue
+            graph_ids = self.graph_ids[label_id]
+            positions = np.minimum(np.searchsorted(graph_ids, ids), len(graph_ids) - 1)
+            found = graph_ids[positions] == ids
+            scores[found] += self.weights[label_id][positions[found]]
+        return scores
@@ -0,0 +1,195 @@
+"""
+Storage backends for the time-centric graphs served by the API. All backends implement GraphStore, and calls that may
+block are run in a bounded thread pool by AsyncGraphStore, s.t. they do not block the event loop.
+"""
+
+import abc
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pymongo
+
+
+class GraphStore(abc.ABC):
+    """
+    Interface of the graph storage. A stored graph is a dict with fields "_id" (its timestamp), "nodes" and "edges".
+    The co-occurring sentences of the edges (their provenance) are stored separately by edge id.
+    """
+
+    @abc.abstractmethod
+    def get_graph(self, timestamp: str) -> Optional[Dict]:
+        """
+        @param timestamp: Timestamp of the graph
+        @return: The stored graph, or None if it does not exist
+        """
+
+    @abc.abstractmethod
+    def iter_graphs(self) -> Iterable[Dict]:
+        """
+        @return: All stored graphs, only "_id" and the fields "label" and "value" of the nodes are required to be set
+        """
+
+    @abc.abstractmethod
+    def count(self) -> int:
+        """
+        @return: Number of stored graphs
+        """
+
+    @abc.abstractmethod
+    def fingerprint(self) -> Optional[str]:
+        """
+        @return: Identifies the stored graphs, changes whenever graphs are written, or None if unknown
+        """
+
+    @abc.abstractmethod
+    def get_provenance(self, edge_id: int, offset: int, limit: int) -> Optional[Dict]:
+        """
+        @param edge_id: Id of the edge
+        @param offset: Number of sentences to skip
+        @param limit: Maximal number of sentences
+        @return: Dict with the total number of sentences as "count", and the requested page of sentences as
+        "sentences", or None if the edge does not exist
+        """
+
+
+class InMemoryGraphStore(GraphStore):
+    """
+    Holds all graphs in memory, e.g., for small collections or as local stand-in for a database.
+    """
+
+    def __init__(self, graphs: Dict[str, Dict], provenance: Dict[str, List[Dict]] = None) -> None:
+        """
+        @param graphs: Timestamp to graph with fields "nodes" and "edges", as created by GraphManager.create_graphs_json
+        @param provenance: Edge id to its sentences, as created by GraphManager.create_provenance_json
+        """
+        self.graphs = {timestamp: {"_id": timestamp, "nodes": graph["nodes"], "edges": graph["edges"]}
+                       for timestamp, graph in graphs.items()}
+        self.provenance = {int(edge_id): sentences for edge_id, sentences in (provenance or {}).items()}
+        self._split_inline_provenance()
+
+    def _split_inline_provenance(self) -> None:
+        # Graphs created with include_provenance, or by older versions, store the sentences inline, and the latter
+        # lack edge ids
+        next_id = max([edge.get("id", -1) for graph in self.graphs.values() for edge in graph["edges"]], default=-1) + 1
+        for graph in self.graphs.values():
+            for edge in graph["edges"]:
+                if "sent_functionality" not in edge:
+                    continue
+                if "id" not in edge:
+                    edge["id"] = next_id
+                    next_id += 1
+                self.provenance[edge["id"]] = edge.pop("sent_functionality")
+
+    def get_graph(self, timestamp: str) -> Optional[Dict]:
+        return self.graphs.get(timestamp)
+
+    def iter_graphs(self) -> Iterable[Dict]:
+        return iter(self.graphs.values())
+
+    def count(self) -> int:
+        return len(self.graphs)
+
+    def fingerprint(self) -> Optional[str]:
+        content = json.dumps(self.graphs, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha1(content).hexdigest()
+
+    def get_provenance(self, edge_id: int, offset: int, limit: int) -> Optional[Dict]:
+        sentences = self.provenance.get(edge_id)
+        if sentences is None:
+            return None
+        return {"count": len(sentences), "sentences": sentences[offset:offset + limit]}
+
+
+class FileGraphStore(InMemoryGraphStore):
+    """
+    Serves the graphs of a timecentricgraphs.json and the edge provenance of a timecentricprovenance.json created by
+    main.py without a database.
+    """
+
+    def __init__(self, path: str, provenance_path: str = "") -> None:
+        with open(path, "r") as f:
+            graphs = json.load(f)
+        provenance = None
+        if provenance_path:
+            with open(provenance_path, "r") as f:
+                provenance = json.load(f)
+        super().__init__(graphs, provenance)
+        stat = os.stat(path)
+        self.file_signature = "{}:{}:{}".format(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    def fingerprint(self) -> Optional[str]:
+        return self.file_signature
+
+
+class MongoGraphStore(GraphStore):
+    """
+    Graphs stored in MongoDB, see database/database.py.
+    """
+
+    def __init__(self, uri: str, database_name: str, max_pool_size: int = 100) -> None:
+        """
+        @param uri: MongoDB connection string
+        @param database_name: Name of the database holding the collection "graphs"
+        @param max_pool_size: Maximal number of concurrent connections
+        """
+        self.client = pymongo.MongoClient(uri, maxPoolSize=max_pool_size)
+        self.database = self.client[database_name]
+
+    def get_graph(self, timestamp: str) -> Optional[Dict]:
+        return self.database.graphs.find_one({"_id": timestamp})
+
+    def iter_graphs(self) -> Iterable[Dict]:
+        return self.database.graphs.find({}, {"nodes.label": 1, "nodes.value": 1})
+
+    def count(self) -> int:
+        return self.database.graphs.estimated_document_count()
+
+    def fingerprint(self) -> Optional[str]:
+        # written by create_database and update_database in database/database.py
+        meta = self.database.meta.find_one({"_id": "graphs"})
+        return meta["fingerprint"] if meta else None
+
+    def get_provenance(self, edge_id: int, offset: int, limit: int) -> Optional[Dict]:
+        # only the requested page of sentences is sent by the database
+        return self.database.provenance.find_one({"_id": edge_id},
+                                                 {"_id": 0, "count": 1, "sentences": {"$slice": [offset, limit]}})
+
+
+class AsyncGraphStore:
+    """
+    Runs blocking calls, e.g., of a GraphStore, in a bounded thread pool.
+    """
+
+    def __init__(self, store: GraphStore, max_workers: int) -> None:
+        self.store = store
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                              thread_name_prefix="graph-store")
+
+    async def run(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def get_graph(self, timestamp: str) -> Optional[Dict]:
+        return await self.run(self.store.get_graph, timestamp)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False)
+
+
+def create_store(backend: str, **settings) -> GraphStore:
+    """
+    Creates the configured storage backend.
+    @param backend: "mongo" or "file"
+    @param settings: Settings of the backend, i.e., uri, database_name and max_pool_size for "mongo", and path and
+    provenance_path for "file"
+    @return: The store
+    """
+    if backend == "mongo":
+        return MongoGraphStore(settings["uri"], settings["database_name"], settings.get("max_pool_size", 100))
+    if backend == "file":
+        return FileGraphStore(settings["path"], settings.get("provenance_path", ""))
+    raise ValueError("Unknown graph store backend: " + str(backend))
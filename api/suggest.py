@@ -0,0 +1,111 @@
+"""
+Type-ahead index for query suggestions, built once on startup from the aggregated label weights.
+"""
+
+import bisect
+import collections
+import heapq
+from typing import Dict, List
+
+
+class SuggestionIndex:
+    """
+    Answers prefix and substring queries over node labels, ranked by descending aggregated weight. Labels are identified
+    by their rank, s.t. every sorted list of ranks is also sorted by weight.
+    - Prefix queries use the lower-cased labels in lexicographic order, with the top-k labels precomputed for all short
+      prefixes.
+    - Substring queries use an n-gram index that maps every n-gram of length 1 up to ngram_length to the ranks of the
+      labels containing it. Queries up to that length are answered by a single lookup, longer queries verify the
+      labels of their rarest n-gram in rank order until the limit is reached.
+    """
+    labels: List[str]
+    lowered: List[str]
+    sorted_lowered: List[str]
+    sorted_ranks: List[int]
+    top_k: int
+    max_prefix_length: int
+    top_by_prefix: Dict[str, List[int]]
+    ngram_length: int
+    ngrams: Dict[str, List[int]]
+
+    def __init__(self, suggestions: Dict[str, float], top_k: int = 10, max_prefix_length: int = 3,
+                 ngram_length: int = 3) -> None:
+        """
+        @param suggestions: Label to its aggregated weight
+        @param top_k: Number of labels precomputed per short prefix
+        @param max_prefix_length: Prefixes up to this length have precomputed results
+        @param ngram_length: Maximal length of indexed n-grams
+        """
+        self.labels = [label for label, _ in sorted(suggestions.items(), key=lambda item: item[1], reverse=True)]
+        self.lowered = [label.lower() for label in self.labels]
+
+        order = sorted(range(len(self.labels)), key=lambda rank: self.lowered[rank])
+        self.sorted_lowered = [self.lowered[rank] for rank in order]
+        self.sorted_ranks = order
+
+        self.top_k = top_k
+        self.max_prefix_length = max_prefix_length
+        self.ngram_length = ngram_length
+        self.top_by_prefix = collections.defaultdict(list)
+        self.ngrams = collections.defaultdict(list)
+        # ranks are visited in ascending order, hence all lists are sorted by weight
+        for rank, label in enumerate(self.lowered):
+            for length in range(1, min(max_prefix_length, len(label)) + 1):
+                top = self.top_by_prefix[label[:length]]
+                if len(top) < top_k:
+                    top.append(rank)
+            grams = set(label[start:start + length]
+                        for length in range(1, ngram_length + 1)
+                        for start in range(len(label) - length + 1))
+            for gram in grams:
+                self.ngrams[gram].append(rank)
+        self.top_by_prefix = dict(self.top_by_prefix)
+        self.ngrams = dict(self.ngrams)
+
+    def prefix(self, phrase: str, limit: int) -> List[str]:
+        """
+        @param phrase: Beginning of the label, case-insensitive
+        @param limit: Maximal number of labels
+        @return: The heaviest labels starting with phrase
+        """
+        phrase = phrase.lower()
+        if limit <= 0:
+            return []
+        if not phrase:
+            return self.labels[:limit]
+        if len(phrase) <= self.max_prefix_length and limit <= self.top_k:
+            return [self.labels[rank] for rank in self.top_by_prefix.get(phrase, [])[:limit]]
+
+        start = bisect.bisect_left(self.sorted_lowered, phrase)
+        end = bisect.bisect_left(self.sorted_lowered, phrase + "\U0010ffff", lo=start)
+        return [self.labels[rank] for rank in heapq.nsmallest(limit, self.sorted_ranks[start:end])]
+
+    def substring(self, phrase: str, limit: int) -> List[str]:
+        """
+        @param phrase: Part of the label, case-insensitive
+        @param limit: Maximal number of labels
+        @return: The heaviest labels containing phrase
+        """
+        phrase = phrase.lower()
+        if limit <= 0:
+            return []
+        if not phrase:
+            return self.labels[:limit]
+        if len(phrase) <= self.ngram_length:
+            return [self.labels[rank] for rank in self.ngrams.get(phrase, [])[:limit]]
+
+        candidates = None
+        for start in range(len(phrase) - self.ngram_length + 1):
+            postings = self.ngrams.get(phrase[start:start + self.ngram_length])
+            if postings is None:
+                return []
+            if candidates is None or len(postings) < len(candidates):
+                candidates = postings
+
+        result = []
+        for rank in candidates:
+            if phrase in self.lowered[rank]:
+                result.append(self.labels[rank])
+                if len(result) >= limit:
+                    break
+        return result
@@ -0,0 +1,76 @@
+"""
+Timeline entries in the vis.js format, computed once from the timeline dates of the query index.
+"""
+
+import bisect
+import calendar
+from typing import Dict, List, Optional
+
+import cache
+import responses
+
+
+def create_timeline_item(item_id: int, timestamp: str) -> Dict:
+    """
+    @param item_id: ID of the vis.js item
+    @param timestamp: YYYY[-MM[-DD]]
+    @return: vis.js timeline item spanning the period of the timestamp
+    """
+    date = timestamp.split("-")
+    # Day granularity
+    if len(date) == 3:
+        return {"id": item_id, "content": timestamp[5:] + "  ", "start": timestamp,
+                "type": "point", "group": "D", "title": timestamp}
+    # Month granularity
+    if len(date) == 2:
+        last_day = calendar.monthrange(int(date[0]), int(date[1]))[1]
+        return {"id": item_id, "content": timestamp, "group": "M",
+                "start": timestamp + "-01", "end": "{}-{:02d}".format(timestamp, last_day),
+                "title": timestamp}
+    # Year granularity
+    return {"id": item_id, "content": timestamp, "group": "Y",
+            "start": timestamp + "-01-01", "end": timestamp + "-12-31",
+            "title": timestamp}
+
+
+class Timeline:
+    """
+    Holds the items of the whole timeline and their pre-encoded response. Responses restricted to a date window or
+    granularities are cached as well.
+    """
+    dates: List[str]
+    items: List[Dict]
+    payload: responses.EncodedPayload
+
+    def __init__(self, timeline_dates: List[str], last_modified: float = None, max_cached_windows: int = 256) -> None:
+        """
+        @param timeline_dates: Timestamps of all graphs in chronological order
+        @param last_modified: Time the underlying data changed, as seconds since the epoch
+        @param max_cached_windows: Maximal number of cached responses for restricted timelines
+        """
+        self.dates = timeline_dates
+        self.items = [create_timeline_item(item_id, timestamp) for item_id, timestamp in enumerate(timeline_dates)]
+        self.last_modified = last_modified
+        self.payload = responses.EncodedPayload.from_json(self.items, last_modified)
+        self.windows = cache.LRUCache(max_cached_windows)
+
+    def window(self, start: Optional[str] = None, end: Optional[str] = None,
+               granularity: Optional[str] = None) -> responses.EncodedPayload:
+        """
+        @param start: First timestamp as YYYY[-MM[-DD]], inclusive
+        @param end: Last timestamp as YYYY[-MM[-DD]], inclusive, including all timestamps within its period
+        @param granularity: Any combination of "Y", "M" and "D", e.g., "YM"
+        @return: The pre-encoded items within the window
+        """
+        if not (start or end or granularity):
+            return self.payload
+
+        def compute() -> responses.EncodedPayload:
+            first = bisect.bisect_left(self.dates, start) if start else 0
+            last = bisect.bisect_right(self.dates, end + "\U0010ffff") if end else len(self.dates)
+            items = self.items[first:last]
+            if granularity:
+                items = [item for item in items if item["group"] in granularity.upper()]
+            return responses.EncodedPayload.from_json(items, self.last_modified)
+
+        return self.windows.get_or_compute((start, end, granularity), compute)
@@ -0,0 +1,108 @@
+"""
+Term trajectories served from the term x timestamp table written by the pipeline (see graphs/trajectories.py). The
+arrays are memory-mapped, s.t. a query reads only the contiguous row of its term.
+"""
+
+import bisect
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Version of the table format, see graphs/trajectories.py
+TRAJECTORY_TABLE_VERSION = 1
+GRANULARITIES = "YMD"
+
+
+class TrajectoryTable:
+    """
+    Read-only access to the table. Only the labels and timestamps are held in memory.
+    """
+    terms: List[str]
+    rows: Dict[str, int]
+    lowered_rows: Dict[str, int]
+    timestamps: List[str]
+    granularities: np.ndarray
+
+    def __init__(self, path: str) -> None:
+        """
+        @param path: Directory of the table
+        """
+        with open(os.path.join(path, "timestamps.json"), "r") as f:
+            header = json.load(f)
+        if header.get("version") != TRAJECTORY_TABLE_VERSION:
+            raise ValueError("Unsupported trajectory table version: " + str(header.get("version")))
+        self.timestamps = header["timestamps"]
+        # index into GRANULARITIES of every column
+        self.granularities = np.array([timestamp.count("-") for timestamp in self.timestamps], dtype=np.uint8)
+
+        with open(os.path.join(path, "terms.json"), "r") as f:
+            self.terms = json.load(f)
+        self.rows = {term: row for row, term in enumerate(self.terms)}
+        # case-insensitive fallback, the first (lexicographically smallest) label wins
+        self.lowered_rows = {}
+        for row, term in enumerate(self.terms):
+            self.lowered_rows.setdefault(term.lower(), row)
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+        self.indptr = load("indptr")
+        self.columns = load("columns")
+        self.weights = load("weights")
+        self.counts = load("counts")
+        self.partners = load("partners")
+        self.support = load("support")
+
+    def row(self, term: str) -> Optional[int]:
+        row = self.rows.get(term)
+        if row is None:
+            row = self.lowered_rows.get(term.lower())
+        return row
+
+    def trajectory(self, term: str, granularity: Optional[str] = "Y", start: Optional[str] = None,
+                   end: Optional[str] = None) -> Optional[Dict]:
+        """
+        @param term: Label of the term, matched case-insensitively if there is no exact match
+        @param granularity: Only timestamps of these granularities, any combination of "Y", "M" and "D", all if empty
+        @param start: First timestamp as YYYY[-MM[-DD]], inclusive
+        @param end: Last timestamp as YYYY[-MM[-DD]], inclusive, including all timestamps within its period
+        @return: The time series of the term as parallel arrays "timestamps", "weights" and "counts", and its strongest
+        co-occurring terms per timestamp as "partners" with their "support", or None if the term does not exist
+        """
+        row = self.row(term)
+        if row is None:
+            return None
+
+        begin, stop = int(self.indptr[row]), int(self.indptr[row + 1])
+        columns = np.asarray(self.columns[begin:stop])
+        # restrict to the date range, the columns of a row are sorted chronologically
+        first = bisect.bisect_left(self.timestamps, start) if start else 0
+        last = bisect.bisect_right(self.timestamps, end + "\U0010ffff") if end else len(self.timestamps)
+        lo, hi = np.searchsorted(columns, [first, last])
+        selected = np.arange(lo, hi)
+        if granularity:
+            allowed = [GRANULARITIES.index(g) for g in granularity.upper() if g in GRANULARITIES]
+            selected = selected[np.isin(self.granularities[columns[lo:hi]], allowed)]
+
+        entries = begin + selected
+        partners = np.asarray(self.partners[entries])
+        support = np.asarray(self.support[entries])
+        return {"term": self.terms[row],
+                "timestamps": [self.timestamps[column] for column in columns[selected].tolist()],
+                "weights": np.asarray(self.weights[entries]).tolist(),
+                "counts": np.asarray(self.counts[entries]).tolist(),
+                "partners": [[self.terms[partner] for partner in entry if partner >= 0] for entry in partners.tolist()],
+                "support": [[value for partner, value in zip(entry_partners, entry) if partner >= 0]
+                            for entry_partners, entry in zip(partners.tolist(), support.tolist())]}
+
+
+def load_table(path: str) -> Optional[TrajectoryTable]:
+    """
+    @param path: Directory of the table, no table is used if empty
+    @return: The table, or None if it does not exist
+    """
+    if not path or not os.path.isfile(os.path.join(path, "timestamps.json")):
+        return None
+    return TrajectoryTable(path)
@@ -0,0 +1,96 @@
+"""
+Generator for synthetic corpora as they are returned by HeidelTime, i.e., texts with TIMEX3 tags around date
+expressions, and a lightweight replacement for the spaCy processing that turns tagged documents into the bag of words
+model of documents/Documents.py.
+"""
+import bisect
+import calendar
+import itertools
+import random
+import re
+import typing
+
+import documents.Documents as Documents
+
+_MONTH_NAMES = list(calendar.month_name)[1:]
+_SENTENCE = re.compile(r"[^.]+\.?")
+_TOKEN = re.compile(r"\S+")
+
+
+def _dateExpression(rng: random.Random, start_year: int, end_year: int, granularities: str) -> (str, str):
+    """
+    @return: (TIMEX3 value, surface text) of a random date
+    """
+    year = rng.randint(start_year, end_year)
+    granularity = rng.choice(granularities)
+    if granularity == "Y":
+        return "{:04d}".format(year), "{:d}".format(year)
+    month = rng.randint(1, 12)
+    if granularity == "M":
+        return "{:04d}-{:02d}".format(year, month), "{} {:d}".format(_MONTH_NAMES[month - 1], year)
+    day = rng.randint(1, calendar.monthrange(year, month)[1])
+    return "{:04d}-{:02d}-{:02d}".format(year, month, day), "{:d} {} {:d}".format(day, _MONTH_NAMES[month - 1], year)
+
+
+def createTaggedCorpus(num_documents: int, sentences_per_document: int = 20, words_per_sentence: int = 8,
+                       date_density: float = 0.2, vocabulary_size: int = 5000, start_year: int = 1900,
+                       end_year: int = 2000, granularities: str = "YMD", seed: int = 0) -> typing.List[dict]:
+    """
+    Creates documents of random sentences. Words are drawn from a synthetic vocabulary with Zipf-distributed
+    frequencies, and sentences contain TIMEX3-tagged dates at the given density.
+    @param num_documents: Number of documents
+    @param sentences_per_document: Number of sentences in each document
+    @param words_per_sentence: Number of words in each sentence, excluding dates
+    @param date_density: Probability that a sentence contains a date, values above 1 add several dates per sentence
+    @param vocabulary_size: Number of distinct words
+    @param start_year: First year of the dates
+    @param end_year: Last year of the dates
+    @param granularities: Granularities of the dates, any combination of "Y", "M" and "D"
+    @param seed: Seed for the random generator
+    @return: List of documents with fields "id" and "text", as returned by parser.readAndHeidelTimeJson
+    """
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10)))
+                  for _ in range(vocabulary_size)]
+    cumulative_weights = list(itertools.accumulate(1 / rank for rank in range(1, vocabulary_size + 1)))
+
+    data = []
+    timex_id = 1
+    for idx in range(1, num_documents + 1):
+        sentences = []
+        for _ in range(sentences_per_document):
+            words = rng.choices(vocabulary, cum_weights=cumulative_weights, k=words_per_sentence)
+            num_dates = int(date_density) + (rng.random() < date_density - int(date_density))
+            for _ in range(num_dates):
+                value, surface = _dateExpression(rng, start_year, end_year, granularities)
+                tag = '<TIMEX3 tid="t{}" type="DATE" value="{}">{}</TIMEX3>'.format(timex_id, value, surface)
+                timex_id += 1
+                words.insert(rng.randint(0, len(words)), tag)
+            sentences.append(" ".join(words) + ".")
+        data.append({"id": idx, "text": " ".join(sentences)})
+    return data
+
+
+def createSentences(document: Documents.Document) -> Documents.Document:
+    """
+    Splits the text of a document with parsed TIMEX3 tags (see DocumentsCreator.__parse_HeidelTimeTags__) into sentences
+    at periods and into words at whitespace. Stands in for the spaCy processing, s.t. later stages can be benchmarked
+    without a language model.
+    @param document: Document with text and annotations, but without sentences
+    @return: The document with sentences
+    """
+    annotations = sorted(document.annotations, key=lambda annotation: annotation.start)
+    starts = [annotation.start for annotation in annotations]
+    for sentence_match in _SENTENCE.finditer(document.text):
+        sentence = Documents.Sentence(sentence_match.start(), sentence_match.end(), document)
+        for token in _TOKEN.finditer(sentence_match.group()):
+            token_start = sentence_match.start() + token.start()
+            position = bisect.bisect_left(starts, token_start)
+            if position < len(starts) and starts[position] == token_start:
+                annotation = annotations[position]
+                sentence.addAnnotatedWord(Documents.Word(str(annotation.timestamp), "DATE", True, sentence,
+                                                         annotation.timestamp), annotation)
+            else:
+                sentence.addWord(Documents.Word(token.group().rstrip("."), "", False, sentence))
+        document.addSentence(sentence)
+    return document
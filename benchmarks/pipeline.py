@@ -0,0 +1,259 @@
+"""
+Benchmark of every processing stage, from parsing the TIMEX3 tags of a synthetic corpus to answering API requests. Each
+stage is timed on its own, and optionally profiled for its peak memory with tracemalloc in a second run, s.t. tracing
+does not distort the timings. Results are written as a JSON report, which can be compared against the report of another
+commit.
+
+Run from the repository root with
+    python3 -m benchmarks.pipeline --documents 2000 --output report.json
+    python3 -m benchmarks.pipeline --documents 2000 --memory --compare report.json
+"""
+import argparse
+import collections
+import contextlib
+import copy
+import datetime
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+import typing
+
+from benchmarks.corpus import createTaggedCorpus, createSentences
+from cooccurrences.cooccurrences import extract_timecentric_cooccurrences_from_collection, \
+    extract_timecentric_cooccurrences_to_runs
+from documents.DocumentsCreator import DocumentsCreator
+import documents.Documents as Documents
+from graphs.GraphManager import GraphManager
+from graphs.trajectories import write_trajectory_table
+
+# The API modules are imported by their plain names, as done by api/API.py. The folder is appended, s.t. the packages of
+# the pipeline take precedence over equally named API modules.
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api"))
+import cache  # noqa: E402
+import index  # noqa: E402
+import store  # noqa: E402
+import suggest  # noqa: E402
+import timeline  # noqa: E402
+
+
+class StageRecorder:
+    """
+    Records the duration, and if enabled the peak memory allocated on top of the memory held before, of each stage.
+    Output of the stages is suppressed.
+    """
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str, items: int = None) -> typing.Iterator[None]:
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = timeit.default_timer()
+            yield
+            seconds = timeit.default_timer() - start
+        result = {"seconds": seconds}
+        if self.trace_memory:
+            result["peak_memory"] = tracemalloc.get_traced_memory()[1] - before
+        if items is not None:
+            result["items"] = items
+        self.results[name] = result
+
+
+def _tagParser() -> DocumentsCreator:
+    """
+    A DocumentsCreator that can only parse TIMEX3 tags, created without loading a spaCy model.
+    """
+    creator = DocumentsCreator.__new__(DocumentsCreator)
+    creator.tag_start = re.compile(r"<[^/].*?>")
+    creator.tag_end = re.compile(r"</.*?>")
+    return creator
+
+
+def runStages(corpus: typing.List[dict], args: argparse.Namespace, recorder: StageRecorder) -> None:
+    """
+    Runs all stages on the corpus, in the order of main.py followed by the API.
+    """
+    spill_folder = tempfile.TemporaryDirectory()
+    pipeline_args = argparse.Namespace(window_size=args.window_size, start_year=-float("inf"),
+                                       end_year=float("inf"), disable_tqdm=True, spill_records=args.spill_records,
+                                       temp_folder=spill_folder.name)
+    corpus = copy.deepcopy(corpus)
+    creator = _tagParser()
+
+    with recorder.stage("tag_parsing", len(corpus)):
+        parsed = [creator.__parse_HeidelTimeTags__(doc) for doc in corpus]
+
+    with recorder.stage("bag_of_words", len(parsed)):
+        collection = Documents.DocumentCollection([createSentences(doc) for doc in parsed])
+
+    if args.spill_records:
+        with recorder.stage("cooccurrences"):
+            cooccurrence_runs = extract_timecentric_cooccurrences_to_runs(collection, pipeline_args)
+        recorder.results["cooccurrences"]["items"] = len(cooccurrence_runs.pair_runs)
+
+        with recorder.stage("graph_construction"):
+            graphs = GraphManager(collections.defaultdict(None))
+            graphs.merge_cooccurrence_runs(cooccurrence_runs)
+        spill_folder.cleanup()
+    else:
+        with recorder.stage("cooccurrences"):
+            timecentric_coocs = extract_timecentric_cooccurrences_from_collection(collection, pipeline_args)
+        recorder.results["cooccurrences"]["items"] = sum(len(coocs) for coocs in timecentric_coocs.values())
+
+        with recorder.stage("graph_construction"):
+            graphs = GraphManager.from_timecentric_cooccurrences(timecentric_coocs)
+    recorder.results["graph_construction"]["items"] = len(graphs.graphs)
+
+    with recorder.stage("weighting"):
+        graphs.weight_graph_nodes(weighting="tf_itf_per_granularity")
+
+    with recorder.stage("trajectory_table"), tempfile.TemporaryDirectory() as folder:
+        write_trajectory_table(graphs, folder)
+
+    with recorder.stage("pruning"):
+        graphs.reduce_to_highest_weighted_nodes(args.nodes)
+
+    with recorder.stage("export"):
+        graphs_json = graphs.create_graphs_json()
+        provenance_json = graphs.create_provenance_json()
+        graphs_bytes = len(json.dumps(graphs_json, ensure_ascii=False))
+        provenance_bytes = len(json.dumps(provenance_json, ensure_ascii=False))
+    recorder.results["export"]["bytes"] = graphs_bytes + provenance_bytes
+
+    graph_store = store.InMemoryGraphStore(graphs_json, provenance_json)
+    with recorder.stage("api_index", graph_store.count()):
+        api_index = index.ApiIndex.from_graphs(graph_store.iter_graphs())
+        query_suggestions = suggest.SuggestionIndex(api_index.suggestions)
+        vis_timeline = timeline.Timeline(api_index.timeline_dates, last_modified=api_index.created)
+
+    graph_cache = cache.GraphCache(graph_store.get_graph, max_elements=10 ** 9, max_responses=10 ** 6)
+    timestamps = api_index.timeline_dates
+    with recorder.stage("api_graphs", len(timestamps)):
+        for timestamp in timestamps:
+            graph_cache.payload(timestamp, 10, "json")
+    with recorder.stage("api_graphs_cached", len(timestamps)):
+        for timestamp in timestamps:
+            graph_cache.cached_payload(timestamp, 10, "json").encoded("gzip")
+
+    terms = [label.lower() for label in list(api_index.suggestions.keys())[:100]]
+    with recorder.stage("api_search", len(terms)):
+        for first, second in zip(terms, terms[1:] + terms[:1]):
+            api_index.search.query([first])
+            api_index.search.query([first, second], mode="or", ranked=True)
+
+    prefixes = sorted(set(term[:length] for term in terms for length in (1, 2, 4)))
+    with recorder.stage("api_suggest", len(prefixes)):
+        for prefix in prefixes:
+            query_suggestions.prefix(prefix, 5)
+            query_suggestions.substring(prefix, 5)
+
+    years = sorted(set(timestamp[:4] for timestamp in timestamps))
+    with recorder.stage("api_timeline", len(years)):
+        for year in years:
+            vis_timeline.window(year, year, "MD").encoded("gzip")
+
+
+def _gitCommit() -> typing.Optional[str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def run(args: argparse.Namespace) -> typing.Dict[str, typing.Any]:
+    """
+    Generates the corpus and benchmarks all stages.
+    @return: The report
+    """
+    corpus = createTaggedCorpus(args.documents, sentences_per_document=args.sentences, words_per_sentence=args.words,
+                                date_density=args.date_density, vocabulary_size=args.vocabulary, seed=args.seed)
+
+    recorder = StageRecorder()
+    runStages(corpus, args, recorder)
+    stages = recorder.results
+
+    if args.memory:
+        recorder = StageRecorder(trace_memory=True)
+        tracemalloc.start()
+        try:
+            runStages(corpus, args, recorder)
+        finally:
+            tracemalloc.stop()
+        for name, result in recorder.results.items():
+            stages[name]["peak_memory"] = result["peak_memory"]
+
+    return {"commit": _gitCommit(),
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": vars(args),
+            "stages": stages}
+
+
+def compare(report: typing.Dict[str, typing.Any], baseline: typing.Dict[str, typing.Any]) -> None:
+    print("Compared to commit {}:".format(baseline.get("commit")))
+    ignored = ("output", "compare", "memory")
+    for name, value in report["parameters"].items():
+        if name not in ignored and baseline.get("parameters", {}).get(name) != value:
+            print("Warning: parameter {} differs ({} vs. {}).".format(name, value, baseline["parameters"].get(name)))
+    for name, result in report["stages"].items():
+        previous = baseline["stages"].get(name)
+        if not previous:
+            continue
+        line = "{:<20} time {:>7.2f}x".format(name, result["seconds"] / max(previous["seconds"], 1e-9))
+        if "peak_memory" in result and "peak_memory" in previous:
+            line += ", peak memory {:>7.2f}x".format(result["peak_memory"] / max(previous["peak_memory"], 1))
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark all processing stages on a synthetic corpus.")
+    parser.add_argument("--documents", type=int, default=200, help="Number of synthetic documents.")
+    parser.add_argument("--sentences", type=int, default=20, help="Sentences per synthetic document.")
+    parser.add_argument("--words", type=int, default=8,
+                        help="Words per synthetic sentence, i.e., words left after stop word removal.")
+    parser.add_argument("--date-density", type=float, default=0.2, dest="date_density",
+                        help="Probability of a date in a sentence.")
+    parser.add_argument("--vocabulary", type=int, default=5000, help="Number of distinct words.")
+    parser.add_argument("--window-size", type=int, default=2, dest="window_size",
+                        help="Window size for co-occurrence extraction.")
+    parser.add_argument("--spill-records", type=int, default=None, dest="spill_records",
+                        help="Extract co-occurrences in bounded-memory mode with this many records in memory.")
+    parser.add_argument("--nodes", type=int, default=25, help="Number of nodes kept per graph.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the corpus generator.")
+    parser.add_argument("--memory", action="store_true", help="Measure the peak memory of each stage in a second run.")
+    parser.add_argument("--output", type=str, default=None, help="File the JSON report is written to.")
+    parser.add_argument("--compare", type=str, default=None, help="JSON report of a previous run to compare against.")
+    args = parser.parse_args()
+
+    report = run(args)
+    for name, result in report["stages"].items():
+        line = "{:<20} {:>9.4f}s".format(name, result["seconds"])
+        if "peak_memory" in result:
+            line += " {:>10.1f} MiB".format(result["peak_memory"] / 2 ** 20)
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
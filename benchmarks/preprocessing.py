@@ -0,0 +1,152 @@
+"""
+Micro-benchmark for the text cleanup before and after tagging with HeidelTime. Compares the former implementations of
+jsonparser._preprocessJson and heideltimeparser._removeHeaderAndFooterFromHeidelTimedDoc against the current ones on
+synthetic corpora. The character cleanup is also compared against single-pass alternatives, a translation table and a
+combined regular expression.
+
+Run from the repository root with
+    python3 -m benchmarks.preprocessing --documents 10000
+"""
+import argparse
+import copy
+import random
+import re
+import timeit
+import typing
+
+import parser.heideltimeparser as heideltimeparser
+import parser.jsonparser as jsonparser
+
+
+def _legacyPreprocessJson(data: typing.List[dict]) -> typing.List[dict]:
+    """
+    The former implementation of jsonparser._preprocessJson, one str.replace pass per replacement.
+    """
+    char_replace = [("&", " "), ("<", " "), (">", " "), (r"\u0007", ""), (r"\b", ""), ("–", "-")]
+    for d in data:
+        for y0, y1 in char_replace:
+            d["text"] = d["text"].replace(y0, y1)
+    return data
+
+
+def _translatePreprocessJson(data: typing.List[dict]) -> typing.List[dict]:
+    """
+    Alternative to jsonparser._preprocessJson: single characters are replaced in one pass with a translation table,
+    which cannot express the replacements of longer patterns. These are replaced with str.replace afterwards.
+    """
+    table = str.maketrans({old: new for old, new in jsonparser.DEFAULT_CHAR_REPLACEMENTS if len(old) == 1})
+    longer = [(old, new) for old, new in jsonparser.DEFAULT_CHAR_REPLACEMENTS if len(old) > 1]
+    for d in data:
+        text = d["text"].translate(table)
+        for old, new in longer:
+            text = text.replace(old, new)
+        d["text"] = text
+    return data
+
+
+def _regexPreprocessJson(data: typing.List[dict]) -> typing.List[dict]:
+    """
+    Alternative to jsonparser._preprocessJson: all patterns are replaced in one pass with a combined regular expression.
+    """
+    replacements = dict(jsonparser.DEFAULT_CHAR_REPLACEMENTS)
+    # longer patterns first, s.t. a pattern is not shadowed by its prefix
+    pattern = re.compile("|".join(re.escape(old) for old in sorted(replacements, key=len, reverse=True)))
+    for d in data:
+        d["text"] = pattern.sub(lambda match: replacements[match.group(0)], d["text"])
+    return data
+
+
+def _legacyRemoveHeaderAndFooter(doc: dict) -> dict:
+    """
+    The former implementation of heideltimeparser._removeHeaderAndFooterFromHeidelTimedDoc.
+    """
+    doc["text"] = doc["text"].replace('<?xml version="1.0"?>\n<!DOCTYPE TimeML SYSTEM "TimeML.dtd">\n<TimeML>\n', '')
+    doc["text"] = doc["text"].replace('\n</TimeML>\n\n', '')
+    return doc
+
+
+def createSyntheticCorpus(num_documents: int, words_per_document: int, special_char_rate: float = 0.01,
+                          ascii_only: bool = False, seed: int = 0) -> typing.List[dict]:
+    """
+    Creates documents of random words, sprinkled with characters that are removed during preprocessing.
+    @param num_documents: Number of documents
+    @param words_per_document: Number of words in each document
+    @param special_char_rate: Probability that a word is followed by a special character
+    @param ascii_only: Only use ASCII special characters
+    @param seed: Seed for the random generator
+    @return: List of documents with field "text"
+    """
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+                  for _ in range(5000)]
+    special_chars = ["&", "<", ">", r"\b"] if ascii_only else ["&", "<", ">", "–", r"\b", "\u0007"]
+
+    data = []
+    for idx in range(num_documents):
+        words = []
+        for _ in range(words_per_document):
+            words.append(rng.choice(vocabulary))
+            if rng.random() < special_char_rate:
+                words.append(rng.choice(special_chars))
+        data.append({"id": idx, "text": " ".join(words) + "."})
+    return data
+
+
+def _time(func: typing.Callable[[typing.List[dict]], typing.Any], corpus: typing.List[dict], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        data = copy.deepcopy(corpus)
+        start = timeit.default_timer()
+        func(data)
+        timings.append(timeit.default_timer() - start)
+    return min(timings)
+
+
+def run(num_documents: int, words_per_document: int, repeat: int) -> typing.Dict[str, typing.Dict[str, float]]:
+    """
+    Times the former, the current and the alternative implementations, and checks that they produce the same texts.
+    @return: Best time of each implementation in seconds, per synthetic corpus and stage
+    """
+    header = '<?xml version="1.0"?>\n<!DOCTYPE TimeML SYSTEM "TimeML.dtd">\n<TimeML>\n'
+    footer = '\n</TimeML>\n\n'
+
+    results = {}
+    for corpus_name, ascii_only in [("ascii", True), ("non_ascii", False)]:
+        corpus = createSyntheticCorpus(num_documents, words_per_document, ascii_only=ascii_only)
+        tagged_corpus = [{"text": header + doc["text"] + footer} for doc in corpus]
+
+        remove_header_and_footer = heideltimeparser._removeHeaderAndFooterFromHeidelTimedDoc
+        candidates = [("preprocess", {"legacy": _legacyPreprocessJson,
+                                      "current": jsonparser._preprocessJson,
+                                      "translate": _translatePreprocessJson,
+                                      "regex": _regexPreprocessJson}, corpus),
+                      ("header_footer", {"legacy": lambda data: [_legacyRemoveHeaderAndFooter(d) for d in data],
+                                         "current": lambda data: [remove_header_and_footer(d) for d in data]},
+                       tagged_corpus)]
+        for stage, implementations, data in candidates:
+            legacy_texts = [d["text"] for d in implementations["legacy"](copy.deepcopy(data))]
+            for name, implementation in implementations.items():
+                if [d["text"] for d in implementation(copy.deepcopy(data))] != legacy_texts:
+                    raise AssertionError("Implementation {} of {} produces different texts.".format(name, stage))
+
+            results[corpus_name + "/" + stage] = {name: _time(implementation, data, repeat)
+                                                  for name, implementation in implementations.items()}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the character cleanup of input documents.")
+    parser.add_argument("--documents", type=int, default=2000, help="Number of synthetic documents.")
+    parser.add_argument("--words", type=int, default=500, help="Words per synthetic document.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed repetitions.")
+    args = parser.parse_args()
+
+    results = run(args.documents, args.words, args.repeat)
+    for name, timings in results.items():
+        print("{:<26}".format(name) + ", ".join("{} {:.4f}s ({:.2f}x)".format(implementation, timing,
+                                                                              timings["legacy"] / timing)
+                                                for implementation, timing in timings.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,17 @@
 import argparse
 import typing
 import collections
+import heapq
 import itertools
-import sys
+import operator
+import os
+import pickle
+import shutil
+import tempfile
 
 import documents.Documents as Documents
 import documents.Timestamps as Timestamps
+import metrics.metrics as metrics
 
 
 def extract_timecentric_cooccurrences_from_collection(docs: Documents.DocumentCollection, args: argparse.Namespace) \
@@ -16,38 +22,14 @@ def extract_timecentric_cooccurrences_from_collection(docs: Documents.DocumentCo
     @param args: arguments from command-line arguments, i.e., start and end year as well as window size
     @return: A dictionary of time-centric co-occurrences with timestamps as keys
     """
-    # Unpack inputs
-    window_size = args.window_size
-    start_year = args.start_year
-    end_year = args.end_year
-
     # dictionary in which results are stored
     timecentric_coocs = collections.defaultdict(list)
 
-    count = 1
-    max_count = len(docs.documents)
-    for doc in docs.documents:
-        print("Document:", count, "/", max_count, end="\n")
-        count += 1
-        sys.stdout.flush()
-        sentences = doc.sentences
-
-        for source_sentID in range(len(sentences)):
-            # unpack sentence information
-            source_sentence = sentences[source_sentID]
-            annotations = source_sentence.annotations
-            startID = max(0, source_sentID - window_size)
-            endID = min(len(sentences) - 1, source_sentID + window_size)
-            # Iterate over all words that are annotated as timestamp in the sentence
-            for wordID in annotations.keys():
-                # If the date is None or not within the specified time frame, it is not processed for co-occurrences
-                current_year = annotations[wordID].timestamp.year
-                if current_year is None or current_year < start_year or current_year > end_year:
-                    continue
-                # All combinations of words in the window around the timestamp are co-occurrences
-                target_sentences = sentences[startID:endID+1]
-                coocs = list(itertools.combinations([word for sent in target_sentences for word in sent.words], 2))
-                timecentric_coocs[annotations[wordID].timestamp].extend(coocs)
+    for timestamp, words, _ in iterate_windows(docs, args):
+        # All combinations of words in the window around the timestamp are co-occurrences
+        coocs = list(itertools.combinations(words, 2))
+        timecentric_coocs[timestamp].extend(coocs)
+        metrics.count("pairs", len(coocs))
 
     return timecentric_coocs
 
@@ -67,3 +49,283 @@ def unify_timecentric_cooccurrences(timecentric_cooccurrences: typing.List[typin
     return result
 
 
+def window_records(timestamp: Timestamps.Timestamp, words: typing.List[Documents.Word]) \
+        -> (typing.List[int], typing.List[tuple], typing.List[tuple]):
+    """
+    Creates the records of all combinations of the words in the window around a date, see CooccurrenceRuns.
+    @param timestamp: The date
+    @param words: The words of the window
+    @return: Keys of the timestamp and its coarser granularities from finest to coarsest, pair records and word records
+    """
+    keys = []
+    while timestamp is not None:
+        keys.append(timestamp.key)
+        timestamp = timestamp.parent
+    pairs = []
+    word_records = []
+    if len(words) < 2:
+        return keys, pairs, word_records
+    for word1, word2 in itertools.combinations(words, 2):
+        if word1.lemma > word2.lemma:
+            word1, word2 = word2, word1
+        sentence1, sentence2 = word1.belongs_to, word2.belongs_to
+        pair = (word1.lemma, word2.lemma, sentence1.belongs_to.idx, sentence1.sent_start, sentence1.sent_end,
+                sentence2.sent_start, sentence2.sent_end)
+        pairs.extend((key,) + pair for key in keys)
+    for word in words:
+        word_records.extend((key, word.lemma, word.idx) for key in keys)
+    return keys, pairs, word_records
+
+
+class CooccurrenceRuns:
+    """
+    Co-occurrences as compact records, which are sorted and spilled to disk in runs whenever the buffer holds the
+    maximal number of records. The runs are merged externally, s.t. memory is bounded by the buffer size instead of the
+    number of co-occurrences. Records are
+        pairs: (timestamp key, label 1, label 2, doc id, sentence 1 start, sentence 1 end, sentence 2 start,
+                sentence 2 end), with label 1 <= label 2 as in Graph.add_edge
+        words: (timestamp key, label, word idx)
+    and are stored for the timestamp of the co-occurrence as well as its coarser granularities.
+    """
+    # records per pickled block of a run
+    block_size = 4096
+
+    def __init__(self, folder: str, max_records: int) -> None:
+        """
+        @param folder: Folder in which a temporary directory for the runs is created
+        @param max_records: Maximal number of pair and word records held in memory
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="cooccurrence_runs_", dir=folder)
+        self.max_records = max_records
+        # keys of all timestamps with a window, a graph is created even if no window has two words
+        self.timestamps = set()
+        self.pairs = set()
+        self.words = set()
+        self.pair_runs = []
+        self.word_runs = []
+
+    def add_window(self, timestamp: Timestamps.Timestamp, words: typing.List[Documents.Word]) -> None:
+        """
+        Adds all combinations of the words in the window around a date, see
+        extract_timecentric_cooccurrences_from_collection.
+        """
+        keys, pairs, word_records = window_records(timestamp, words)
+        self.timestamps.update(keys)
+        self.pairs.update(pairs)
+        self.words.update(word_records)
+        if len(self.pairs) + len(self.words) >= self.max_records:
+            self.spill()
+
+    def _write_run(self, records: typing.Set[tuple], runs: typing.List[str]) -> None:
+        path = os.path.join(self.directory, "run{}.pickle".format(len(self.pair_runs) + len(self.word_runs)))
+        records = sorted(records)
+        with open(path, "wb") as f:
+            for start in range(0, len(records), self.block_size):
+                pickle.dump(records[start:start + self.block_size], f, protocol=pickle.HIGHEST_PROTOCOL)
+        runs.append(path)
+
+    def spill(self) -> None:
+        """
+        Sorts the buffered records and writes them to disk as a run.
+        """
+        if not self.pairs and not self.words:
+            return
+        if self.pairs:
+            self._write_run(self.pairs, self.pair_runs)
+            self.pairs = set()
+        if self.words:
+            self._write_run(self.words, self.word_runs)
+            self.words = set()
+        metrics.count("spilled_runs")
+
+    @staticmethod
+    def _read_run(path: str) -> typing.Iterator[tuple]:
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    block = pickle.load(f)
+                except EOFError:
+                    return
+                yield from block
+
+    def _merge(self, runs: typing.List[str]) -> typing.Iterator[tuple]:
+        previous = None
+        for record in heapq.merge(*[self._read_run(path) for path in runs]):
+            # equal records of different runs are adjacent after merging
+            if record != previous:
+                yield record
+            previous = record
+
+    def merged_pairs(self) -> typing.Iterator[tuple]:
+        """
+        @return: Distinct pair records in sorted order, i.e., grouped by timestamp and pair of labels
+        """
+        self.spill()
+        return self._merge(self.pair_runs)
+
+    def merged_words(self) -> typing.Iterator[tuple]:
+        """
+        @return: Distinct word records in sorted order, i.e., grouped by timestamp and label
+        """
+        self.spill()
+        return self._merge(self.word_runs)
+
+    def merged_nodes(self) -> typing.Iterator[typing.Tuple[int, str]]:
+        """
+        @return: Distinct (timestamp key, label) of the word records in sorted order, i.e., the nodes of all graphs
+        """
+        for node, _ in itertools.groupby(record[:2] for record in self.merged_words()):
+            yield node
+
+    def merged_by_timestamp(self) -> typing.Iterator[typing.Tuple[int, typing.List[tuple], typing.List[tuple]]]:
+        """
+        @return: Key of every timestamp in sorted order with its distinct word and pair records in sorted order, s.t.
+        only the records of one timestamp are held in memory at once
+        """
+        words = itertools.groupby(self.merged_words(), key=operator.itemgetter(0))
+        pairs = itertools.groupby(self.merged_pairs(), key=operator.itemgetter(0))
+        next_words = next(words, None)
+        next_pairs = next(pairs, None)
+        for key in sorted(self.timestamps):
+            word_records = []
+            if next_words is not None and next_words[0] == key:
+                word_records = list(next_words[1])
+                next_words = next(words, None)
+            pair_records = []
+            if next_pairs is not None and next_pairs[0] == key:
+                pair_records = list(next_pairs[1])
+                next_pairs = next(pairs, None)
+            yield key, word_records, pair_records
+
+    def remove(self) -> None:
+        """
+        Deletes the runs from disk.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def iterate_windows(docs: Documents.DocumentCollection, args: argparse.Namespace) \
+        -> typing.Iterator[typing.Tuple[Timestamps.Timestamp, typing.List[Documents.Word], typing.List[int]]]:
+    """
+    Iterates over the windows around all dates, whose words co-occur with the date. The window around a date consists
+    of the args.window_size sentences before and after the sentence of the date, and the sentence itself. Dates without
+    year or outside of the year range are skipped.
+    @param docs: The documents
+    @param args: arguments from command-line arguments, i.e., start and end year as well as window size
+    @return: Iterator over (timestamp, words of the window, distance of the sentence of every word to the sentence of
+    the date)
+    """
+    window_size = args.window_size
+    start_year = args.start_year
+    end_year = args.end_year
+
+    progress = metrics.Progress("Document", len(docs.documents))
+    for doc in docs.documents:
+        progress.update()
+        sentences = doc.sentences
+
+        for source_sentID in range(len(sentences)):
+            annotations = sentences[source_sentID].annotations
+            startID = max(0, source_sentID - window_size)
+            endID = min(len(sentences) - 1, source_sentID + window_size)
+            window = None
+            for wordID in annotations.keys():
+                timestamp = annotations[wordID].timestamp
+                current_year = timestamp.year
+                if current_year is None or current_year < start_year or current_year > end_year:
+                    continue
+                if window is None:
+                    # the window is shared by all dates of the sentence
+                    window = ([word for sentID in range(startID, endID + 1) for word in sentences[sentID].words],
+                              [abs(sentID - source_sentID) for sentID in range(startID, endID + 1)
+                               for _ in sentences[sentID].words])
+                yield (timestamp,) + window
+
+
+def extract_timecentric_cooccurrences_to_runs(docs: Documents.DocumentCollection, args: argparse.Namespace) \
+        -> CooccurrenceRuns:
+    """
+    Bounded-memory version of extract_timecentric_cooccurrences_from_collection, which spills the co-occurrences to
+    disk, see CooccurrenceRuns.
+    @param docs: The documents from which time-centric co-occurrences are extracted.
+    @param args: arguments from command-line arguments, i.e., start and end year, window size, the folder for
+    intermediate results and the maximal number of records held in memory
+    @return: The spilled co-occurrences
+    """
+    runs = CooccurrenceRuns(args.temp_folder, args.spill_records)
+    for timestamp, words, _ in iterate_windows(docs, args):
+        runs.add_window(timestamp, words)
+        metrics.count("pairs", len(words) * (len(words) - 1) // 2)
+    return runs
+
+
+def extract_cooccurrence_records_by_distance(docs: Documents.DocumentCollection, args: argparse.Namespace) \
+        -> (typing.Set[int], typing.Dict[tuple, int], typing.Dict[tuple, int]):
+    """
+    Extracts the time-centric co-occurrences of all window sizes up to args.window_size in one pass. Co-occurrences are
+    records as in CooccurrenceRuns, each mapped to the smallest window size it occurs in, i.e., it occurs in every
+    window at least as large. A pair occurs in a window if both sentences are within the window, and a word occurs if
+    its sentence is within the window and the window has at least two words.
+    @param docs: The documents from which time-centric co-occurrences are extracted.
+    @param args: arguments from command-line arguments, i.e., start and end year as well as the largest window size
+    @return: Keys of all timestamps with a window, pair records and word records with their smallest window size
+    """
+    timestamps = set()
+    pairs = {}
+    word_records = {}
+    for timestamp, window_words, distances in iterate_windows(docs, args):
+        keys = []
+        while timestamp is not None:
+            keys.append(timestamp.key)
+            timestamp = timestamp.parent
+        timestamps.update(keys)
+
+        # words with the distance of their sentence to the date
+        words = list(zip(window_words, distances))
+        if len(words) < 2:
+            continue
+        # smallest window size with at least two words
+        min_distance = sorted(distances)[1]
+        for (word1, distance1), (word2, distance2) in itertools.combinations(words, 2):
+            if word1.lemma > word2.lemma:
+                word1, word2 = word2, word1
+            distance = max(distance1, distance2)
+            sentence1, sentence2 = word1.belongs_to, word2.belongs_to
+            pair = (word1.lemma, word2.lemma, sentence1.belongs_to.idx, sentence1.sent_start,
+                    sentence1.sent_end, sentence2.sent_start, sentence2.sent_end)
+            for key in keys:
+                record = (key,) + pair
+                if pairs.get(record, distance + 1) > distance:
+                    pairs[record] = distance
+        for word, distance in words:
+            distance = max(distance, min_distance)
+            for key in keys:
+                record = (key, word.lemma, word.idx)
+                if word_records.get(record, distance + 1) > distance:
+                    word_records[record] = distance
+        metrics.count("pairs", len(words) * (len(words) - 1) // 2)
+    return timestamps, pairs, word_records
+
+
+def select_cooccurrence_records(timestamps: typing.Iterable[int], pairs: typing.Iterable[typing.Tuple[tuple, int]],
+                                words: typing.Iterable[typing.Tuple[tuple, int]], window_size: int, start_year: float,
+                                end_year: float) \
+        -> (typing.Iterator[int], typing.Iterator[tuple], typing.Iterator[tuple]):
+    """
+    Selects the co-occurrences of one window size and year range from the records of
+    extract_cooccurrence_records_by_distance, e.g., for GraphManager.from_cooccurrence_records.
+    @param timestamps: Keys of all timestamps with a window
+    @param pairs: Pair records with their smallest window size in sorted order
+    @param words: Word records with their smallest window size in sorted order
+    @param window_size: The window size, at most the window size of the extraction
+    @param start_year: First year of the range
+    @param end_year: Last year of the range
+    @return: Keys of the timestamps, word records and pair records of the window size and year range in sorted order
+    """
+    years = {key: Timestamps.Timestamp.from_key(key).year for key in timestamps}
+    return ((key for key in sorted(years) if start_year <= years[key] <= end_year),
+            (record for record, distance in words
+             if distance <= window_size and start_year <= years[record[0]] <= end_year),
+            (record for record, distance in pairs
+             if distance <= window_size and start_year <= years[record[0]] <= end_year))
@@ -0,0 +1,158 @@
+"""
+Approximate extraction of time-centric co-occurrences. Graphs are pruned to their highest weighted nodes, hence only the
+co-occurrences among the frequent terms of a timestamp are kept. Instead of counting all pairs, the terms of every
+timestamp are first summarized with the Space-Saving algorithm, which keeps a fixed number of counters and finds every
+term whose count exceeds a fraction epsilon of all term occurrences of the timestamp. In a second pass, co-occurrences
+are counted only among the highest weighted candidates of the summaries, exactly and with their sentences. Memory and
+time thus scale with the graphs that are kept instead of the number of co-occurring pairs.
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import heapq
+import itertools
+import math
+import typing
+
+import documents.Documents as Documents
+import documents.Timestamps as Timestamps
+from cooccurrences.cooccurrences import iterate_windows
+import metrics.metrics as metrics
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary of a stream of items (Metwally et al., 2005). With k counters, the count of an item is
+    overestimated by at most N / k, where N is the total count of all items, and every item with a count above N / k
+    is contained in the summary.
+    """
+    capacity: int
+    total: int
+    counts: typing.Dict[str, int]
+    errors: typing.Dict[str, int]
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # min-heap of (count, item), entries whose count is outdated are skipped
+        self._heap = []
+
+    @classmethod
+    def from_error(cls, epsilon: float) -> SpaceSaving:
+        """
+        @param epsilon: Maximal overestimation of a count, as a fraction of the total count
+        """
+        return cls(math.ceil(1 / epsilon))
+
+    def add(self, item: str, count: int = 1) -> None:
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            # the new item replaces the item with the smallest count, whose count is an upper bound of its count
+            while True:
+                minimum, evicted = heapq.heappop(self._heap)
+                if self.counts.get(evicted) == minimum:
+                    break
+            del self.counts[evicted]
+            del self.errors[evicted]
+            self.counts[item] = minimum + count
+            self.errors[item] = minimum
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(item_count, item) for item, item_count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    @property
+    def max_error(self) -> int:
+        """
+        Upper bound of the overestimation of every count.
+        """
+        return self.total // self.capacity if len(self.counts) >= self.capacity else 0
+
+
+def _distinct_window_words(docs: Documents.DocumentCollection, args: argparse.Namespace) \
+        -> typing.Iterator[typing.Set[typing.Tuple[Timestamps.Timestamp, str, int]]]:
+    """
+    Iterates over the documents, and returns for each the distinct (timestamp, label, word) triples of its
+    co-occurrences. As in the graphs, a word is counted once per timestamp and for the coarser granularities of the
+    timestamp as well.
+    """
+    current_doc = None
+    words = set()
+    for timestamp, window, _ in iterate_windows(docs, args):
+        # a word occurs in a co-occurrence only if the window has at least two words
+        if len(window) < 2:
+            continue
+        doc = window[0].belongs_to.belongs_to
+        if doc is not current_doc:
+            if words:
+                yield words
+            current_doc = doc
+            words = set()
+        while timestamp is not None:
+            words.update((timestamp, word.lemma, word.idx) for word in window)
+            timestamp = timestamp.parent
+    if words:
+        yield words
+
+
+def summarize_terms(docs: Documents.DocumentCollection, args: argparse.Namespace) \
+        -> typing.Dict[Timestamps.Timestamp, SpaceSaving]:
+    """
+    First pass: summarizes the term counts of every timestamp.
+    @param docs: The documents
+    @param args: arguments from command-line arguments, i.e., start and end year, window size and the error bound
+    heavy_hitters
+    @return: Summary per timestamp
+    """
+    summaries = collections.defaultdict(lambda: SpaceSaving.from_error(args.heavy_hitters))
+    for words in _distinct_window_words(docs, args):
+        for timestamp, label, _ in words:
+            summaries[timestamp].add(label)
+    return dict(summaries)
+
+
+def count_candidate_cooccurrences(docs: Documents.DocumentCollection, args: argparse.Namespace,
+                                  candidates: typing.Dict[Timestamps.Timestamp, typing.Set[str]],
+                                  labels: typing.Dict[Timestamps.Timestamp, typing.Set[str]] = None) \
+        -> (typing.Dict[Timestamps.Timestamp, typing.Dict[typing.Tuple[str, str], dict]],
+            typing.Dict[Timestamps.Timestamp, typing.Counter[str]]):
+    """
+    Second pass: collects the co-occurring sentences of all pairs of candidates, and recounts terms exactly.
+    @param docs: The documents
+    @param args: arguments from command-line arguments, i.e., start and end year as well as window size
+    @param candidates: Labels per timestamp whose co-occurrences are collected
+    @param labels: Labels per timestamp whose counts are recounted, none if None
+    @return: Per timestamp, the co-occurring sentences of each pair of labels (label 1 <= label 2) as keys of a dict in
+    the format of Edge.append_to_sentence_functionality, and the exact counts of the labels
+    """
+    sentences = collections.defaultdict(lambda: collections.defaultdict(dict))
+    for timestamp, window, _ in iterate_windows(docs, args):
+        while timestamp is not None:
+            timestamp_candidates = candidates.get(timestamp, ())
+            words = [word for word in window if word.lemma in timestamp_candidates]
+            for word1, word2 in itertools.combinations(words, 2):
+                if word1.lemma > word2.lemma:
+                    word1, word2 = word2, word1
+                sentence1, sentence2 = word1.belongs_to, word2.belongs_to
+                # dicts are used as ordered sets of the sentences
+                sentences[timestamp][(word1.lemma, word2.lemma)][
+                    (sentence1.belongs_to.idx, (sentence1.sent_start, sentence1.sent_end),
+                     (sentence2.sent_start, sentence2.sent_end))] = None
+            metrics.count("candidate_pairs", len(words) * (len(words) - 1) // 2)
+            timestamp = timestamp.parent
+
+    counts = collections.defaultdict(collections.Counter)
+    if labels is not None:
+        for words in _distinct_window_words(docs, args):
+            for timestamp, label, _ in words:
+                if label in labels.get(timestamp, ()):
+                    counts[timestamp][label] += 1
+    return sentences, counts
@@ -1,15 +1,25 @@
 import typing
 import json
+import uuid
 
 import pymongo
 
 
-def create_database(files: typing.List[str], database_name: str) -> None:
+def _set_fingerprint(database: pymongo.database.Database) -> None:
+    """
+    Stores a new fingerprint of the graphs, s.t. the API rebuilds its index snapshot (see api/index.py).
+    """
+    database.meta.replace_one({"_id": "graphs"}, {"fingerprint": uuid.uuid4().hex}, upsert=True)
+
+
+def create_database(files: typing.List[str], database_name: str,
+                    provenance_files: typing.List[str] = None) -> None:
     """
     Read in a list of json files that are then stored in a MongoDB.
     ATTENTION: THE DATABASE WITH THE NAME database_name IS DROPPED IN THIS PROCESS.
     @param files: list of jsons containing time-centric graphs.
     @param database_name: Name the database should have.
+    @param provenance_files: list of jsons containing the co-occurring sentences of the edges.
     @return: Nothing
     """
     dbClient = pymongo.MongoClient("mongodb://localhost:27017/")
@@ -30,5 +40,58 @@ def create_database(files: typing.List[str], database_name: str) -> None:
         database.graphs.insert_many(mongo_data)
         del data, mongo_data
 
+    for file in provenance_files or []:
+        with open(file, "r") as f:
+            data = json.load(f)
+        mongo_data = []
+        for edge_id, sentences in data.items():
+            mongo_data.append(
+                {
+                    "_id": int(edge_id),
+                    "count": len(sentences),
+                    "sentences": sentences
+                }
+            )
+        if mongo_data:
+            database.provenance.insert_many(mongo_data)
+        del data, mongo_data
+
+    _set_fingerprint(database)
+
+
+def update_database(files: typing.List[str], database_name: str, provenance_files: typing.List[str] = None) -> None:
+    """
+    Inserts or replaces the graphs and edge provenance of the update files written by main.py --append. Graphs not
+    contained in the files are kept.
+    @param files: list of jsons containing changed time-centric graphs, e.g., timecentricgraphs_update.json.
+    @param database_name: Name of the database created by create_database.
+    @param provenance_files: list of jsons containing the co-occurring sentences of the edges of the changed graphs.
+    @return: Nothing
+    """
+    dbClient = pymongo.MongoClient("mongodb://localhost:27017/")
+    database = dbClient[database_name]
+    for file in files:
+        with open(file, "r") as f:
+            data = json.load(f)
+        requests = [pymongo.ReplaceOne({"_id": date}, {"nodes": graph["nodes"], "edges": graph["edges"]}, upsert=True)
+                    for date, graph in data.items()]
+        if requests:
+            database.graphs.bulk_write(requests, ordered=False)
+        del data, requests
+
+    for file in provenance_files or []:
+        with open(file, "r") as f:
+            data = json.load(f)
+        requests = [pymongo.ReplaceOne({"_id": int(edge_id)}, {"count": len(sentences), "sentences": sentences},
+                                       upsert=True)
+                    for edge_id, sentences in data.items()]
+        if requests:
+            database.provenance.bulk_write(requests, ordered=False)
+        del data, requests
+
+    _set_fingerprint(database)
+
 
-create_database(["../timecentricgraphs.json"], "TICCO_DB")
+create_database(["../timecentricgraphs.json"], "TICCO_DB", ["../timecentricprovenance.json"])
+# After python3 main.py --append, only the changed graphs are written to the database:
+# update_database(["../timecentricgraphs_update.json"], "TICCO_DB", ["../timecentricprovenance_update.json"])
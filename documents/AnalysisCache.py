@@ -0,0 +1,117 @@
+"""
+On-disk cache of the spaCy analyses of the sentences or whole texts of documents (see
+DocumentsCreator.__analysed_regions__), s.t. reruns with other parameters, e.g., another window size or time range, and
+runs with additional documents only analyse texts that were not analysed before. Analyses are stored as compact token
+tables, which are independent of the classes of the pipeline, in an SQLite database. They are keyed by the hash of the
+analysed text and the configuration of the spaCy pipeline, i.e., a changed model or language invalidates them.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import typing
+import zlib
+
+from spacy.tokens.doc import Doc as spacyDoc
+
+ANALYSIS_CACHE_VERSION = 2
+
+
+class CachedToken(typing.NamedTuple):
+    """
+    The attributes of a spaCy token used by DocumentsCreator, named as in spaCy.
+    """
+    idx: int
+    lemma_: str
+    ent_type_: str
+    pos_: str
+    is_stop: bool
+    is_punct: bool
+
+
+class CachedSentence(typing.NamedTuple):
+    start_char: int
+    end_char: int
+    tokens: typing.List[CachedToken]
+
+
+def analysis_from_spacyDoc(spacy_doc: spacyDoc) -> typing.List[CachedSentence]:
+    """
+    @param spacy_doc: A text processed by the spaCy pipeline
+    @return: Its sentences and tokens
+    """
+    return [CachedSentence(sent.start_char, sent.end_char,
+                           [CachedToken(token.idx, token.lemma_, token.ent_type_, token.pos_, token.is_stop,
+                                        token.is_punct) for token in sent])
+            for sent in spacy_doc.sents]
+
+
+def shifted_analysis(analysis: typing.List[CachedSentence], offset: int) -> typing.List[CachedSentence]:
+    """
+    @param analysis: Analysis of a part of a text
+    @param offset: Position of the part in the text
+    @return: The analysis with the character offsets of the text
+    """
+    if not offset:
+        return analysis
+    return [CachedSentence(sent.start_char + offset, sent.end_char + offset,
+                           [token._replace(idx=token.idx + offset) for token in sent.tokens])
+            for sent in analysis]
+
+
+def _encode(analysis: typing.List[CachedSentence]) -> bytes:
+    return zlib.compress(json.dumps([[sent.start_char, sent.end_char, [list(token) for token in sent.tokens]]
+                                     for sent in analysis], ensure_ascii=False).encode("utf-8"))
+
+
+def _decode(data: bytes) -> typing.List[CachedSentence]:
+    return [CachedSentence(start_char, end_char, [CachedToken(*token) for token in tokens])
+            for start_char, end_char, tokens in json.loads(zlib.decompress(data).decode("utf-8"))]
+
+
+class AnalysisCache:
+    """
+    SQLite database of analyses by key, see key. Several processes, e.g., the map invocations of mapreduce.py, may
+    share the database.
+    """
+    # maximal number of keys per query, below the limit of SQLite
+    query_size = 500
+
+    def __init__(self, path: str, configuration: str) -> None:
+        """
+        @param path: Location of the database, created if necessary
+        @param configuration: Description of the spaCy pipeline, e.g., model name and version
+        """
+        self.configuration = "{}|{}".format(ANALYSIS_CACHE_VERSION, configuration)
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS analyses (key TEXT PRIMARY KEY, analysis BLOB)")
+        self.connection.commit()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1((self.configuration + "\n" + text).encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: typing.Iterable[str]) -> typing.Dict[str, typing.List[CachedSentence]]:
+        """
+        @param keys: Keys of the texts
+        @return: Key to analysis, for the keys whose analysis is cached
+        """
+        keys = list(keys)
+        result = {}
+        for start in range(0, len(keys), self.query_size):
+            chunk = keys[start:start + self.query_size]
+            rows = self.connection.execute("SELECT key, analysis FROM analyses WHERE key IN ({})".format(
+                ", ".join("?" * len(chunk))), chunk)
+            result.update((key, _decode(data)) for key, data in rows)
+        return result
+
+    def put_many(self, analyses: typing.Dict[str, typing.List[CachedSentence]]) -> None:
+        """
+        @param analyses: Key to analysis
+        """
+        self.connection.executemany("INSERT OR REPLACE INTO analyses VALUES (?, ?)",
+                                    ((key, _encode(analysis)) for key, analysis in analyses.items()))
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
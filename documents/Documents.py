@@ -153,9 +153,13 @@ class Document:
 
 class DocumentCollection:
     """
-    Storage object for documents.
+    Storage object for documents. If only the sentences around dates were analysed (see DocumentsCreator), the window
+    size and years they were analysed for are stored as well.
     """
     documents: typing.List[Document]
+    # None if all sentences were analysed
+    analysed_window_size: typing.Optional[int] = None
+    analysed_years: typing.Tuple[float, float] = (-float("Inf"), float("Inf"))
 
     def __init__(self, documents: typing.List[Document] = None):
         if documents:
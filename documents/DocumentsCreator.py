@@ -1,18 +1,20 @@
 import argparse
+import bisect
+import importlib.metadata
 from itertools import repeat
 import re
-import timeit
 import typing
 import pickle
 import os
 
 from nltk.corpus import stopwords
-from spacy.tokens.doc import Doc as spacyDoc
 from tqdm import tqdm
 import spacy
 
 import config
 import documents.Documents as Documents
+from documents.AnalysisCache import AnalysisCache, CachedSentence, analysis_from_spacyDoc, shifted_analysis
+import metrics.metrics as metrics
 
 
 class FullSet(set):
@@ -32,33 +34,58 @@ class DocumentsCreator:
     dict_up_to_x_chars: set
     disable_tqdm: bool
     output_path: str
+    # number of documents whose analyses are held in memory at once
+    analysis_batch_size = 1000
 
     def __init__(self, args: argparse.Namespace, model: str = None) -> None:
         """
-        Initialize spacy model and compile regular expressions used for detection of TIMEX3 tags.
+        Configure the spacy pipeline and compile regular expressions used for detection of TIMEX3 tags. The spacy model
+        is loaded on first use.
         @param args: The command line arguments given by the user
         @param model: Specific spacy model can be given
         """
 
+        # only the sentences within the window around dates of the year range are analysed, see __analysed_regions__
+        self.window_size = args.window_size
+        self.years = (args.start_year, args.end_year)
+        self.analyse_all_sentences = args.analyse_all_sentences
+
         self.documentCollectionAlreadyGiven = args.dcolload
         if self.documentCollectionAlreadyGiven:
             self.documentCollectionPath = args.data
             return
 
-        print("Load Spacy Model.")
-        start = timeit.default_timer()
-        # if model is specified
-        if model:
-            self.nlp = spacy.load(model)
-        elif args.hlang.lower() == "german":
-            self.nlp = spacy.load("de_core_news_md")
-        elif args.hlang.lower() == "english":
-            self.nlp = spacy.load("en_core_web_md")
-        end = timeit.default_timer()
-        print("Loaded Spacy Model in", end - start, "seconds.")
+        # the spaCy model is only loaded if a text is not found in the cache of analyses, see __load_nlp__
+        self.nlp = None
+        self.segmenter = None
+        self.model = model
+        if not self.model:
+            self.model = {"german": "de_core_news_md", "english": "en_core_web_md"}.get(args.hlang.lower())
+        self.language = args.hlang.lower()
 
         self.dict_up_to_x_chars = self.__load_language_dict__(args.hlang, 4)
 
+        # Only words that are a certain pos tag are taken into account
+        self.possible_pos_tags = ["ADJ", "NOUN", "PROPN", "VERB"]
+
+        # Compile the necessary regular expressions
+        self.tag_start = re.compile(r"<[^/].*?>")
+        self.tag_end = re.compile(r"</.*?>")
+
+        self.disable_tqdm = args.disable_tqdm
+        self.output_path = args.output
+        self.analysis_cache_path = None if args.no_spacy_cache else os.path.join(args.temp_folder,
+                                                                                 "spacy_analyses.sqlite")
+
+    def __load_nlp__(self) -> None:
+        """
+        Loads the spaCy model and adds the components and stop words of the pipeline.
+        """
+        with metrics.stage("spacy_model", "loading spaCy model"):
+            if not self.model:
+                raise ValueError("No spaCy model for language " + self.language)
+            self.nlp = spacy.load(self.model)
+
         # Sentencizer needs to be first part of pipeline
         self.nlp.add_pipe(self.nlp.create_pipe('sentencizer'), first=True)
 
@@ -68,18 +95,111 @@ class DocumentsCreator:
         # Extend the list of stop words
         self.nlp.vocab['\n'].is_stop = True
         # Insert NLTK stop words
-        for stopword in stopwords.words(args.hlang.lower()):
+        for stopword in stopwords.words(self.language):
             self.nlp.vocab[stopword].is_stop = True
 
-        # Only words that are a certain pos tag are taken into account
-        self.possible_pos_tags = ["ADJ", "NOUN", "PROPN", "VERB"]
-
-        # Compile the necessary regular expressions
-        self.tag_start = re.compile(r"<[^/].*?>")
-        self.tag_end = re.compile(r"</.*?>")
-
-        self.disable_tqdm = args.disable_tqdm
-        self.output_path = args.output
+    def __pipeline_configuration__(self) -> str:
+        """
+        @return: Description of the spaCy pipeline, which determines the analyses of texts, see AnalysisCache
+        """
+        try:
+            model_version = importlib.metadata.version(self.model)
+        except (importlib.metadata.PackageNotFoundError, ValueError):
+            model_version = "unknown"
+        return "{} {}|spacy {}|sentencizer,merge_entities|stopwords {}".format(self.model, model_version,
+                                                                               spacy.__version__, self.language)
+
+    def __analyse_documents__(self, documents: typing.List[typing.Optional[Documents.Document]],
+                              cache: typing.Optional[AnalysisCache]) \
+            -> typing.List[typing.Optional[typing.List[CachedSentence]]]:
+        """
+        Analyses the regions of the documents (see __analysed_regions__) with spaCy, unless their analyses are cached.
+        With the cache, the sentences within the windows are analysed and cached one by one, s.t. reruns with another
+        window size or year range reuse the analyses of all sentences that were analysed before. New analyses are added
+        to the cache.
+        @param documents: Documents without sentences, None for documents that could not be parsed
+        @param cache: The cache, or None if disabled
+        @return: Analysis of every document, see AnalysisCache
+        """
+        texts = {}
+        keys = []
+        for document, regions in zip(documents, self.__analysed_regions__(documents, per_sentence=cache is not None)):
+            document_keys = None
+            if document:
+                document_keys = []
+                for start, end in regions:
+                    text = document.text[start:end]
+                    key = cache.key(text) if cache else text
+                    texts[key] = text
+                    document_keys.append((key, start))
+            keys.append(document_keys)
+
+        analyses = cache.get_many(texts.keys()) if cache else {}
+        missing = [key for key in texts.keys() if key not in analyses]
+        metrics.count("cached_analyses", len(texts) - len(missing))
+        metrics.count("spacy_analyses", len(missing))
+        if missing:
+            if self.nlp is None:
+                self.__load_nlp__()
+            new_analyses = {key: analysis_from_spacyDoc(spacy_doc)
+                            for key, spacy_doc in zip(missing, self.nlp.pipe(texts[key] for key in missing))}
+            if cache:
+                cache.put_many(new_analyses)
+            analyses.update(new_analyses)
+        return [[sent for key, start in document_keys for sent in shifted_analysis(analyses[key], start)]
+                if document_keys is not None else None for document_keys in keys]
+
+    def __analysed_regions__(self, documents: typing.List[typing.Optional[Documents.Document]], per_sentence: bool) \
+            -> typing.List[typing.Optional[typing.List[typing.Tuple[int, int]]]]:
+        """
+        Determines the parts of the documents that are analysed with spaCy, i.e., the sentences within the window around
+        a date of the year range. Every window around such a date consists of analysed sentences, hence co-occurrences
+        are the same as if all sentences were analysed. Sentences are segmented in advance by the rule-based
+        sentencizer of the pipeline in a blank pipeline, which is fast compared to the analysis. With
+        --analyse-all-sentences, or without a blank pipeline for the language, the whole text is analysed at once.
+        @param documents: Documents without sentences, None for documents that could not be parsed
+        @param per_sentence: Every analysed sentence is a region of its own, e.g., to cache the analyses of sentences.
+        Otherwise, runs of consecutive analysed sentences are merged, s.t. spaCy sees their context.
+        @return: Character ranges (start, end) of the regions of every document
+        """
+        language_code = {"german": "de", "english": "en"}.get(self.language)
+        if self.analyse_all_sentences or not language_code:
+            return [[(0, len(document.text))] if document else None for document in documents]
+        if self.segmenter is None:
+            self.segmenter = spacy.blank(language_code)
+            self.segmenter.add_pipe(self.segmenter.create_pipe('sentencizer'))
+
+        start_year, end_year = self.years
+        segmented = self.segmenter.pipe(document.text for document in documents if document)
+        result = []
+        skipped = 0
+        for document in documents:
+            if not document:
+                result.append(None)
+                continue
+            sentences = [(sent.start_char, sent.end_char) for sent in next(segmented).sents]
+            starts = [start for start, _ in sentences]
+            analysed = [False] * len(sentences)
+            for annotation in document.annotations:
+                current_year = annotation.timestamp.year
+                if current_year is None or current_year < start_year or current_year > end_year:
+                    continue
+                sentID = max(0, bisect.bisect_right(starts, annotation.start) - 1)
+                for windowID in range(max(0, sentID - self.window_size),
+                                      min(len(sentences), sentID + self.window_size + 1)):
+                    analysed[windowID] = True
+
+            regions = []
+            for sentID, (start, end) in enumerate(sentences):
+                if not analysed[sentID]:
+                    skipped += 1
+                elif regions and analysed[sentID - 1] and not per_sentence:
+                    regions[-1] = (regions[-1][0], end)
+                else:
+                    regions.append((start, end))
+            result.append(regions)
+        metrics.count("skipped_sentences", skipped)
+        return result
 
     @staticmethod
     def __load_language_dict__(lang: str, max_chars: int) -> set:
@@ -150,25 +270,23 @@ class DocumentsCreator:
 
         return result
 
-    def __spacy_processing__(self, document: Documents.Document, entity_only_lastname: bool) \
-            -> typing.Optional[Documents.Document]:
+    def __spacy_processing__(self, document: Documents.Document, analysis: typing.List[CachedSentence],
+                             entity_only_lastname: bool) -> typing.Optional[Documents.Document]:
         """
         Processing with SpaCy: Sentence segmentation, named entity recognition, stop word removal, etc.
         @param document: Document object
+        @param analysis: The spaCy analysis of the document text, see __analyse_documents__
         @param entity_only_lastname: If true only the lastname of all entities of type Person is stored
         @return: Document object with segmented sentences (sentences are modelled as BoW)
         """
         if not document:
             return None
 
-        spacy_doc: spacyDoc
-        spacy_doc = self.nlp(document.text)
-
         annotations_start_indices = set([a.start for a in document.annotations])
 
-        for sent in spacy_doc.sents:
+        for sent in analysis:
             # ignore sentences that have 200 or more words (those are probably lists)
-            if len(sent) > 200:
+            if len(sent.tokens) > 200:
                 sentence = Documents.Sentence(sent.start_char, sent.end_char, document)
                 document.addSentence(sentence)
                 continue
@@ -176,7 +294,7 @@ class DocumentsCreator:
             # Create new sentence
             sentence = Documents.Sentence(sent.start_char, sent.end_char, document)
 
-            len_sentence = len(sent)
+            len_sentence = len(sent.tokens)
 
             # is a word tagged with a timestamp found?
             found_tag = False
@@ -184,7 +302,7 @@ class DocumentsCreator:
             # Take track of indices
             tag_end_index = 0
 
-            for wcount, word in enumerate(sent):
+            for wcount, word in enumerate(sent.tokens):
 
                 # Last word was tagged with a timestamp
                 if found_tag:
@@ -271,21 +389,40 @@ class DocumentsCreator:
             with open(self.documentCollectionPath, "rb") as f:
                 data = pickle.load(f)
                 print("Document Collection loaded.")
-                return data
-
-        print("Start creating Document Collection.")
-        start = timeit.default_timer()
-        documents = list(map(self.__parse_HeidelTimeTags__, tqdm(documents, disable=self.disable_tqdm)))
-        documents = list(map(self.__spacy_processing__, tqdm(documents, disable=self.disable_tqdm),
-                             repeat(entity_only_lastname)))
-        documents = list(map(self.__set_word_lemmas_for_timestamps__, tqdm(documents, disable=self.disable_tqdm)))
-        documents = Documents.DocumentCollection(documents)
-        end = timeit.default_timer()
+            if data.analysed_window_size is not None and (self.window_size > data.analysed_window_size
+                                                          or self.years[0] < data.analysed_years[0]
+                                                          or self.years[1] > data.analysed_years[1]):
+                raise ValueError("The Document Collection only holds the sentences within window size {} around dates "
+                                 "from {} to {}. Create it again, or with --analyse-all-sentences."
+                                 .format(data.analysed_window_size, *data.analysed_years))
+            return data
+
+        with metrics.stage("document_collection", "creating Document Collection"):
+            documents = list(map(self.__parse_HeidelTimeTags__, tqdm(documents, disable=self.disable_tqdm)))
+            # texts are analysed in batches, s.t. only the analyses of one batch are held in memory
+            cache = AnalysisCache(self.analysis_cache_path, self.__pipeline_configuration__()) \
+                if self.analysis_cache_path else None
+            processed = []
+            progress = tqdm(total=len(documents), disable=self.disable_tqdm)
+            for start in range(0, len(documents), self.analysis_batch_size):
+                batch = documents[start:start + self.analysis_batch_size]
+                processed.extend(map(self.__spacy_processing__, batch, self.__analyse_documents__(batch, cache),
+                                     repeat(entity_only_lastname)))
+                progress.update(len(batch))
+            progress.close()
+            if cache:
+                cache.close()
+            documents = processed
+            documents = list(map(self.__set_word_lemmas_for_timestamps__, tqdm(documents, disable=self.disable_tqdm)))
+            documents = Documents.DocumentCollection(documents)
+            if not self.analyse_all_sentences:
+                documents.analysed_window_size = self.window_size
+                documents.analysed_years = self.years
+            metrics.count("documents", sum(1 for doc in documents.documents if doc))
+            metrics.count("sentences", sum(len(doc.sentences) for doc in documents.documents if doc))
 
         if self.output_path:
             with open(os.path.join(self.output_path, "document_collection.pickle"), "wb") as f:
                 pickle.dump(documents, f)
 
-        print("Finished creating Document Collection in", end - start, "seconds.")
-
         return documents
@@ -1,16 +1,24 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 import re
 
+import numpy as np
+
 
 class Timestamp:
     """
-    Storage object for timestamps, specifying them as a combination of year, month and day.
+    Immutable storage object for timestamps, specifying them as a combination of year, month and day.
+    Timestamps are interned, i.e., equal timestamps are the same object, and packed into an integer key YYYYMMDD
+    (a missing month or day is 0), which is used for hashing and chronological ordering. The key of a year sorts before
+    the keys of its months, which sort before the keys of their days.
     """
+    __slots__ = ("year", "month", "day", "granularity", "key")
+
     year: Optional[int]
     month: Optional[int]
     day: Optional[int]
     granularity: str
+    key: int
 
     # invalid values in a tag for creation of a timestamp, we only accept years AD for now
     invalid_tags = ["REF", "BC"]
@@ -18,33 +26,48 @@ class Timestamp:
     # This pattern finds the correct date tag in a TIMEX3 tag (value states the actual date)
     tag_pattern = re.compile(r"value=[\"'](.*?)[\"']")
 
-    def __init__(self, year: int = None, month: int = None, day: int = None) -> None:
+    # interned instances by key, and parsed TIMEX3 values
+    _instances: Dict[int, Timestamp] = {}
+    _parsed_values: Dict[str, Timestamp] = {}
+
+    def __new__(cls, year: int = None, month: int = None, day: int = None) -> Timestamp:
         """
-        When params are explicitly provided. Does not range checks.
+        When params are explicitly provided. Does not range checks, but month and day have to be below 100.
         @param year: year
         @param month: month
         @param day: day
         """
-        try:
-            self.year = None
-            self.month = None
-            self.day = None
-            if year:
-                self.year = year
-                if month:
-                    self.month = month
-                    if day:
-                        self.day = day
-            if day:
-                self.granularity = "D"
-            elif month:
-                self.granularity = "M"
-            elif year:
-                self.granularity = "Y"
-            else:
-                self.granularity = "NONE"
-        except Exception as e:
-            print("Timestamp constructor:", e)
+        # a month requires a year, a day requires a month
+        if not year:
+            year, month, day = None, None, None
+        elif not month:
+            month, day = None, None
+        elif not day:
+            day = None
+
+        key = (year or 0) * 10000 + (month or 0) * 100 + (day or 0)
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = object.__new__(cls)
+            object.__setattr__(instance, "year", year)
+            object.__setattr__(instance, "month", month)
+            object.__setattr__(instance, "day", day)
+            object.__setattr__(instance, "granularity", "D" if day else "M" if month else "Y" if year else "NONE")
+            object.__setattr__(instance, "key", key)
+            cls._instances[key] = instance
+        return instance
+
+    @classmethod
+    def from_key(cls, key: int) -> Timestamp:
+        """
+        Creates the timestamp for a packed YYYYMMDD key.
+        @param key: The key, as in Timestamp.key
+        @return: The timestamp
+        """
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = cls(key // 10000, key // 100 % 100, key % 100)
+        return instance
 
     @classmethod
     def from_HeidelTimeTag(cls, tag: str) -> Timestamp:
@@ -58,17 +81,25 @@ class Timestamp:
         except Exception as e:
             return cls()
 
-        for item in cls.invalid_tags:
-            if item in datestring:
-                return cls()
+        return cls.from_TimexValue(datestring)
+
+    @classmethod
+    def from_TimexValue(cls, datestring: str) -> Timestamp:
+        """
+        Creates a timestamp from the value of a TIMEX3 tag, e.g., "2020-04". Parsed values are cached.
+        @param datestring: The value
+        @return: The timestamp
+        """
+        timestamp = cls._parsed_values.get(datestring)
+        if timestamp is not None:
+            return timestamp
 
         year = None
         month = None
         day = None
 
-        date = datestring.split("-")
-
-        if len(date) > 0:
+        if not any(item in datestring for item in cls.invalid_tags):
+            date = datestring.split("-")
             if date[0].isnumeric() and len(date[0]) == 4:
                 year = int(date[0])
                 if len(date) > 1:
@@ -78,7 +109,44 @@ class Timestamp:
                             if date[2].isnumeric() and len(date[2]) == 2:
                                 day = int(date[2])
 
-        return cls(year, month, day)
+        timestamp = cls(year, month, day)
+        cls._parsed_values[datestring] = timestamp
+        return timestamp
+
+    @property
+    def parent(self) -> Optional[Timestamp]:
+        """
+        The timestamp of the next coarser granularity, e.g., the month of a day. Years and empty timestamps have none.
+        """
+        if self.day:
+            return Timestamp(self.year, self.month)
+        if self.month:
+            return Timestamp(self.year)
+        return None
+
+    @property
+    def last_key(self) -> int:
+        """
+        The largest key of a timestamp within the period of this timestamp, i.e., all timestamps of the period have a
+        key in [key, last_key].
+        """
+        if self.day:
+            return self.key
+        if self.month:
+            return self.key + 99
+        if self.year:
+            return self.key + 9999
+        return self.key
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Timestamp is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Timestamp is immutable.")
+
+    def __reduce__(self):
+        # unpickled timestamps are interned as well
+        return Timestamp, (self.year, self.month, self.day)
 
     def __repr__(self):
         return "Timestamp({0}, {1}, {2})".format(self.year, self.month, self.day)
@@ -95,8 +163,115 @@ class Timestamp:
 
     def __eq__(self, other):
         if isinstance(other, Timestamp):
-            return (self.day, self.month, self.year) == (other.day, other.month, other.year)
+            return self.key == other.key
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, Timestamp):
+            return self.key < other.key
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, Timestamp):
+            return self.key <= other.key
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, Timestamp):
+            return self.key > other.key
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, Timestamp):
+            return self.key >= other.key
         return NotImplemented
 
     def __hash__(self):
-        return hash((self.year, self.month, self.day))
+        return hash(self.key)
+
+
+def to_keys(timestamps: Iterable[Timestamp]) -> np.ndarray:
+    """
+    Packs timestamps into an array of YYYYMMDD keys, on which filtering and sorting are array operations.
+    @param timestamps: The timestamps
+    @return: int64 array of keys
+    """
+    return np.fromiter((timestamp.key for timestamp in timestamps), dtype=np.int64)
+
+
+def from_keys(keys: np.ndarray) -> List[Timestamp]:
+    """
+    Unpacks an array of YYYYMMDD keys into timestamps.
+    @param keys: int array of keys
+    @return: list of timestamps
+    """
+    return [Timestamp.from_key(key) for key in np.asarray(keys, dtype=np.int64).tolist()]
+
+
+def truncate_keys(keys: np.ndarray, granularity: str) -> np.ndarray:
+    """
+    Buckets keys to a coarser granularity, e.g., every day to its month. Keys that are already coarser stay the same.
+    @param keys: int array of keys
+    @param granularity: "Y" or "M"
+    @return: int64 array of truncated keys
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    if granularity == "Y":
+        return keys // 10000 * 10000
+    if granularity == "M":
+        return keys // 100 * 100
+    return keys.copy()
+
+
+def keys_to_datetime64(keys: np.ndarray) -> np.ndarray:
+    """
+    Converts keys to NumPy dates. Timestamps of year or month granularity are mapped to the first day of their period,
+    keys without a year to NaT.
+    @param keys: int array of keys
+    @return: datetime64[D] array
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    years = keys // 10000
+    months = np.maximum(keys // 100 % 100, 1)
+    days = np.maximum(keys % 100, 1)
+    dates = (years - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (months - 1)
+    dates = dates.astype("datetime64[D]") + (days - 1)
+    dates[years <= 0] = np.datetime64("NaT")
+    return dates
+
+
+def datetime64_to_keys(dates: np.ndarray, granularity: str = "D") -> np.ndarray:
+    """
+    Converts NumPy dates to keys of the given granularity. NaT is mapped to 0, i.e., the empty timestamp.
+    @param dates: datetime64 array
+    @param granularity: "Y", "M" or "D"
+    @return: int64 array of keys
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    month_starts = dates.astype("datetime64[M]")
+    keys = (dates.astype("datetime64[Y]").astype(np.int64) + 1970) * 10000
+    if granularity in ("M", "D"):
+        keys += (month_starts.astype(np.int64) % 12 + 1) * 100
+    if granularity == "D":
+        keys += (dates - month_starts).astype(np.int64) + 1
+    keys[np.isnat(dates)] = 0
+    return keys
+
+
+def to_datetime64(timestamps: Iterable[Timestamp]) -> np.ndarray:
+    """
+    Converts timestamps to NumPy dates, see keys_to_datetime64.
+    @param timestamps: The timestamps
+    @return: datetime64[D] array
+    """
+    return keys_to_datetime64(to_keys(timestamps))
+
+
+def from_datetime64(dates: np.ndarray, granularity: str = "D") -> List[Timestamp]:
+    """
+    Converts NumPy dates to timestamps of the given granularity.
+    @param dates: datetime64 array
+    @param granularity: "Y", "M" or "D"
+    @return: list of timestamps
+    """
+    return from_keys(datetime64_to_keys(dates, granularity))
@@ -1,6 +1,7 @@
 from __future__ import annotations
 import typing
 import collections
+import itertools
 
 import documents.Documents as Documents
 from documents.Timestamps import Timestamp
@@ -23,6 +24,20 @@ class Node:
         self.weight = weight
         self.words = [word]
 
+    @classmethod
+    def from_counts(cls, node_id: int, label: str, count: int) -> Node:
+        """
+        Restores a node of persisted raw counts (see graphs/counts.py). Its words are not restored, words added later
+        are counted on top.
+        """
+        node = cls.__new__(cls)
+        node.label = label
+        node.id = node_id
+        node.count = count
+        node.weight = count
+        node.words = []
+        return node
+
     def increase_weight(self, word: Documents.Word, weight: int = 1) -> None:
         if word not in self.words:
             self.words.append(word)
@@ -46,6 +61,9 @@ class Node:
 
 class Edge:
     # Only for undirected graphs
+    # static
+    next_id: int = 0
+    id: int
     source: Node
     target: Node
     sent_functionality: list
@@ -57,8 +75,22 @@ class Edge:
         else:
             self.source = target
             self.target = source
+        self.id = Edge.next_id
+        Edge.next_id += 1
         self.sent_functionality = []
 
+    @classmethod
+    def from_counts(cls, edge_id: int, source: Node, target: Node, sent_functionality: list) -> Edge:
+        """
+        Restores an edge of persisted raw counts (see graphs/counts.py).
+        """
+        edge = cls.__new__(cls)
+        edge.source = source
+        edge.target = target
+        edge.id = edge_id
+        edge.sent_functionality = sent_functionality
+        return edge
+
     def append_to_sentence_functionality(self, word1: Documents.Word, word2: Documents.Word):
         cooc = {"doc_id": word1.belongs_to.belongs_to.idx,
                 "sentence1": (word1.belongs_to.sent_start, word1.belongs_to.sent_end),
@@ -111,11 +143,12 @@ class Graph:
 
     def add_edge(self, word1: Documents.Word, word2: Documents.Word) -> None:
         node1 = self.label_to_node[word1.lemma]
-        node2 = self.label_to_node[word2.lemma]
         if not node1:
             node1 = Node(word1)
         self.add_node(node1, word1)
 
+        # looked up after adding node1, s.t. a pair of equal labels does not create the node twice
+        node2 = self.label_to_node[word2.lemma]
         if not node2:
             node2 = Node(word2)
         self.add_node(node2, word2)
@@ -133,6 +166,51 @@ class Graph:
 
         edge.append_to_sentence_functionality(word1, word2)
 
+    def restore_node(self, node: Node) -> None:
+        """
+        Adds a node restored from persisted raw counts, see Node.from_counts.
+        """
+        self.node_to_label[node] = node.label
+        self.label_to_node[node.label] = node
+
+    def restore_edge(self, edge: Edge) -> None:
+        """
+        Adds an edge restored from persisted raw counts, see Edge.from_counts. Its nodes have to be restored before.
+        """
+        self.nodes_to_edge[(edge.source, edge.target)] = edge
+        self.edge_to_nodes[edge] = (edge.source, edge.target)
+
+    def add_counted_node(self, label: str, count: int) -> None:
+        """
+        Adds count occurrences of a label at once, e.g., of merged co-occurrence runs (see cooccurrences.py).
+        """
+        node = self.label_to_node.get(label)
+        if node:
+            node.count += count
+            node.weight += count
+        else:
+            node = Node.from_counts(Node.next_id, label, count)
+            Node.next_id += 1
+            self.restore_node(node)
+
+    def add_counted_edge(self, label1: str, label2: str, sent_functionality: list) -> None:
+        """
+        Adds the co-occurring sentences of two labels at once, whose nodes were added with add_counted_node.
+        @param label1: Lexicographically smaller label
+        @param label2: Other label
+        @param sent_functionality: Co-occurring sentences as in Edge.append_to_sentence_functionality, which do not
+        occur in the edge yet
+        """
+        node1 = self.label_to_node[label1]
+        node2 = self.label_to_node[label2]
+        edge = self.nodes_to_edge.get((node1, node2))
+        if edge:
+            edge.sent_functionality.extend(sent_functionality)
+        else:
+            edge = Edge.from_counts(Edge.next_id, node1, node2, sent_functionality)
+            Edge.next_id += 1
+            self.restore_edge(edge)
+
     def remove_node(self, node: Node) -> None:
         edges_to_remove = [self.nodes_to_edge[(node1, node2)]
                            for (node1, node2)
@@ -178,85 +256,75 @@ class Graph:
         self.require_minimum_node_weight(min_weight)
 
 
-def get_graph_from_list(graphs: typing.List[Graph], year: int, month: int = None) -> typing.Optional[Graph]:
+def get_graph_from_dict(graphs: typing.Dict[Timestamp, Graph], timestamp: Timestamp) -> Graph:
     """
-    Return graph of specified date. This function is designed for use increate_graph_from_timecentric_cooccurrences, and
-    may break other code.
-    @param graphs: list of graphs to look in
-    @param year: queried year
-    @param month: queried month
-    @return: the found graph or None
+    Return graph of specified date. If the graph does not exist yet, it is created and added to graphs. This function is
+    designed for use in create_graph_from_timecentric_cooccurrences.
+    @param graphs: graphs to look in, by timestamp
+    @param timestamp: queried date
+    @return: the found or created graph
     """
-    date_exists = None
-    result = None
-    # desired graph has year granularity
-    if year and not month:
-        for graph in graphs:
-            if graph.timestamp.year == year and graph.timestamp.granularity == "Y":
-                result = graph
-                date_exists = True
-                break
-        # Remove the graph from the list, since we append it later on, and hence, want to avoid duplicates
-        if date_exists:
-            graphs.remove(result)
-        # Desired graph does not exist yet, create it
-        if not date_exists:
-            result = Graph(Timestamp(year=year))
-    # desired graph has month granularity
-    elif year and month:
-        for graph in graphs:
-            if graph.timestamp.year == year and graph.timestamp.month == month and graph.timestamp.granularity == "M":
-                result = graph
-                date_exists = True
-                break
-        # Remove the graph from the list, since we append it later on, and hence, want to avoid duplicates
-        if date_exists:
-            graphs.remove(result)
-        # Desired graph does not exist yet, create it
-        if not date_exists:
-            result = Graph(Timestamp(year=year, month=month))
-    return result
+    graph = graphs.get(timestamp)
+    if graph is None:
+        graph = Graph(timestamp)
+        graphs[timestamp] = graph
+    return graph
+
+
+def add_cooccurrence_records(graphs: typing.Dict[Timestamp, Graph], word_records: typing.Iterable[tuple],
+                             pair_records: typing.Iterable[tuple]) -> typing.Set[Timestamp]:
+    """
+    Adds co-occurrences given as compact records (see cooccurrences.CooccurrenceRuns) to the graphs, which are created
+    in graphs if necessary.
+    @param graphs: graphs by timestamp
+    @param word_records: Distinct word records in sorted order
+    @param pair_records: Distinct pair records in sorted order
+    @return: Timestamps of the changed graphs
+    """
+    changed = set()
+    # records are grouped by timestamp and label, every record is a distinct word
+    for (key, label), records in itertools.groupby(word_records, key=lambda r: r[:2]):
+        graph = get_graph_from_dict(graphs, Timestamp.from_key(key))
+        graph.add_counted_node(label, sum(1 for _ in records))
+        changed.add(graph.timestamp)
+    # records are grouped by timestamp and pair of labels, every record is a distinct pair of sentences
+    spans = {}
+    for (key, label1, label2), records in itertools.groupby(pair_records, key=lambda r: r[:3]):
+        sent_functionality = []
+        for record in records:
+            # records may be read as new objects, equal sentences share one span tuple to keep the graphs compact
+            span1 = spans.setdefault(record[3:6], (record[3], (record[4], record[5])))
+            span2 = spans.setdefault((record[3],) + record[6:8], (record[3], (record[6], record[7])))
+            sent_functionality.append({"doc_id": span1[0], "sentence1": span1[1], "sentence2": span2[1]})
+        graphs[Timestamp.from_key(key)].add_counted_edge(label1, label2, sent_functionality)
+    return changed
 
 
 # extra function for multiprocessing
 def create_graph_from_timecentric_cooccurrences(data: typing.Tuple[Timestamp,
                                                                    typing.List[typing.Tuple[Documents.Word,
                                                                                             Documents.Word]]],
-                                                existing_graphs: typing.List[Graph]) \
+                                                existing_graphs: typing.Dict[Timestamp, Graph]) \
         -> typing.List[Graph]:
     """
-    Construct graphs from given co-occurrence list
+    Construct graphs from given co-occurrence list. The co-occurrences are added to the graph of the timestamp as well
+    as to the graphs of its coarser granularities, which are created in existing_graphs if necessary.
     @param data: tuple with (timestamp, list of co-occurrences)
-    @param existing_graphs: Graphs previously computed
-    @return: list of graphs with changed content
+    @param existing_graphs: Graphs previously computed, by timestamp
+    @return: list of graphs with changed content, from finest to coarsest granularity
     """
     timestamp, timecentric_cooccurrences = data[0], data[1]
 
-    # timestamp is of year granularity
-    if timestamp.year and not timestamp.month and not timestamp.day:
-        graph_year = Graph(timestamp)
-        for word1, word2 in timecentric_cooccurrences:
-            graph_year.add_edge(word1, word2)
-        return [graph_year]
-
-    # timestamp is of month granularity
-    if timestamp.year and timestamp.month and not timestamp.day:
-        graph_year = get_graph_from_list(existing_graphs, timestamp.year)
-        graph_month = Graph(timestamp)
-        for word1, word2 in timecentric_cooccurrences:
-            graph_year.add_edge(word1, word2)
-            graph_month.add_edge(word1, word2)
-        return [graph_month, graph_year]
-
-    # timestamp is of day granularity
-    if timestamp.year and timestamp.month and timestamp.day:
-        graph_year = get_graph_from_list(existing_graphs, timestamp.year)
-        graph_month = get_graph_from_list(existing_graphs, timestamp.year, timestamp.month)
-        graph_day = Graph(timestamp)
-        for word1, word2 in timecentric_cooccurrences:
-            graph_year.add_edge(word1, word2)
-            graph_month.add_edge(word1, word2)
-            graph_day.add_edge(word1, word2)
-        return [graph_day, graph_month, graph_year]
-
-    return []
+    if not timestamp.year:
+        return []
+
+    graphs = []
+    while timestamp is not None:
+        graphs.append(get_graph_from_dict(existing_graphs, timestamp))
+        timestamp = timestamp.parent
+
+    coarsest_first = graphs[::-1]
+    for word1, word2 in timecentric_cooccurrences:
+        for graph in coarsest_first:
+            graph.add_edge(word1, word2)
+    return graphs
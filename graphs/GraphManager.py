@@ -1,75 +1,428 @@
 from __future__ import annotations
 
 import argparse
+import bisect
 import typing
 import collections
 import multiprocessing
-import timeit
 import math
-import collections
-import sys
 
 import tqdm
 
 from graphs.Graph import Graph
-from graphs.Graph import create_graph_from_timecentric_cooccurrences
+from graphs.Graph import add_cooccurrence_records, create_graph_from_timecentric_cooccurrences, get_graph_from_dict
 from documents.Timestamps import Timestamp
 import documents.Documents as Documents
-from cooccurrences.cooccurrences import extract_timecentric_cooccurrences_from_collection
+from cooccurrences.cooccurrences import CooccurrenceRuns, extract_timecentric_cooccurrences_from_collection, \
+    extract_timecentric_cooccurrences_to_runs
+import metrics.metrics as metrics
+import graphs.counts as counts
+import graphs.parallel as parallel
+import graphs.trajectories as trajectories
+import cooccurrences.heavyhitters as heavyhitters
 
 
 class GraphManager:
+    """
+    Holds the time-centric co-occurrence graphs by timestamp. Besides the graphs dictionary, an ordered index of the
+    timestamp keys (see Timestamp.key) per granularity is maintained, which allows for range queries, navigation between
+    granularities and chronological iteration. If graphs are added to or removed from self.graphs directly instead of
+    with add_graph and remove_graph, the index is rebuilt on its next use.
+    """
     graphs: typing.DefaultDict[Timestamp, Graph]
     weighting_function = None
+    granularities = ("Y", "M", "D")
+    _index: typing.Optional[typing.Dict[str, typing.List[int]]]
+    _indexed_timestamps: typing.Set[Timestamp]
 
     def __init__(self, timecentric_graphs: typing.DefaultDict[Timestamp, Graph]) -> None:
         self.graphs = timecentric_graphs
+        self._index = None
+        self._indexed_timestamps = set()
+
+    def _granularity_index(self) -> typing.Dict[str, typing.List[int]]:
+        """
+        Returns the sorted timestamp keys per granularity, and rebuilds them if self.graphs was changed directly.
+        """
+        # compares the key sets, s.t. replaced graphs are detected even if the number of graphs is the same
+        if self._index is None or self._indexed_timestamps != self.graphs.keys():
+            self.rebuild_index()
+        return self._index
+
+    def rebuild_index(self) -> None:
+        self._index = {granularity: [] for granularity in self.granularities}
+        for timestamp in self.graphs.keys():
+            if timestamp.granularity in self._index:
+                self._index[timestamp.granularity].append(timestamp.key)
+        for keys in self._index.values():
+            keys.sort()
+        self._indexed_timestamps = set(self.graphs.keys())
+
+    def add_graph(self, graph: Graph) -> None:
+        index = self._granularity_index()
+        if graph.timestamp not in self.graphs and graph.timestamp.granularity in index:
+            bisect.insort(index[graph.timestamp.granularity], graph.timestamp.key)
+        self.graphs[graph.timestamp] = graph
+        self._indexed_timestamps.add(graph.timestamp)
+
+    def remove_graph(self, timestamp: Timestamp) -> typing.Optional[Graph]:
+        index = self._granularity_index()
+        graph = self.graphs.pop(timestamp, None)
+        if graph is not None and timestamp.granularity in index:
+            keys = index[timestamp.granularity]
+            del keys[bisect.bisect_left(keys, timestamp.key)]
+        self._indexed_timestamps.discard(timestamp)
+        return graph
+
+    def timestamps(self, granularity: str = None) -> typing.List[Timestamp]:
+        """
+        All timestamps for which a graph exists in chronological order. Coarser timestamps precede the timestamps within
+        their period, e.g., 1990 precedes 1990-01.
+        @param granularity: "Y", "M" or "D", all granularities if None
+        @return: list of timestamps
+        """
+        index = self._granularity_index()
+        if granularity:
+            keys = index.get(granularity, [])
+        else:
+            keys = sorted(key for keys in index.values() for key in keys)
+        return [Timestamp.from_key(key) for key in keys]
+
+    def iter_chronological(self, granularity: str = None) -> typing.Iterator[Graph]:
+        """
+        Iterates over the graphs in chronological order, see timestamps.
+        @param granularity: "Y", "M" or "D", all granularities if None
+        """
+        for timestamp in self.timestamps(granularity):
+            yield self.graphs[timestamp]
+
+    def graphs_in_range(self, start: Timestamp, end: Timestamp, granularity: str = None) -> typing.List[Graph]:
+        """
+        Returns the graphs within a time range in chronological order, e.g., all month graphs from 1990-03 to 1995-07.
+        Both bounds are inclusive and cover their whole period, i.e., an end of 1995 includes 1995-12-31.
+        @param start: first timestamp of the range
+        @param end: last timestamp of the range
+        @param granularity: "Y", "M" or "D", all granularities if None
+        @return: list of graphs
+        """
+        index = self._granularity_index()
+        granularities = [granularity] if granularity else self.granularities
+        keys = []
+        for g in granularities:
+            sorted_keys = index.get(g, [])
+            keys.extend(sorted_keys[bisect.bisect_left(sorted_keys, start.key):
+                                    bisect.bisect_right(sorted_keys, end.last_key)])
+        if not granularity:
+            keys.sort()
+        return [self.graphs[Timestamp.from_key(key)] for key in keys]
+
+    def children(self, timestamp: Timestamp) -> typing.List[Graph]:
+        """
+        Returns the graphs of the next finer granularity within the period of a timestamp, e.g., the months of a year.
+        @param timestamp: timestamp of year or month granularity
+        @return: list of graphs in chronological order
+        """
+        finer = {"Y": "M", "M": "D"}.get(timestamp.granularity)
+        if not finer:
+            return []
+        return self.graphs_in_range(timestamp, timestamp, finer)
+
+    def parent(self, timestamp: Timestamp) -> typing.Optional[Graph]:
+        """
+        Returns the graph of the next coarser granularity, e.g., the year of a month.
+        @param timestamp: timestamp of month or day granularity
+        @return: the graph, or None if it does not exist
+        """
+        parent = timestamp.parent
+        if parent is None:
+            return None
+        return self.graphs.get(parent)
 
     @classmethod
     def from_DocumentCollection(cls, documents: Documents.DocumentCollection, args: argparse.Namespace) -> GraphManager:
-        # First, extract time-centric co-occurrences
-        print("Start extracting time-centric co-occurrences.")
+        """
+        Extracts the time-centric co-occurrences of the documents and creates their graphs. If args.spill_records is
+        set, at most this many co-occurrence records are held in memory, see cooccurrences.CooccurrenceRuns.
+        """
+        if args.heavy_hitters:
+            return cls.from_heavy_hitters(documents, args)
+        manager = cls(collections.defaultdict(None))
+        manager.merge_DocumentCollection(documents, args)
+        manager.record_size("constructed")
+        return manager
+
+    @classmethod
+    def from_DocumentCollection_in_parallel(cls, documents: Documents.DocumentCollection, args: argparse.Namespace,
+                                            n: int, counts_folder: str = None, top_partners: int = 3) \
+            -> (GraphManager, typing.Dict[Timestamp, list]):
+        """
+        Creates, weights with tf-itf per granularity and prunes the graphs of every year in a pool of args.processes
+        worker processes, see graphs/parallel.py. The graphs are the same as of from_DocumentCollection,
+        weight_graph_nodes and reduce_to_highest_weighted_nodes, up to their ids.
+        @param n: Number of highest weighted nodes kept per graph
+        @param counts_folder: Folder the raw counts of the unpruned graphs are stored in (see graphs/counts.py), not
+        stored if None
+        @param top_partners: Number of strongest co-occurring terms per trajectory entry
+        @return: The pruned graphs, and the trajectory entries of the weighted graphs before pruning, see
+        trajectories.write_trajectory_entries
+        """
+        with metrics.stage("cooccurrences", "extracting time-centric co-occurrences by year"):
+            years = parallel.extract_year_records(documents, args)
+            itf = parallel.inverse_timestamp_frequencies_by_year(years)
+        if counts_folder:
+            # replaces the counts of a previous run, the workers store the counts of their years
+            counts.save_counts({}, counts_folder)
+
+        graphs = {}
+        entries = {}
+        nodes, edges = 0, 0
+        with metrics.stage("graph_construction", "creating, weighting and pruning the graphs of {} years in {} "
+                                                 "processes".format(len(years), args.processes)):
+            # the largest years are started first, s.t. the processes finish at about the same time
+            tasks = (parallel.year_task(years.pop(year), itf, n, counts_folder, top_partners)
+                     for year in sorted(years, key=lambda year: len(years[year].pairs), reverse=True))
+            spans = {}
+            progress = metrics.Progress("Year", len(years))
+            with multiprocessing.Pool(args.processes) as pool:
+                for year_graphs, year_entries, constructed in pool.imap_unordered(parallel.create_year_graphs, tasks):
+                    for compact in year_graphs:
+                        graph = parallel.restore_graph(compact, spans)
+                        graphs[graph.timestamp] = graph
+                    entries.update((Timestamp.from_key(key), entry) for key, entry in year_entries.items())
+                    nodes += constructed[0]
+                    edges += constructed[1]
+                    progress.update()
+        metrics.record("constructed", {"graphs": len(graphs), "nodes": nodes, "edges": edges})
+
+        manager = cls(collections.defaultdict(None))
+        manager._set_graphs(graphs)
+        manager.record_size("pruned")
+        return manager, entries
+
+    @classmethod
+    def from_DocumentCollection_in_runs(cls, documents: Documents.DocumentCollection, args: argparse.Namespace,
+                                        n: int, counts_folder: str = None, top_partners: int = 3) \
+            -> (GraphManager, typing.Dict[Timestamp, list]):
+        """
+        Extracts the time-centric co-occurrences of the documents to spilled runs (see cooccurrences.CooccurrenceRuns),
+        and creates, weights with tf-itf per granularity and prunes their graphs one timestamp at a time. Besides the
+        buffer of the extraction, only one unpruned graph is held in memory. The graphs are the same as of
+        from_DocumentCollection, weight_graph_nodes and reduce_to_highest_weighted_nodes. The runs are deleted
+        afterwards.
+        @param n: Number of highest weighted nodes kept per graph
+        @param counts_folder: Folder the raw counts of the unpruned graphs are stored in (see graphs/counts.py), not
+        stored if None
+        @param top_partners: Number of strongest co-occurring terms per trajectory entry
+        @return: The pruned graphs, and the trajectory entries of the weighted graphs before pruning, see
+        trajectories.write_trajectory_entries
+        """
+        with metrics.stage("cooccurrences", "extracting time-centric co-occurrences"):
+            cooccurrence_runs = extract_timecentric_cooccurrences_to_runs(documents, args)
+        with metrics.stage("weighting", "computing inverse timestamp frequencies from spilled runs"):
+            itf = parallel.inverse_timestamp_frequencies(cooccurrence_runs.timestamps, cooccurrence_runs.merged_nodes())
+        if counts_folder:
+            # replaces the counts of a previous run, the counts of every graph are stored before it is pruned
+            counts.save_counts({}, counts_folder)
+
+        graphs = {}
+        entries = {}
+        nodes, edges = 0, 0
+        with metrics.stage("graph_construction", "creating, weighting and pruning graphs from spilled runs"):
+            progress = metrics.Progress("Graph", len(cooccurrence_runs.timestamps))
+            for key, word_records, pair_records in cooccurrence_runs.merged_by_timestamp():
+                timestamp = Timestamp.from_key(key)
+                graph = Graph(timestamp)
+                add_cooccurrence_records({timestamp: graph}, word_records, pair_records)
+                del word_records, pair_records
+                if counts_folder:
+                    counts.save_counts({timestamp: graph}, counts_folder, [timestamp])
+                nodes += len(graph.node_to_label)
+                edges += len(graph.edge_to_nodes)
+                parallel.weight_graph(graph, itf)
+                entries[timestamp] = trajectories.graph_entries(graph, top_partners)
+                graph.reduce_to_highest_weighted_nodes(n)
+                graphs[timestamp] = graph
+                progress.update()
+            cooccurrence_runs.remove()
+        metrics.record("constructed", {"graphs": len(graphs), "nodes": nodes, "edges": edges})
+
+        manager = cls(collections.defaultdict(None))
+        manager._set_graphs(graphs)
+        manager.record_size("pruned")
+        return manager, entries
+
+    @classmethod
+    def from_heavy_hitters(cls, documents: Documents.DocumentCollection, args: argparse.Namespace) -> GraphManager:
+        """
+        Approximate graph creation, see cooccurrences/heavyhitters.py. The graphs hold the terms of the Space-Saving
+        summaries with an error bound of args.heavy_hitters, and the co-occurrences among the args.candidates highest
+        weighted of these terms. Terms are counted exactly if args.exact_recount is set, otherwise their counts are
+        estimated by the summaries.
+        """
+        with metrics.stage("term_summaries", "summarizing the terms of every timestamp"):
+            summaries = heavyhitters.summarize_terms(documents, args)
+        metrics.record("max_count_error", max((summary.max_error for summary in summaries.values()), default=0))
+
+        graphs = {}
+        for timestamp, summary in summaries.items():
+            graph = Graph(timestamp)
+            for label, count in summary.counts.items():
+                graph.add_counted_node(label, count)
+            graphs[timestamp] = graph
+        manager = cls(collections.defaultdict(None))
+        manager._set_graphs(graphs)
+
+        # candidates are the highest weighted terms by their estimated counts
+        manager._tf_itf_weighting_per_granularity()
+        candidates = {timestamp: set(node.label for node in sorted(graph.nodes(), key=lambda node: node.weight,
+                                                                   reverse=True)[:args.candidates])
+                      for timestamp, graph in manager.graphs.items()}
+        labels = {timestamp: set(summary.counts.keys()) for timestamp, summary in summaries.items()} \
+            if args.exact_recount else None
+        del summaries
 
-        start = timeit.default_timer()
-        timecentric_coocs = extract_timecentric_cooccurrences_from_collection(documents, args)
-        end = timeit.default_timer()
-        print("Finished extracting time-centric co-occurrences in", end - start, "seconds.")
+        with metrics.stage("cooccurrences", "extracting time-centric co-occurrences of candidate terms"):
+            sentences, counts = heavyhitters.count_candidate_cooccurrences(documents, args, candidates, labels)
 
+        with metrics.stage("graph_construction", "creating time-centric co-occurrence graphs"):
+            for timestamp, graph in manager.graphs.items():
+                for node in graph.nodes():
+                    if args.exact_recount:
+                        node.count = counts[timestamp][node.label]
+                    node.weight = node.count
+                for (label1, label2), pair_sentences in sentences.pop(timestamp, {}).items():
+                    graph.add_counted_edge(label1, label2, [{"doc_id": doc_id, "sentence1": span1, "sentence2": span2}
+                                                            for doc_id, span1, span2 in pair_sentences])
+        manager.record_size("constructed")
+        return manager
+
+    @classmethod
+    def from_timecentric_cooccurrences(cls, timecentric_coocs: typing.Dict[Timestamp, list]) -> GraphManager:
+        """
+        Creates a graph for each timestamp co-occurrences were extracted for, and the graphs of its coarser
+        granularities.
+        @param timecentric_coocs: Time-centric co-occurrences by timestamp, see cooccurrences.py
+        @return: The graphs
+        """
+        manager = cls(collections.defaultdict(None))
+        manager.merge_timecentric_cooccurrences(timecentric_coocs)
+        manager.record_size("constructed")
+        return manager
+
+    @classmethod
+    def from_cooccurrence_records(cls, timestamps: typing.Iterable[int], word_records: typing.Iterable[tuple],
+                                  pair_records: typing.Iterable[tuple]) -> GraphManager:
+        """
+        Creates the graphs of co-occurrences given as compact records, see cooccurrences.CooccurrenceRuns.
+        @param timestamps: Keys of the timestamps with a graph, including timestamps without co-occurrences
+        @param word_records: Distinct word records in sorted order
+        @param pair_records: Distinct pair records in sorted order
+        @return: The graphs
+        """
+        with metrics.stage("graph_construction", "creating time-centric co-occurrence graphs"):
+            graphs = {}
+            for key in timestamps:
+                get_graph_from_dict(graphs, Timestamp.from_key(key))
+            add_cooccurrence_records(graphs, word_records, pair_records)
+            manager = cls(collections.defaultdict(None))
+            manager._set_graphs(graphs)
+        manager.record_size("constructed")
+        return manager
+
+    @classmethod
+    def from_counts(cls, folders: typing.List[str]) -> GraphManager:
+        """
+        Restores the unweighted graphs of a previous run from their raw counts, see graphs/counts.py. Counts of several
+        runs on disjoint documents are merged, see counts.merge_counts.
+        @param folders: Folders of the counts
+        @return: The graphs
+        """
+        with metrics.stage("load_counts", "loading raw counts"):
+            graphs = counts.load_counts(folders[0]) if len(folders) == 1 else counts.merge_counts(folders)
+            timecentric_graphs = collections.defaultdict(None)
+            for timestamp in sorted(graphs.keys()):
+                timecentric_graphs[timestamp] = graphs[timestamp]
+        manager = cls(timecentric_graphs)
+        manager.record_size("loaded")
+        return manager
+
+    def merge_DocumentCollection(self, documents: Documents.DocumentCollection,
+                                 args: argparse.Namespace) -> typing.Set[Timestamp]:
+        """
+        Adds the co-occurrences of new documents to the graphs, see merge_timecentric_cooccurrences and
+        merge_cooccurrence_runs.
+        @return: Timestamps of the changed graphs
+        """
+        with metrics.stage("cooccurrences", "extracting time-centric co-occurrences"):
+            if args.spill_records:
+                cooccurrence_runs = extract_timecentric_cooccurrences_to_runs(documents, args)
+            else:
+                timecentric_coocs = extract_timecentric_cooccurrences_from_collection(documents, args)
+
+        if args.spill_records:
+            return self.merge_cooccurrence_runs(cooccurrence_runs)
+        return self.merge_timecentric_cooccurrences(timecentric_coocs)
+
+    def merge_timecentric_cooccurrences(self, timecentric_coocs: typing.Dict[Timestamp, list]) -> typing.Set[Timestamp]:
+        """
+        Adds co-occurrences to the graph of their timestamp and the graphs of its coarser granularities. Missing graphs
+        are created. Weights are not updated, see weight_graph_nodes.
+        @param timecentric_coocs: Time-centric co-occurrences by timestamp, see cooccurrences.py
+        @return: Timestamps of the changed graphs
+        """
         # Create a graph for each date co-occurrences were extracted from
-        print("Start creating time-centric co-occurrence graphs.")
-        sys.stdout.flush()
-        start = timeit.default_timer()
-
-        graphs = []
-
-        count, max_count = 1, len(timecentric_coocs)
-        for key, value in timecentric_coocs.items():
-            print("Graph (Y):", count, "/", max_count, end="\r", flush=True)
-            if key.year and not key.month and not key.day:
-                graphs.extend(create_graph_from_timecentric_cooccurrences((key, value), graphs))
-            count += 1
-
-        count, max_count = 1, len(timecentric_coocs)
-        for key, value in timecentric_coocs.items():
-            print("Graph (M):", count, "/", max_count, end="\r", flush=True)
-            if key.year and key.month and not key.day:
-                graphs.extend(create_graph_from_timecentric_cooccurrences((key, value), graphs))
-            count += 1
-
-        count, max_count = 1, len(timecentric_coocs)
-        for key, value in timecentric_coocs.items():
-            print("Graph (D):", count, "/", max_count, end="\r", flush=True)
-            if key.year and key.month and key.day:
-                graphs.extend(create_graph_from_timecentric_cooccurrences((key, value), graphs))
-            count += 1
-
-        timecentric_graphs = collections.defaultdict(None)
-        for g in graphs:
-            timecentric_graphs[g.timestamp] = g
-        end = timeit.default_timer()
-        print("Finished extracting time-centric co-occurrence graphs in", end - start, "seconds.", flush=True)
-
-        return cls(timecentric_graphs)
+        with metrics.stage("graph_construction", "creating time-centric co-occurrence graphs"):
+            # Bucket timestamps by granularity once, coarser granularities are processed first
+            by_granularity = collections.defaultdict(list)
+            for key in timecentric_coocs.keys():
+                by_granularity[key.granularity].append(key)
+
+            graphs = dict(self.graphs)
+            changed = set()
+            for granularity in self.granularities:
+                progress = metrics.Progress("Graph (" + granularity + ")", len(by_granularity[granularity]))
+                for key in by_granularity[granularity]:
+                    changed.update(graph.timestamp for graph in
+                                   create_graph_from_timecentric_cooccurrences((key, timecentric_coocs[key]), graphs))
+                    progress.update()
+
+            self._set_graphs(graphs)
+        return changed
+
+    def merge_cooccurrence_runs(self, cooccurrence_runs: CooccurrenceRuns) -> typing.Set[Timestamp]:
+        """
+        Merges spilled co-occurrences into the graphs, see merge_timecentric_cooccurrences. The sorted runs are merged
+        externally, s.t. only the records of one node or edge are held in memory at once. The runs are deleted
+        afterwards.
+        @param cooccurrence_runs: Co-occurrences extracted with extract_timecentric_cooccurrences_to_runs
+        @return: Timestamps of the changed graphs
+        """
+        with metrics.stage("graph_construction", "creating time-centric co-occurrence graphs from spilled runs"):
+            graphs = dict(self.graphs)
+            changed = add_cooccurrence_records(graphs, cooccurrence_runs.merged_words(),
+                                               cooccurrence_runs.merged_pairs())
+            # graphs of windows without co-occurrences exist as well, as in merge_timecentric_cooccurrences
+            for key in cooccurrence_runs.timestamps:
+                changed.add(get_graph_from_dict(graphs, Timestamp.from_key(key)).timestamp)
+            cooccurrence_runs.remove()
+            self._set_graphs(graphs)
+        return changed
+
+    def _set_graphs(self, graphs: typing.Dict[Timestamp, Graph]) -> None:
+        # keep the graphs in chronological order
+        self.graphs = collections.defaultdict(None)
+        for timestamp in sorted(graphs.keys()):
+            self.graphs[timestamp] = graphs[timestamp]
+        self.rebuild_index()
+
+    def record_size(self, step: str) -> None:
+        """
+        Records the number of graphs, nodes and edges in the run report, see metrics.record.
+        @param step: Name of the processing step, e.g., "pruned"
+        """
+        metrics.record(step, {"graphs": len(self.graphs),
+                              "nodes": sum(len(graph.node_to_label) for graph in self.graphs.values()),
+                              "edges": sum(len(graph.edge_to_nodes) for graph in self.graphs.values())})
 
     def _tf_itf_weighting_per_granularity(self) -> None:
         granularities = ["D", "M", "Y"]
@@ -79,20 +432,18 @@ class GraphManager:
             # around how many timestamps is the term found
             term_around_x_timestamps = collections.defaultdict(int)
             number_of_timestamps = 0
-            for graph in self.graphs.values():
-                if graph.timestamp.granularity == granularity:
-                    number_of_timestamps += 1
-                    for node in graph.nodes():
-                        sum_terms += node.count
-                        term_around_x_timestamps[node.label] += 1
+            for graph in self.iter_chronological(granularity):
+                number_of_timestamps += 1
+                for node in graph.nodes():
+                    sum_terms += node.count
+                    term_around_x_timestamps[node.label] += 1
             itf = dict()
             sum_terms = 1
             for term, count in term_around_x_timestamps.items():
                 itf[term] = math.log(number_of_timestamps / (1 + count))
-            for graph in self.graphs.values():
-                if graph.timestamp.granularity == granularity:
-                    for node in graph.nodes():
-                        node.weight = (node.count / sum_terms) * itf[node.label]
+            for graph in self.iter_chronological(granularity):
+                for node in graph.nodes():
+                    node.weight = (node.count / sum_terms) * itf[node.label]
 
     def _tf_itf_weighting(self) -> None:
         # for normalization
@@ -122,11 +473,8 @@ class GraphManager:
             print("GraphManager: Invalid function name in weight_graph_nodes. No changes made.")
             return
         else:
-            print("Start weighing graph nodes.", flush=True)
-            start = timeit.default_timer()
-            func()
-            end = timeit.default_timer()
-            print("Calculated weights in", end - start, "seconds.", flush=True)
+            with metrics.stage("weighting", "weighing graph nodes"):
+                func()
 
     def remove_self_loops(self) -> None:
         for graph in self.graphs.values():
@@ -137,27 +485,43 @@ class GraphManager:
             graph.remove_timestamp_self_appearance()
 
     def reduce_to_highest_weighted_nodes(self, n: int) -> None:
-        print(f"Reducing graphs to {n} highest weighted nodes.", flush=True)
-        start = timeit.default_timer()
-        # map(lambda g: g.reduce_to_highest_weighted_nodes(n), self.graphs.values())
-        # [g.reduce_to_highest_weighted_nodes(n) for g in self.graphs.values()]
-        count, max_count = 0, len(self.graphs)
-        for graph in self.graphs.values():
-            print("Graph:", count, "/", max_count, end="\r", flush=True)
-            count += 1
-            graph.reduce_to_highest_weighted_nodes(n)
-        end = timeit.default_timer()
-        print("Reduced graphs in", end - start, "seconds.", flush=True)
+        with metrics.stage("pruning", f"reducing graphs to {n} highest weighted nodes"):
+            # map(lambda g: g.reduce_to_highest_weighted_nodes(n), self.graphs.values())
+            # [g.reduce_to_highest_weighted_nodes(n) for g in self.graphs.values()]
+            progress = metrics.Progress("Graph", len(self.graphs))
+            for graph in self.graphs.values():
+                graph.reduce_to_highest_weighted_nodes(n)
+                progress.update()
+        self.record_size("pruned")
 
-    def create_graphs_json(self) -> typing.Dict[str, typing.Dict]:
+    def create_graphs_json(self, include_provenance: bool = False) -> typing.Dict[str, typing.Dict]:
+        """
+        @param include_provenance: Store the co-occurring sentences of every edge inline as "sent_functionality".
+        Otherwise, edges only carry their id and support count, and the sentences are created by
+        create_provenance_json.
+        @return: Timestamp to graph with fields "nodes" and "edges"
+        """
         result = {}
         for timestamp, graph in self.graphs.items():
+            edges = []
+            for edge in graph.edges():
+                edge_json = {"id": edge.id, "from": edge.source.id, "to": edge.target.id,
+                             "value": len(edge.sent_functionality)}
+                if include_provenance:
+                    edge_json["sent_functionality"] = edge.sent_functionality
+                edges.append(edge_json)
             result[str(timestamp)] = {
                     "nodes": [{"id": node.id, "label": node.label, "value": node.weight} for node in graph.nodes()],
-                    "edges": [
-                        {"from": edge.source.id, "to": edge.target.id, "value": len(edge.sent_functionality),
-                         "sent_functionality": edge.sent_functionality}
-                        for edge in graph.edges()
-                    ]}
+                    "edges": edges}
+        return result
+
+    def create_provenance_json(self) -> typing.Dict[str, typing.List[typing.Dict]]:
+        """
+        @return: Edge id to the co-occurring sentences of the edge, for all edges of all graphs
+        """
+        result = {}
+        for graph in self.graphs.values():
+            for edge in graph.edges():
+                result[str(edge.id)] = edge.sent_functionality
         return result
 
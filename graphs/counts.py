@@ -0,0 +1,199 @@
+"""
+Raw counts of the time-centric graphs, i.e., the count of every node and the co-occurring sentences (provenance) of
+every edge, persisted separately from the derived weights. New documents can be merged into the graphs of a previous
+run (see main.py --append), s.t. only the new documents are tagged and processed. The weights are recomputed from the
+counts.
+
+Files:
+    state.json              format version, extraction parameters, next document id, whether the counts are
+                            approximate (see cooccurrences/heavyhitters.py), and the digest of every exported
+                            graph, s.t. only changed graphs are exported again
+    graphs/<timestamp>.json nodes as [id, label, count], and edges as [id, source id, target id, sentences]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import typing
+
+from documents.Timestamps import Timestamp
+from graphs.Graph import Edge, Graph, Node
+
+COUNTS_VERSION = 1
+
+
+def _year_bound(year: float) -> typing.Optional[int]:
+    # unbounded years are stored as null
+    return None if math.isinf(year) else year
+
+
+def new_state(args: argparse.Namespace) -> typing.Dict[str, typing.Any]:
+    """
+    @param args: Arguments of the run, i.e., window size as well as start and end year
+    @return: State of a run without previous counts
+    """
+    return {"version": COUNTS_VERSION,
+            "window_size": args.window_size,
+            "start_year": _year_bound(args.start_year),
+            "end_year": _year_bound(args.end_year),
+            "next_document_id": 1,
+            "approximate": bool(args.heavy_hitters),
+            "digests": {}}
+
+
+def load_state(folder: str, args: argparse.Namespace) -> typing.Dict[str, typing.Any]:
+    """
+    Loads the state of a previous run, whose counts new documents are merged into.
+    @param folder: Folder of the counts
+    @param args: Arguments of the run, which have to match the extraction parameters of the previous run
+    @return: The state
+    """
+    path = os.path.join(folder, "state.json")
+    if not os.path.isfile(path):
+        raise FileNotFoundError("No counts of a previous run found in " + folder)
+    with open(path, "r") as f:
+        state = json.load(f)
+    if state.get("version") != COUNTS_VERSION:
+        raise ValueError("Unsupported counts version: " + str(state.get("version")))
+    if state.get("approximate"):
+        raise ValueError("Documents cannot be merged into the counts of an approximate extraction.")
+    expected = new_state(args)
+    for name in ("window_size", "start_year", "end_year"):
+        if state[name] != expected[name]:
+            raise ValueError("Parameter {} differs from the previous run ({} vs. {}).".format(name, expected[name],
+                                                                                            state[name]))
+    return state
+
+
+def save_state(folder: str, state: typing.Dict[str, typing.Any]) -> None:
+    """
+    Stores the state. Call after the counts and the exported graphs are stored, s.t. the state always refers to
+    complete counts.
+    """
+    os.makedirs(folder, exist_ok=True)
+    temp_path = os.path.join(folder, "state.json.tmp")
+    with open(temp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(temp_path, os.path.join(folder, "state.json"))
+
+
+def save_counts(graphs: typing.Dict[Timestamp, Graph], folder: str,
+                timestamps: typing.Iterable[Timestamp] = None) -> None:
+    """
+    Stores the raw counts of the graphs. Call before the graphs are pruned.
+    @param graphs: The graphs by timestamp
+    @param folder: Folder of the counts
+    @param timestamps: Only store the graphs of these timestamps, e.g., the graphs new documents were merged into. All
+    previously stored counts are replaced if None.
+    """
+    graphs_folder = os.path.join(folder, "graphs")
+    if timestamps is None:
+        shutil.rmtree(graphs_folder, ignore_errors=True)
+        timestamps = graphs.keys()
+    os.makedirs(graphs_folder, exist_ok=True)
+
+    for timestamp in timestamps:
+        graph = graphs[timestamp]
+        data = {"timestamp": str(timestamp),
+                "nodes": [[node.id, node.label, node.count] for node in graph.nodes()],
+                "edges": [[edge.id, edge.source.id, edge.target.id, edge.sent_functionality] for edge in graph.edges()]}
+        temp_path = os.path.join(graphs_folder, str(timestamp) + ".json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, os.path.join(graphs_folder, str(timestamp) + ".json"))
+
+
+def load_counts(folder: str) -> typing.Dict[Timestamp, Graph]:
+    """
+    Restores the graphs from their raw counts. The ids of nodes and edges created afterwards continue after the
+    restored ids.
+    @param folder: Folder of the counts
+    @return: The unweighted graphs by timestamp
+    """
+    graphs_folder = os.path.join(folder, "graphs")
+    graphs = {}
+    for filename in os.listdir(graphs_folder):
+        if not filename.endswith(".json"):
+            continue
+        data = _read_graph_counts(os.path.join(graphs_folder, filename))
+        graph = Graph(Timestamp.from_TimexValue(data["timestamp"]))
+        nodes = {}
+        for node_id, label, count in data["nodes"]:
+            nodes[node_id] = Node.from_counts(node_id, label, count)
+            graph.restore_node(nodes[node_id])
+            Node.next_id = max(Node.next_id, node_id + 1)
+        for edge_id, source_id, target_id, sentences in data["edges"]:
+            graph.restore_edge(Edge.from_counts(edge_id, nodes[source_id], nodes[target_id], sentences))
+            Edge.next_id = max(Edge.next_id, edge_id + 1)
+        graphs[graph.timestamp] = graph
+    return graphs
+
+
+def _read_graph_counts(path: str) -> typing.Dict[str, typing.Any]:
+    with open(path, "r") as f:
+        data = json.load(f)
+    for edge in data["edges"]:
+        # sentence spans are tuples, as created by Edge.append_to_sentence_functionality
+        for sentence in edge[3]:
+            sentence["sentence1"] = tuple(sentence["sentence1"])
+            sentence["sentence2"] = tuple(sentence["sentence2"])
+    return data
+
+
+def merge_counts(folders: typing.List[str]) -> typing.Dict[Timestamp, Graph]:
+    """
+    Merges the raw counts of disjoint sets of documents, e.g., of the shards of mapreduce.py. Node and edge ids of the
+    merged graphs are assigned anew.
+    @param folders: Folders of the counts
+    @return: The unweighted graphs by timestamp
+    """
+    filenames = sorted(set(filename for folder in folders for filename in os.listdir(os.path.join(folder, "graphs"))
+                           if filename.endswith(".json")))
+    graphs = {}
+    for filename in filenames:
+        graph = None
+        for folder in folders:
+            path = os.path.join(folder, "graphs", filename)
+            if not os.path.isfile(path):
+                continue
+            data = _read_graph_counts(path)
+            if graph is None:
+                graph = Graph(Timestamp.from_TimexValue(data["timestamp"]))
+            labels = {}
+            for node_id, label, count in data["nodes"]:
+                labels[node_id] = label
+                graph.add_counted_node(label, count)
+            # the documents are disjoint, hence so are the sentences of an edge
+            for _, source_id, target_id, sentences in data["edges"]:
+                graph.add_counted_edge(labels[source_id], labels[target_id], sentences)
+        graphs[graph.timestamp] = graph
+    return graphs
+
+
+def graph_digest(graph_json: typing.Dict) -> str:
+    """
+    @param graph_json: An exported graph, see GraphManager.create_graphs_json
+    @return: Digest of the graph, which changes iff the exported graph changes
+    """
+    return hashlib.sha1(json.dumps(graph_json, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def changed_graphs(graphs_json: typing.Dict[str, typing.Dict], state: typing.Dict[str, typing.Any]) -> typing.List[str]:
+    """
+    Compares the exported graphs to the previous export, and updates the digests in the state.
+    @param graphs_json: Timestamp to exported graph, see GraphManager.create_graphs_json
+    @param state: State of the run
+    @return: Timestamps of the graphs that are new or differ from the previous export
+    """
+    changed = []
+    for timestamp, graph_json in graphs_json.items():
+        digest = graph_digest(graph_json)
+        if state["digests"].get(timestamp) != digest:
+            state["digests"][timestamp] = digest
+            changed.append(timestamp)
+    return changed
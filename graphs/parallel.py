@@ -0,0 +1,194 @@
+"""
+Parallel creation of the time-centric graphs. The graphs within a year, i.e., the graphs of the year and of its months
+and days, only depend on the co-occurrences within the year. Every year is therefore created, weighted and pruned by a
+worker process, see GraphManager.from_DocumentCollection_in_parallel. Workers receive the co-occurrences of a year as
+compact records (see cooccurrences.CooccurrenceRuns) instead of Word objects, which reference their sentences and
+documents, and return the pruned graphs as plain lists.
+
+The weights (tf-itf per granularity, see GraphManager) depend on the graphs of all years. Their inverse timestamp
+frequencies are computed beforehand from the word records, which determine the nodes of every graph.
+
+Node and edge ids are counted per process. Every year is therefore assigned its own range of ids, bounded by its number
+of word and pair records, s.t. the ids of the raw counts stored by the workers and of the restored graphs are unique
+across all years.
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import math
+import typing
+
+import documents.Documents as Documents
+import graphs.counts as counts
+import graphs.trajectories as trajectories
+import metrics.metrics as metrics
+from cooccurrences.cooccurrences import iterate_windows, window_records
+from documents.Timestamps import Timestamp
+from graphs.Graph import Edge, Graph, Node, add_cooccurrence_records
+
+
+class YearRecords:
+    """
+    Co-occurrence records of the timestamps within one year, see cooccurrences.CooccurrenceRuns.
+    """
+    timestamps: typing.Set[int]
+    pairs: typing.Set[tuple]
+    words: typing.Set[tuple]
+
+    def __init__(self) -> None:
+        self.timestamps = set()
+        self.pairs = set()
+        self.words = set()
+
+
+def extract_year_records(docs: Documents.DocumentCollection, args: argparse.Namespace) -> typing.Dict[int, YearRecords]:
+    """
+    Extracts the time-centric co-occurrences of the documents as records, partitioned by year.
+    @param docs: The documents
+    @param args: arguments from command-line arguments, i.e., start and end year as well as window size
+    @return: Records by key of the year
+    """
+    years = collections.defaultdict(YearRecords)
+    for timestamp, words, _ in iterate_windows(docs, args):
+        keys, pairs, word_records = window_records(timestamp, words)
+        # keys are ordered from finest to coarsest granularity, i.e., the year is last
+        records = years[keys[-1]]
+        records.timestamps.update(keys)
+        records.pairs.update(pairs)
+        records.words.update(word_records)
+        metrics.count("pairs", len(words) * (len(words) - 1) // 2)
+    return dict(years)
+
+
+def inverse_timestamp_frequencies(timestamps: typing.Iterable[int], nodes: typing.Iterable[typing.Tuple[int, str]]) \
+        -> typing.Dict[str, typing.Dict[str, float]]:
+    """
+    Computes the inverse timestamp frequency of every label per granularity, as the tf-itf weighting per granularity of
+    GraphManager does for the created graphs.
+    @param timestamps: Keys of the timestamps of all graphs
+    @param nodes: Distinct (timestamp key, label) of the nodes of all graphs
+    @return: Granularity to label to inverse timestamp frequency
+    """
+    number_of_timestamps = collections.Counter(Timestamp.from_key(key).granularity for key in timestamps)
+    term_around_x_timestamps = collections.defaultdict(collections.Counter)
+    for key, label in nodes:
+        term_around_x_timestamps[Timestamp.from_key(key).granularity][label] += 1
+    return {granularity: {term: math.log(number_of_timestamps[granularity] / (1 + count))
+                          for term, count in term_counts.items()}
+            for granularity, term_counts in term_around_x_timestamps.items()}
+
+
+def inverse_timestamp_frequencies_by_year(years: typing.Dict[int, YearRecords]) \
+        -> typing.Dict[str, typing.Dict[str, float]]:
+    """
+    @param years: Records by year
+    @return: Granularity to label to inverse timestamp frequency, see inverse_timestamp_frequencies
+    """
+    # a label is a node of a graph iff it has a word record of the timestamp
+    return inverse_timestamp_frequencies((key for records in years.values() for key in records.timestamps),
+                                         (node for records in years.values()
+                                          for node in set(record[:2] for record in records.words)))
+
+
+def weight_graph(graph: Graph, itf: typing.Dict[str, typing.Dict[str, float]]) -> None:
+    """
+    Weights the nodes of a graph with tf-itf of its granularity.
+    @param graph: The graph
+    @param itf: Inverse timestamp frequencies, see inverse_timestamp_frequencies
+    """
+    if graph.timestamp.granularity in itf:
+        granularity_itf = itf[graph.timestamp.granularity]
+        for node in graph.nodes():
+            node.weight = node.count * granularity_itf[node.label]
+
+
+def year_task(records: YearRecords, itf: typing.Dict[str, typing.Dict[str, float]], n: int,
+              counts_folder: typing.Optional[str], top_partners: int) -> tuple:
+    """
+    Reserves the ids of the nodes and edges of the year, see id_range.
+    @return: Arguments of create_year_graphs for the records of a year, with the inverse timestamp frequencies of its
+    labels only
+    """
+    labels = set(record[1] for record in records.words)
+    year_itf = {granularity: {label: frequencies[label] for label in labels if label in frequencies}
+                for granularity, frequencies in itf.items()}
+    return records, year_itf, n, counts_folder, top_partners, id_range(records)
+
+
+def id_range(records: YearRecords) -> typing.Tuple[int, int]:
+    """
+    Reserves the ids of the nodes and edges created from the records of a year. A year has at most one node per word
+    record and one edge per pair record.
+    @return: First node id and first edge id of the year
+    """
+    first_ids = Node.next_id, Edge.next_id
+    Node.next_id += len(records.words)
+    Edge.next_id += len(records.pairs)
+    return first_ids
+
+
+def create_year_graphs(task: tuple) -> (typing.List[tuple], typing.Dict[int, list], typing.Tuple[int, int]):
+    """
+    Creates, weights and prunes the graphs of one year, executed by the workers of the pool.
+    @param task: Records of the year, inverse timestamp frequencies of its labels, number of highest weighted nodes kept
+    per graph, folder the raw counts are stored in (see graphs/counts.py) or None, number of partners per
+    trajectory entry, and the first node and edge ids of the year, see year_task
+    @return: The pruned graphs (see compact_graph), the trajectory entries by timestamp key (see
+    trajectories.graph_entries), and the number of nodes and edges before pruning
+    """
+    records, itf, n, counts_folder, top_partners, first_ids = task
+    Node.next_id, Edge.next_id = first_ids
+    graphs = {Timestamp.from_key(key): Graph(Timestamp.from_key(key)) for key in sorted(records.timestamps)}
+    add_cooccurrence_records(graphs, sorted(records.words), sorted(records.pairs))
+    del records
+    if counts_folder:
+        counts.save_counts(graphs, counts_folder, graphs.keys())
+
+    constructed = (sum(len(graph.node_to_label) for graph in graphs.values()),
+                   sum(len(graph.edge_to_nodes) for graph in graphs.values()))
+    entries = {}
+    pruned = []
+    for timestamp, graph in graphs.items():
+        weight_graph(graph, itf)
+        entries[timestamp.key] = trajectories.graph_entries(graph, top_partners)
+        graph.reduce_to_highest_weighted_nodes(n)
+        pruned.append(compact_graph(graph))
+    return pruned, entries, constructed
+
+
+def compact_graph(graph: Graph) -> tuple:
+    """
+    @return: The graph as (timestamp key, nodes as [id, label, count, weight], edges as [id, label 1, label 2, sentences
+    as (doc id, sentence 1 start, sentence 1 end, sentence 2 start, sentence 2 end)])
+    """
+    nodes = [(node.id, node.label, node.count, node.weight) for node in graph.nodes()]
+    edges = [(edge.id, edge.source.label, edge.target.label,
+              [(sentence["doc_id"],) + tuple(sentence["sentence1"]) + tuple(sentence["sentence2"])
+               for sentence in edge.sent_functionality])
+             for edge in graph.edges()]
+    return graph.timestamp.key, nodes, edges
+
+
+def restore_graph(compact: tuple, spans: typing.Dict[tuple, tuple]) -> Graph:
+    """
+    Restores a graph of compact_graph with the ids assigned by the worker, i.e., the ids of its raw counts.
+    @param compact: The compact graph
+    @param spans: Cache of the sentence spans, s.t. equal sentences of all restored graphs share one span tuple
+    @return: The weighted graph
+    """
+    key, nodes, edges = compact
+    graph = Graph(Timestamp.from_key(key))
+    for node_id, label, count, weight in nodes:
+        node = Node.from_counts(node_id, label, count)
+        node.weight = weight
+        graph.restore_node(node)
+    for edge_id, label1, label2, sentences in edges:
+        sent_functionality = []
+        for sentence in sentences:
+            span1 = spans.setdefault(sentence[:3], (sentence[0], (sentence[1], sentence[2])))
+            span2 = spans.setdefault((sentence[0],) + sentence[3:5], (sentence[0], (sentence[3], sentence[4])))
+            sent_functionality.append({"doc_id": span1[0], "sentence1": span1[1], "sentence2": span2[1]})
+        graph.restore_edge(Edge.from_counts(edge_id, graph.label_to_node[label1], graph.label_to_node[label2],
+                                            sent_functionality))
+    return graph
@@ -0,0 +1,120 @@
+"""
+Term trajectories: the weight of every term in every graph, stored as a term x timestamp table in compressed sparse row
+(CSR) layout. Each row holds the timestamps of one term in chronological order, s.t. the time series of a term is a
+contiguous slice of every array. The table is written as a directory of .npy files, which the API memory-maps.
+
+Files:
+    terms.json          labels of the rows
+    timestamps.json     format version, and timestamps of the columns in chronological order
+    indptr.npy          int64, row i spans entries indptr[i]:indptr[i + 1]
+    columns.npy         int32, column of each entry
+    weights.npy         float64, node weight of the term in the graph
+    counts.npy          int32, node count of the term in the graph
+    partners.npy        int32, rows of the co-occurring terms with the highest support, -1 if there are fewer
+    support.npy         int32, support (number of co-occurring sentences) of these partners
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import typing
+
+import numpy as np
+
+from documents.Timestamps import Timestamp
+from graphs.Graph import Graph
+
+if typing.TYPE_CHECKING:
+    from graphs.GraphManager import GraphManager
+
+TRAJECTORY_TABLE_VERSION = 1
+
+
+def graph_entries(graph: Graph, top_partners: int = 3) \
+        -> typing.List[typing.Tuple[str, float, int, typing.List[typing.Tuple[int, str]]]]:
+    """
+    @param graph: A weighted graph
+    @param top_partners: Number of strongest co-occurring terms per entry
+    @return: Entry of every term of the graph as (label, weight, count, [(support, partner label)]), partners by
+    descending support
+    """
+    # support of the edges of every node, self-loops excluded
+    support = {node: [] for node in graph.nodes()}
+    for edge in graph.edges():
+        if edge.source == edge.target:
+            continue
+        support[edge.source].append((len(edge.sent_functionality), edge.target.label))
+        support[edge.target].append((len(edge.sent_functionality), edge.source.label))
+    entries = []
+    for node, edges in support.items():
+        edges.sort(key=lambda x: (-x[0], x[1]))
+        entries.append((node.label, node.weight, node.count, edges[:top_partners]))
+    return entries
+
+
+def write_trajectory_table(manager: GraphManager, output_folder: str, top_partners: int = 3) -> None:
+    """
+    Writes the trajectory table of all graphs. Call after weighting and before pruning the graphs, s.t. the table holds
+    the weights of all terms.
+    @param manager: The weighted graphs
+    @param output_folder: Directory the table is written to, created if necessary
+    @param top_partners: Number of strongest co-occurring terms stored per entry
+    """
+    write_trajectory_entries({timestamp: graph_entries(manager.graphs[timestamp], top_partners)
+                              for timestamp in manager.timestamps()}, output_folder, top_partners)
+
+
+def write_trajectory_entries(graph_entries_by_timestamp: typing.Dict[Timestamp, list], output_folder: str,
+                             top_partners: int = 3) -> None:
+    """
+    Writes the trajectory table of the entries of all graphs, e.g., computed by the workers of
+    GraphManager.from_DocumentCollection_in_parallel.
+    @param graph_entries_by_timestamp: Entries of every graph, see graph_entries
+    @param output_folder: Directory the table is written to, created if necessary
+    @param top_partners: Number of strongest co-occurring terms stored per entry
+    """
+    timestamps = sorted(graph_entries_by_timestamp.keys(), key=lambda timestamp: timestamp.key)
+    terms = sorted(set(entry[0] for entries in graph_entries_by_timestamp.values() for entry in entries))
+    rows = {term: row for row, term in enumerate(terms)}
+
+    entries = [[] for _ in terms]
+    for column, timestamp in enumerate(timestamps):
+        for label, weight, count, edges in graph_entries_by_timestamp[timestamp]:
+            row_entries = entries[rows[label]]
+            # a label occurs at most once per graph
+            if row_entries and row_entries[-1][0] == column:
+                continue
+            # partners are sorted by label for equal support, as are the rows
+            row_entries.append((column, weight, count,
+                                [(edge_support, rows[partner]) for edge_support, partner in edges]))
+
+    nnz = sum(len(row_entries) for row_entries in entries)
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    columns = np.empty(nnz, dtype=np.int32)
+    weights = np.empty(nnz, dtype=np.float64)
+    counts = np.empty(nnz, dtype=np.int32)
+    partners = np.full((nnz, top_partners), -1, dtype=np.int32)
+    partner_support = np.zeros((nnz, top_partners), dtype=np.int32)
+
+    position = 0
+    for row, row_entries in enumerate(entries):
+        # columns were visited in ascending order, hence every row is sorted chronologically
+        for column, weight, count, edges in row_entries:
+            columns[position] = column
+            weights[position] = weight
+            counts[position] = count
+            for i, (edge_support, partner) in enumerate(edges):
+                partners[position, i] = partner
+                partner_support[position, i] = edge_support
+            position += 1
+        indptr[row + 1] = position
+
+    os.makedirs(output_folder, exist_ok=True)
+    with open(os.path.join(output_folder, "terms.json"), "w") as f:
+        json.dump(terms, f, ensure_ascii=False)
+    with open(os.path.join(output_folder, "timestamps.json"), "w") as f:
+        json.dump({"version": TRAJECTORY_TABLE_VERSION, "timestamps": [str(t) for t in timestamps]}, f)
+    for name, array in (("indptr", indptr), ("columns", columns), ("weights", weights), ("counts", counts),
+                        ("partners", partners), ("support", partner_support)):
+        np.save(os.path.join(output_folder, name + ".npy"), array)
@@ -1,17 +1,53 @@
+import argparse
+import copy
 import json
+import math
 import os
+import typing
 
+import graphs.counts as counts
+import metrics.metrics as metrics
 import parser.argparser as argparser
 import parser.parser as parser
+from cooccurrences.cooccurrences import extract_cooccurrence_records_by_distance, select_cooccurrence_records
+from documents.Documents import DocumentCollection
 from documents.DocumentsCreator import DocumentsCreator
+from documents.Timestamps import Timestamp
 from graphs.GraphManager import GraphManager
+from graphs.trajectories import write_trajectory_entries, write_trajectory_table
+
+# number of highest weighted nodes kept per graph
+NODES_PER_GRAPH = 25
+
+
+def configure_metrics(args: argparse.Namespace) -> None:
+    metrics.configure(report_path=os.path.join(args.output, "run_report.json") if args.run_report else None,
+                      profile_path=os.path.join(args.output, "profile.pstats") if args.profile else None,
+                      trace_memory=args.trace_memory,
+                      progress_interval=args.progress_interval)
 
 
 def main():
     args = argparser.createParser()
+    configure_metrics(args)
+    try:
+        run(args)
+    finally:
+        # the run report is written if a stage fails as well
+        metrics.finish()
+
+
+def run(args: argparse.Namespace) -> None:
+    """
+    Tags and processes the input documents, and creates, stores and exports their graphs.
+    @param args: arguments created by argparser
+    """
+    # Raw counts of the graphs, new documents are merged into the counts of a previous run in append mode
+    counts_folder = os.path.join(args.output, "counts")
+    state = counts.load_state(counts_folder, args) if args.append else counts.new_state(args)
 
     # Process input documents and tag them with HeidelTime
-    documents = parser.readAndHeidelTimeJson(args.data, args)
+    documents = parser.readAndHeidelTimeJson(args.data, args, first_id=state["next_document_id"])
 
     # Create processed DocumentCollection
     # Processing includes parsing of HeidelTime tags as well as spacy pipeline (stop word removal, lemmatization,
@@ -19,19 +55,146 @@ def main():
     creator = DocumentsCreator(args)
     documents = creator.parse_documents(documents)
 
+    document_ids = [doc.idx for doc in documents.documents]
+    if document_ids and min(document_ids) < state["next_document_id"]:
+        raise ValueError("Appended documents reuse the ids of previous documents, the first free id is "
+                         + str(state["next_document_id"]))
+    state["next_document_id"] = max(document_ids + [state["next_document_id"] - 1]) + 1
+
     # build up time-centric co-occurrence graphs, here co-occurrences are extracted as well
-    graphs = GraphManager.from_DocumentCollection(documents, args)
+    if args.append:
+        graphs = GraphManager.from_counts([counts_folder])
+        changed_timestamps = graphs.merge_DocumentCollection(documents, args)
+        graphs.record_size("merged")
+        store_graphs(graphs, args, state, changed_timestamps)
+    elif args.sweep:
+        sweep(documents, args, state)
+    elif args.processes > 1:
+        # raw counts, weights and pruning are computed by the worker processes as well
+        graphs, trajectory_entries = GraphManager.from_DocumentCollection_in_parallel(documents, args, NODES_PER_GRAPH,
+                                                                                       counts_folder)
+        with metrics.stage("trajectory_table", "writing term trajectories"):
+            write_trajectory_entries(trajectory_entries, os.path.join(args.output, "trajectories"))
+        export_graphs(graphs, args, state)
+    elif args.spill_records:
+        # raw counts, weights and pruning are computed one graph at a time from the spilled co-occurrences
+        graphs, trajectory_entries = GraphManager.from_DocumentCollection_in_runs(documents, args, NODES_PER_GRAPH,
+                                                                                  counts_folder)
+        with metrics.stage("trajectory_table", "writing term trajectories"):
+            write_trajectory_entries(trajectory_entries, os.path.join(args.output, "trajectories"))
+        export_graphs(graphs, args, state)
+    else:
+        graphs = GraphManager.from_DocumentCollection(documents, args)
+        store_graphs(graphs, args, state)
+
+
+def sweep_folder(args: argparse.Namespace, window_size: int, start_year: float, end_year: float) -> str:
+    """
+    @return: Output folder of a configuration of a sweep, e.g., w2 or w2_1950-1999
+    """
+    name = "w{}".format(window_size)
+    if args.year_ranges:
+        name += "_{}-{}".format("" if math.isinf(start_year) else start_year, "" if math.isinf(end_year) else end_year)
+    return os.path.join(args.output, name)
+
+
+def sweep(documents: DocumentCollection, args: argparse.Namespace, state: typing.Dict[str, typing.Any]) -> None:
+    """
+    Creates the graphs of every window size of args.window_sizes and year range of args.year_ranges in one pass over
+    the documents. Co-occurrences are extracted once for the largest window size and all years, and each
+    configuration selects the co-occurrences of its window size and years, see
+    cooccurrences.extract_cooccurrence_records_by_distance and select_cooccurrence_records. Every configuration is
+    stored like a single run in its folder, see sweep_folder.
+    @param documents: The documents
+    @param args: arguments created by argparser
+    @param state: State of the counts, see graphs/counts.py
+    """
+    year_ranges = args.year_ranges or [(args.start_year, args.end_year)]
+    extraction_args = copy.copy(args)
+    extraction_args.start_year = min(start_year for start_year, _ in year_ranges)
+    extraction_args.end_year = max(end_year for _, end_year in year_ranges)
+    with metrics.stage("cooccurrences", "extracting time-centric co-occurrences of all window sizes"):
+        timestamps, pairs, words = extract_cooccurrence_records_by_distance(documents, extraction_args)
+        # sorted once, every configuration selects its records in order
+        pairs = sorted(pairs.items())
+        words = sorted(words.items())
+
+    for window_size in args.window_sizes:
+        for start_year, end_year in year_ranges:
+            config_args = copy.copy(args)
+            config_args.window_size = window_size
+            config_args.start_year = start_year
+            config_args.end_year = end_year
+            config_args.output = sweep_folder(args, window_size, start_year, end_year)
+            os.makedirs(config_args.output, exist_ok=True)
+            print("Configuration", os.path.basename(config_args.output), flush=True)
+
+            graphs = GraphManager.from_cooccurrence_records(
+                *select_cooccurrence_records(timestamps, pairs, words, window_size, start_year, end_year))
+            config_state = counts.new_state(config_args)
+            config_state["next_document_id"] = state["next_document_id"]
+            store_graphs(graphs, config_args, config_state)
+
+
+def store_graphs(graphs: GraphManager, args: argparse.Namespace, state: typing.Dict[str, typing.Any],
+                 changed_timestamps: typing.Set[Timestamp] = None) -> None:
+    """
+    Stores the raw counts of the graphs, and weights, prunes and exports them to the output folder.
+    @param graphs: The unweighted graphs
+    @param args: arguments created by argparser
+    @param state: State of the counts, see graphs/counts.py
+    @param changed_timestamps: Timestamps of the graphs new documents were merged into, all if None
+    """
+    counts_folder = os.path.join(args.output, "counts")
+    with metrics.stage("store_counts", "storing raw counts"):
+        counts.save_counts(graphs.graphs, counts_folder, changed_timestamps)
 
     # Graph processing
     graphs.weight_graph_nodes(weighting="tf_itf_per_granularity")
-    graphs.reduce_to_highest_weighted_nodes(25)
+    # Weights of all terms over time, before the graphs are pruned
+    with metrics.stage("trajectory_table", "writing term trajectories"):
+        write_trajectory_table(graphs, os.path.join(args.output, "trajectories"))
+    graphs.reduce_to_highest_weighted_nodes(NODES_PER_GRAPH)
+    export_graphs(graphs, args, state)
+
+
+def export_graphs(graphs: GraphManager, args: argparse.Namespace, state: typing.Dict[str, typing.Any]) -> None:
+    """
+    Exports the pruned graphs to the output folder, and stores the state of the counts.
+    @param graphs: The weighted and pruned graphs
+    @param args: arguments created by argparser
+    @param state: State of the counts, see graphs/counts.py
+    """
+    counts_folder = os.path.join(args.output, "counts")
+    with metrics.stage("export", "storing graphs"):
+        result_json = graphs.create_graphs_json()
+        provenance_json = graphs.create_provenance_json()
+
+        output_file = os.path.join(args.output, "timecentricgraphs.json")
+        with open(output_file, "w") as f:
+            json.dump(result_json, f, indent=2, ensure_ascii=False)
+            print("Grahps stored.", flush=True)
+
+        # The co-occurring sentences of every edge, served on request by the API
+        output_file = os.path.join(args.output, "timecentricprovenance.json")
+        with open(output_file, "w") as f:
+            json.dump(provenance_json, f, ensure_ascii=False)
+            print("Edge provenance stored.", flush=True)
 
-    result_json = graphs.create_graphs_json()
+        # Weights depend on all graphs of a granularity, hence graphs without new documents may change as well
+        changed = counts.changed_graphs(result_json, state)
+        metrics.record("changed_graphs", len(changed))
+        if args.append:
+            # Graphs and provenance to upsert into the database, see database.update_database
+            update_json = {timestamp: result_json[timestamp] for timestamp in changed}
+            with open(os.path.join(args.output, "timecentricgraphs_update.json"), "w") as f:
+                json.dump(update_json, f, ensure_ascii=False)
+            with open(os.path.join(args.output, "timecentricprovenance_update.json"), "w") as f:
+                json.dump({str(edge["id"]): provenance_json[str(edge["id"])]
+                           for graph in update_json.values() for edge in graph["edges"]}, f, ensure_ascii=False)
+            print(len(changed), "of", len(result_json), "graphs changed.", flush=True)
 
-    output_file = os.path.join(args.output, "timecentricgraphs.json")
-    with open(output_file, "w") as f:
-        json.dump(result_json, f, indent=2, ensure_ascii=False)
-        print("Grahps stored.", flush=True)
+    counts.save_state(counts_folder, state)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,147 @@
+"""
+Partitioned execution of main.py for collections that are too large for a single machine. The documents are sharded by
+their ID, and each shard is processed by an independent map invocation, e.g., on one of several machines sharing a file
+system. A map invocation writes the raw counts of the graphs of its documents (see graphs/counts.py) to its shard
+folder. The reduce invocation merges the counts of all shards into the final graphs, which are weighted, pruned and
+stored like by main.py. Invocations coordinate only through the files in the shared work folder.
+
+All invocations take the arguments of main.py, the command, and the number of shards, e.g.,
+    python3 mapreduce.py map -d input.json -o output/ -w 2 --shards 4 --shard 0     (shards 0 to 3, e.g., on 4 nodes)
+    python3 mapreduce.py reduce -d input.json -o output/ -w 2 --shards 4
+or, with processes standing in for the nodes,
+    python3 mapreduce.py local -d input.json -o output/ -w 2 --shards 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import typing
+
+import graphs.counts as counts
+import main
+import metrics.metrics as metrics
+import parser.argparser as argparser
+import parser.parser as parser
+from documents.Documents import DocumentCollection
+from documents.DocumentsCreator import DocumentsCreator
+from graphs.GraphManager import GraphManager
+
+
+def addArguments(arg_parser: argparse.ArgumentParser) -> None:
+    arg_parser.add_argument("command", choices=["map", "reduce", "local"],
+                            help="map: process one shard of the documents, reduce: merge the shards into the final "
+                                 "graphs, local: map all shards in parallel processes, and reduce them.")
+    arg_parser.add_argument("--shards", type=int, required=True,
+                            help="Number of shards the documents are partitioned into.", metavar="SHARDS")
+    arg_parser.add_argument("--shard", type=int, default=None,
+                            help="Shard processed by map, from 0 to SHARDS - 1.", metavar="INDEX")
+    arg_parser.add_argument("--work", type=str, default=None, dest="work_folder",
+                            help="Shared folder of the shards. Default: shards in the output folder.",
+                            metavar="FOLDER")
+
+
+def shardFolder(args: argparse.Namespace, shard: int) -> str:
+    return os.path.join(args.work_folder, "shard-{}-of-{}".format(shard, args.shards))
+
+
+def mapShard(args: argparse.Namespace) -> None:
+    """
+    Processes the documents of one shard, and stores the raw counts of their graphs in the shard folder. The state of
+    the counts is written last, and marks the shard as finished.
+    """
+    if args.shard is None or not 0 <= args.shard < args.shards:
+        raise ValueError("map requires --shard between 0 and {}.".format(args.shards - 1))
+    shard = (args.shard, args.shards)
+    # intermediate results of the shard, e.g., the HeidelTime output, are stored in the shard folder
+    args.output = shardFolder(args, args.shard)
+    os.makedirs(args.output, exist_ok=True)
+    main.configure_metrics(args)
+
+    documents = parser.readAndHeidelTimeJson(args.data, args, shard=shard)
+    creator = DocumentsCreator(args)
+    documents = creator.parse_documents(documents)
+    if args.dcolload:
+        documents = DocumentCollection([doc for doc in documents.documents if doc.idx % args.shards == args.shard])
+
+    graphs = GraphManager.from_DocumentCollection(documents, args)
+    counts_folder = os.path.join(args.output, "counts")
+    state = counts.new_state(args)
+    state["next_document_id"] = max([doc.idx for doc in documents.documents], default=0) + 1
+    with metrics.stage("store_counts", "storing raw counts"):
+        counts.save_counts(graphs.graphs, counts_folder)
+    counts.save_state(counts_folder, state)
+    print("Shard {} of {} finished.".format(args.shard, args.shards), flush=True)
+
+
+def reduceShards(args: argparse.Namespace) -> None:
+    """
+    Merges the counts of all shards into the final graphs, and stores them like main.py. Afterwards, documents can be
+    added with main.py --append.
+    """
+    folders = [shardFolder(args, shard) for shard in range(args.shards)]
+    missing = [shard for shard, folder in enumerate(folders)
+               if not os.path.isfile(os.path.join(folder, "counts", "state.json"))]
+    if missing:
+        raise FileNotFoundError("Shards {} are not finished.".format(missing))
+    states = [counts.load_state(os.path.join(folder, "counts"), args) for folder in folders]
+    os.makedirs(args.output, exist_ok=True)
+    main.configure_metrics(args)
+
+    # the documents of the API are merged as well
+    indexed_documents = {}
+    for folder in folders:
+        path = os.path.join(folder, "indexed_documents.json")
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                indexed_documents.update(json.load(f))
+    if indexed_documents:
+        indexed_documents = {doc_id: indexed_documents[doc_id] for doc_id in sorted(indexed_documents, key=int)}
+        with open(os.path.join(args.output, "indexed_documents.json"), "w") as f:
+            json.dump(indexed_documents, f, indent=2, ensure_ascii=False)
+
+    graphs = GraphManager.from_counts([os.path.join(folder, "counts") for folder in folders])
+    state = counts.new_state(args)
+    state["next_document_id"] = max(shard_state["next_document_id"] for shard_state in states)
+    main.store_graphs(graphs, args, state)
+
+
+def runLocal(args: argparse.Namespace, argv: typing.List[str]) -> None:
+    """
+    Maps all shards in parallel processes, and reduces them.
+    @param argv: Command line arguments of this invocation
+    """
+    map_argv = list(argv)
+    map_argv[map_argv.index("local")] = "map"
+    processes = [subprocess.Popen([sys.executable, os.path.abspath(__file__)] + map_argv + ["--shard", str(shard)])
+                 for shard in range(args.shards)]
+    failed = [shard for shard, process in enumerate(processes) if process.wait() != 0]
+    if failed:
+        raise RuntimeError("Map of shards {} failed.".format(failed))
+    reduceShards(args)
+
+
+def run():
+    args = argparser.createParser(addArguments)
+    if args.shards < 1:
+        raise ValueError("--shards has to be positive.")
+    if args.append or args.heavy_hitters or args.sweep or args.processes > 1:
+        # shards are processed in parallel instead, see runLocal
+        raise ValueError("mapreduce.py supports neither --append, --heavy-hitters, --processes, several window sizes "
+                         "nor --year-ranges.")
+    args.work_folder = os.path.abspath(args.work_folder or os.path.join(args.output, "shards"))
+
+    try:
+        if args.command == "map":
+            mapShard(args)
+        elif args.command == "reduce":
+            reduceShards(args)
+        else:
+            runLocal(args, sys.argv[1:])
+    finally:
+        # the run report is written if a stage fails as well
+        metrics.finish()
+
+
+if __name__ == '__main__':
+    run()
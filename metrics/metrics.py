@@ -0,0 +1,207 @@
+"""
+Instrumentation of the pipeline: stage timers, counters, peak RSS sampling, throttled progress reports, and optional
+profiling with cProfile and tracemalloc. Measurements are collected for the whole run and written as a JSON run report
+if enabled, see configure.
+"""
+from __future__ import annotations
+
+import collections
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+import typing
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class RunMetrics:
+    """
+    Measurements of a single run.
+    """
+    stages: typing.List[typing.Dict[str, typing.Any]]
+    counters: typing.Counter[str]
+    values: typing.Dict[str, typing.Any]
+
+    def __init__(self) -> None:
+        self.stages = []
+        self.counters = collections.Counter()
+        self.values = {}
+        self.report_path = None
+        self.profile_path = None
+        self.profiler = None
+        self.trace_memory = False
+        self.progress_interval = 5.0
+        self.max_rss = 0
+        self.started = datetime.datetime.now(datetime.timezone.utc)
+        self.start_time = timeit.default_timer()
+
+
+_run = RunMetrics()
+
+
+def configure(report_path: str = None, profile_path: str = None, trace_memory: bool = False,
+              progress_interval: float = 5.0) -> None:
+    """
+    Starts a new run.
+    @param report_path: File the JSON run report is written to by finish, no report if None
+    @param profile_path: File the cProfile statistics of the whole run are written to by finish, no profiling if None
+    @param trace_memory: Record the peak memory allocated by Python in each stage with tracemalloc (slow)
+    @param progress_interval: Minimal number of seconds between two progress reports of a loop
+    """
+    global _run
+    _run = RunMetrics()
+    _run.report_path = report_path
+    _run.profile_path = profile_path
+    _run.trace_memory = trace_memory
+    _run.progress_interval = progress_interval
+    if trace_memory:
+        tracemalloc.start()
+    if profile_path:
+        _run.profiler = cProfile.Profile()
+        _run.profiler.enable()
+
+
+def _max_rss(who: int) -> typing.Optional[int]:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def peak_rss() -> typing.Optional[int]:
+    """
+    @return: Peak resident set size of this process in bytes, None if unavailable
+    """
+    return _max_rss(resource.RUSAGE_SELF) if resource is not None else None
+
+
+def current_rss() -> typing.Optional[int]:
+    """
+    @return: Current resident set size of this process in bytes, None if unavailable
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def sample_rss() -> None:
+    rss = current_rss()
+    if rss is not None and rss > _run.max_rss:
+        _run.max_rss = rss
+
+
+def count(name: str, value: int = 1) -> None:
+    """
+    Increases a counter, e.g., of processed documents.
+    """
+    _run.counters[name] += value
+
+
+def record(name: str, value: typing.Any) -> None:
+    """
+    Stores a value in the run report, e.g., the number of nodes after pruning.
+    """
+    _run.values[name] = value
+
+
+@contextlib.contextmanager
+def stage(name: str, description: str = None) -> typing.Iterator[None]:
+    """
+    Times a stage of the pipeline and records its counters and memory usage. Prints the start and duration of the
+    stage. A stage that raises an exception is recorded as failed.
+    @param name: Name of the stage in the run report
+    @param description: Description printed as "Start <description>." and "Finished <description> in x seconds."
+    """
+    description = description or name
+    print("Start " + description + ".", flush=True)
+    counters = _run.counters.copy()
+    if _run.trace_memory:
+        tracemalloc.reset_peak()
+        traced_before = tracemalloc.get_traced_memory()[0]
+    start = timeit.default_timer()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        seconds = timeit.default_timer() - start
+        sample_rss()
+
+        result = {"name": name, "seconds": seconds, "peak_rss": peak_rss(), "rss": current_rss(),
+                  "counters": dict(_run.counters - counters), "failed": failed}
+        if _run.trace_memory:
+            result["peak_traced_memory"] = tracemalloc.get_traced_memory()[1] - traced_before
+        _run.stages.append(result)
+        print(("Failed " if failed else "Finished ") + description + " in", seconds, "seconds.", flush=True)
+
+
+class Progress:
+    """
+    Reports the progress of a loop at most once per progress interval (see configure), instead of once per item.
+    """
+
+    def __init__(self, label: str, total: int = None) -> None:
+        """
+        @param label: Printed in front of the progress, e.g., "Document"
+        @param total: Number of items, if known
+        """
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.last_report = timeit.default_timer()
+
+    def update(self, value: int = 1) -> None:
+        self.done += value
+        now = timeit.default_timer()
+        if now - self.last_report >= _run.progress_interval:
+            self.last_report = now
+            sample_rss()
+            if self.total:
+                print(self.label + ":", self.done, "/", self.total, flush=True)
+            else:
+                print(self.label + ":", self.done, flush=True)
+
+
+def report() -> typing.Dict[str, typing.Any]:
+    """
+    @return: The run report with all stages, counters and recorded values
+    """
+    sample_rss()
+    return {"started": _run.started.isoformat(),
+            "seconds": timeit.default_timer() - _run.start_time,
+            "argv": sys.argv,
+            "peak_rss": peak_rss(),
+            "peak_rss_children": _max_rss(resource.RUSAGE_CHILDREN) if resource is not None else None,
+            "max_sampled_rss": _run.max_rss or None,
+            "stages": _run.stages,
+            "counters": dict(_run.counters),
+            "values": _run.values}
+
+
+def finish() -> None:
+    """
+    Stops profiling, and writes the run report and profile statistics if enabled.
+    """
+    if _run.profiler is not None:
+        _run.profiler.disable()
+        _run.profiler.dump_stats(_run.profile_path)
+        _run.profiler = None
+        print("Profile stored in", _run.profile_path, flush=True)
+    if _run.trace_memory:
+        tracemalloc.stop()
+        _run.trace_memory = False
+    if _run.report_path:
+        with open(_run.report_path, "w") as f:
+            json.dump(report(), f, indent=2)
+        print("Run report stored in", _run.report_path, flush=True)
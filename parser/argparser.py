@@ -1,10 +1,37 @@
 import argparse
 import os
+import typing
 
 
-def createParser() -> argparse.Namespace:
+def _window_sizes(value: str) -> typing.List[int]:
+    try:
+        sizes = [int(size) for size in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid window sizes: " + value)
+    if any(size < 0 for size in sizes):
+        raise argparse.ArgumentTypeError("window sizes have to be non-negative: " + value)
+    return sorted(set(sizes))
+
+
+def _year_ranges(value: str) -> typing.List[typing.Tuple[float, float]]:
+    # open bounds are infinite, as the defaults of -start and -end
+    ranges = []
+    for year_range in value.split(","):
+        start, separator, end = year_range.partition(":")
+        try:
+            bounds = (int(start) if start else -float("Inf"), int(end) if end else float("Inf"))
+        except ValueError:
+            bounds = None
+        if not separator or bounds is None or bounds[0] > bounds[1]:
+            raise argparse.ArgumentTypeError("invalid year range: " + year_range)
+        ranges.append(bounds)
+    return ranges
+
+
+def createParser(extend: typing.Callable[[argparse.ArgumentParser], None] = None) -> argparse.Namespace:
     """
     Creates a parser for command line arguments.
+    @param extend: Adds further arguments to the parser, e.g., of mapreduce.py
     @return: The argparser
     """
     parser = argparse.ArgumentParser(prog="TimeCentricCooccurrenceGraphCreator",
@@ -39,9 +66,11 @@ def createParser() -> argparse.Namespace:
                         help="Load a pickle file containing a already processed Document Collection (specified with"
                              "-d).")
 
-    parser.add_argument("-w", "--window_size", type=int, default=2, required=True,
+    parser.add_argument("-w", "--window_size", type=_window_sizes, default=[2], required=True,
                         help="Window size for co-occurrence extraction in each direction, s.t. total window size "
-                             "equals 2*w+1.", metavar="SIZE")
+                             "equals 2*w+1. Several comma-separated sizes, e.g., 1,2,3, create one set of graphs per "
+                             "size in a single pass over the documents, stored in subfolders of the output folder.",
+                        metavar="SIZE")
 
     parser.add_argument("-start", "--start-year", type=int, default=-float("Inf"), dest="start_year",
                         help="Minimal year for which a time-centric co-occurrence network is constructed.",
@@ -51,16 +80,112 @@ def createParser() -> argparse.Namespace:
                         help="Maximal year for which a time-centric co-occurrence network is constructed.",
                         metavar="YEAR")
 
+    parser.add_argument("--year-ranges", type=_year_ranges, default=None, dest="year_ranges",
+                        help="Comma-separated year ranges START:END, e.g., 1900:1949,1950:, each creating one set of "
+                             "graphs per window size in the same pass, stored in subfolders of the output folder. "
+                             "Replaces -start and -end.",
+                        metavar="RANGES")
+
+    parser.add_argument("--spill-records", type=int, default=None, dest="spill_records",
+                        help="Bounded-memory co-occurrence extraction: at most this many co-occurrence records are "
+                             "held in memory, further records are sorted and spilled to disk in the intermediate data "
+                             "folder. The graphs are created, weighted and pruned one at a time from the merged "
+                             "records. Default: all co-occurrences are held in memory.",
+                        metavar="RECORDS")
+
+    parser.add_argument("--heavy-hitters", type=float, default=None, dest="heavy_hitters",
+                        help="Approximate co-occurrence extraction: the terms of every timestamp are summarized with "
+                             "the given error bound as fraction of all term occurrences of the timestamp, and "
+                             "co-occurrences are only counted among the candidates with the highest weights. Default: "
+                             "exact extraction.",
+                        metavar="EPSILON")
+
+    parser.add_argument("--candidates", type=int, default=50, dest="candidates",
+                        help="Number of terms per graph whose co-occurrences are counted in approximate extraction, "
+                             "should exceed the 25 nodes kept per graph. Default: 50",
+                        metavar="TERMS")
+
+    parser.add_argument("--exact-recount", action="store_true", dest="exact_recount", default=False,
+                        help="Recount the terms found by approximate extraction exactly, instead of using their "
+                             "estimated counts.")
+
+    parser.add_argument("--no-spacy-cache", action="store_true", dest="no_spacy_cache", default=False,
+                        help="Analyse all texts with spaCy. By default, the analyses are cached in the intermediate "
+                             "data folder, and reruns only analyse new or changed texts.")
+
+    parser.add_argument("--analyse-all-sentences", action="store_true", dest="analyse_all_sentences", default=False,
+                        help="Analyse every document as a whole with spaCy. By default, only the sentences within "
+                             "the window around a date in the year range are analysed, s.t. the stored Document "
+                             "Collection cannot be reused with larger windows or other years.")
+
+    parser.add_argument("--processes", type=int, default=1, dest="processes",
+                        help="Number of worker processes the graphs are created, weighted and pruned in, partitioned "
+                             "by year. Default: 1, i.e., in the main process.",
+                        metavar="PROCESSES")
+
+    parser.add_argument("--char-replacements", type=str, default=None, dest="char_replacements",
+                        help="JSON file with data set specific character replacements applied before tagging, either "
+                             "as an object {\"old\": \"new\"} or a list of [old, new] pairs. Default: removes "
+                             "characters conflicting with TIMEX3 tags.",
+                        metavar="FILE")
+
     parser.add_argument("--disable-tqdm", type=bool, default=False, dest="disable_tqdm",
                         help="Disable progress bars created by tqdm for multiprocessing.",
                         metavar="BOOL")
 
+    parser.add_argument("--append", action="store_true", dest="append", default=False,
+                        help="Merge the documents into the graphs of a previous run with the same output folder and "
+                             "co-occurrence parameters, instead of creating new graphs. Only changed graphs are "
+                             "exported to the update files.")
+
+    parser.add_argument("--run-report", action="store_true", dest="run_report", default=False,
+                        help="Write timings, counters and memory usage of every stage to run_report.json in the output "
+                             "folder.")
+
+    parser.add_argument("--profile", action="store_true", dest="profile", default=False,
+                        help="Profile the run with cProfile and store the statistics as profile.pstats in the output "
+                             "folder.")
+
+    parser.add_argument("--trace-memory", action="store_true", dest="trace_memory", default=False,
+                        help="Record the peak memory allocated in each stage with tracemalloc in the run report. Slows "
+                             "down the run.")
+
+    parser.add_argument("--progress-interval", type=float, default=5.0, dest="progress_interval",
+                        help="Minimal number of seconds between two progress reports of a stage. Default: 5",
+                        metavar="SECONDS")
+
+    if extend is not None:
+        extend(parser)
+
     args = parser.parse_args()
 
+    if args.heavy_hitters is not None:
+        if not 0 < args.heavy_hitters < 1:
+            parser.error("--heavy-hitters has to be between 0 and 1.")
+        if args.append or args.spill_records:
+            parser.error("--heavy-hitters cannot be combined with --append or --spill-records.")
+    # several window sizes or year ranges are created in a sweep, see main.sweep
+    args.window_sizes = args.window_size
+    args.window_size = max(args.window_sizes)
+    args.sweep = len(args.window_sizes) > 1 or args.year_ranges is not None
+    if args.year_ranges:
+        # documents and sentences are filtered by the union of the year ranges
+        args.start_year = min(start_year for start_year, _ in args.year_ranges)
+        args.end_year = max(end_year for _, end_year in args.year_ranges)
+    if args.sweep and (args.append or args.spill_records or args.heavy_hitters or args.processes > 1):
+        parser.error("Several window sizes or --year-ranges cannot be combined with --append, --spill-records, "
+                     "--heavy-hitters or --processes.")
+    if args.processes < 1:
+        parser.error("--processes has to be positive.")
+    if args.processes > 1 and (args.append or args.spill_records or args.heavy_hitters):
+        parser.error("--processes cannot be combined with --append, --spill-records or --heavy-hitters.")
+
     # some precautions for path management
     args.data = os.path.abspath(args.data)
     args.output = os.path.abspath(args.output)
     args.temp_folder = os.path.abspath(args.temp_folder)
+    if args.char_replacements:
+        args.char_replacements = os.path.abspath(args.char_replacements)
 
     # check if input file exists
     if not os.path.isfile(args.data):
@@ -1,13 +1,20 @@
 import typing
 import multiprocessing
-import timeit
 import re
 import json
 
 import tqdm
 import python_heideltime
 
-from documents.Timestamps import Timestamp
+import metrics.metrics as metrics
+
+# HeidelTime wraps every result in a TimeML header and footer
+_heidelTimeHeader = '<?xml version="1.0"?>\n<!DOCTYPE TimeML SYSTEM "TimeML.dtd">\n<TimeML>\n'
+_heidelTimeFooter = '\n</TimeML>\n\n'
+
+# Finds a TIMEX3 tag whose value starts with a four digit year, i.e., a tag for which Timestamp.from_HeidelTimeTag
+# creates a timestamp with a year. Values containing one of Timestamp.invalid_tags ("REF", "BC") are not accepted.
+_usableTimexValue = re.compile(r"<[^/>\n][^>\n]*?value=[\"'](\d{4})(?=[-\"'])(?:(?!REF|BC)[^\"'])*[\"']")
 
 
 def createHeidelTimeSettings(language: str, doctype: str) -> typing.Dict[str, str]:
@@ -23,35 +30,32 @@ def createHeidelTimeSettings(language: str, doctype: str) -> typing.Dict[str, st
     return result
 
 
-def heidelTimeParseJson(data: typing.List[dict], settings: typing.Dict[str, str], disable_tqdm: bool = False) \
-        -> typing.List[dict]:
+def heidelTimeParseJson(data: typing.List[dict], settings: typing.Dict[str, str], disable_tqdm: bool = False,
+                        start_year: float = -float("Inf"), end_year: float = float("Inf")) -> typing.List[dict]:
     """
     Parses a list of documents with HeidelTime.
     @param data: json file (dict), needs field "text"
     @param settings: HeidelTime settings, created by createHeidelTimeSettings
     @param disable_tqdm: disable tqdm bar
+    @param start_year: Documents without a timestamp from start_year to end_year are dropped
+    @param end_year: see start_year
     @return: processed data, i.e., field "text" has now text including TIMEX3 tags
     """
-    # create (doc, settings) tuple for multiprocessing (hence, we only need to pass one argument)
-    temp_data = [(doc, settings) for doc in data]
-    print("Start processing documents with HeidelTime.")
-    start = timeit.default_timer()
-
-    # Process each document with HeidelTime
-    with multiprocessing.Pool() as p:
-        data = list(tqdm.tqdm(p.imap(_parseDocWithHeidelTime, temp_data), disable=disable_tqdm, total=len(data)))
-
-    # HeidelTime creates a header and footer that we do not need for further processing
-    for i in range(len(data)):
-        data[i] = _removeHeaderAndFooterFromHeidelTimedDoc(data[i])
-
-    print("Documents in total:", len(data), flush=True)
-    # Remove documents that have no timestamp at all
-    data = _removeDocumentsWithoutTimestamps(data)
-    print("Documents with timestamp:", len(data), flush=True)
-
-    end = timeit.default_timer()
-    print("Finished processing documents in", end - start, "seconds.")
+    # create (doc, settings, year range) tuple for multiprocessing (hence, we only need to pass one argument)
+    temp_data = [(doc, settings, (start_year, end_year)) for doc in data]
+    with metrics.stage("heideltime", "processing documents with HeidelTime"):
+        # Process each document with HeidelTime, documents without a timestamp in the year range are already dropped
+        # in the worker processes
+        num_documents = len(data)
+        with multiprocessing.Pool() as p:
+            data = [doc for doc in tqdm.tqdm(p.imap(_tagAndFilterDocument, temp_data), disable=disable_tqdm,
+                                             total=num_documents)
+                    if doc is not None]
+
+        print("Documents in total:", num_documents, flush=True)
+        print("Documents with timestamp:", len(data), flush=True)
+        metrics.count("input_documents", num_documents)
+        metrics.count("documents_with_timestamp", len(data))
     return data
 
 
@@ -86,34 +90,50 @@ def _parseDocWithHeidelTime(data) -> dict:
     return document
 
 
+# function for multiprocessing
+def _tagAndFilterDocument(data) -> typing.Optional[dict]:
+    """
+    Parses a single document with HeidelTime, removes the header and footer, and drops the document if it does not
+    contain a usable timestamp. Suitable for multiprocessing.
+    @param data: Tuple with (document, settings, (start year, end year))
+    @return: Processed document, or None if it has no timestamp with a year in the year range
+    """
+    document = _removeHeaderAndFooterFromHeidelTimedDoc(_parseDocWithHeidelTime(data))
+    if not hasUsableTimestamp(document["text"], *data[2]):
+        return None
+    return document
+
+
+def hasUsableTimestamp(text: str, start_year: float = -float("Inf"), end_year: float = float("Inf")) -> bool:
+    """
+    Checks with a single scan of the text if it contains a TIMEX3 tag with a year, without creating any Timestamp.
+    @param text: Text tagged by HeidelTime
+    @param start_year: Minimal year of the timestamp
+    @param end_year: Maximal year of the timestamp
+    @return: True if at least one timestamp has a year from start_year to end_year
+    """
+    for match in _usableTimexValue.finditer(text):
+        # year 0 is no year, see Timestamp
+        year = int(match.group(1))
+        if year and start_year <= year <= end_year:
+            return True
+    return False
+
+
 def _removeHeaderAndFooterFromHeidelTimedDoc(doc: dict) -> dict:
     """
     HeidelTime creates a header and footer. This function removes them.
     @param doc: The document header and footer are removed from
     @return: The document without header and footer
     """
-    doc["text"] = doc["text"].replace('<?xml version="1.0"?>\n<!DOCTYPE TimeML SYSTEM "TimeML.dtd">\n<TimeML>\n', '')
-    doc["text"] = doc["text"].replace('\n</TimeML>\n\n', '')
+    text = doc["text"]
+    # Header and footer are expected at the very start and end, which only requires a single copy of the text
+    start = len(_heidelTimeHeader) if text.startswith(_heidelTimeHeader) else 0
+    end = len(text) - len(_heidelTimeFooter) if text.endswith(_heidelTimeFooter) else len(text)
+    text = text[start:end]
+    if not start:
+        text = text.replace(_heidelTimeHeader, "")
+    if end == len(doc["text"]):
+        text = text.replace(_heidelTimeFooter, "")
+    doc["text"] = text
     return doc
-
-
-def _removeDocumentsWithoutTimestamps(docs: list) -> list:
-    """
-    Check for each document if a timestamp is present, only keep documents with timestamps that have a year included
-    @param docs: A list of documents processed by HeidelTime
-    @return: A list of documents for which each has at least one timestamp
-    """
-    # We check for each document if we can find a TIMEX3 tag (we only check for <...>, since all < and > were removed
-    # from the text beforehand. We only check for the end tag as well to do some kind of sanity check.
-    tag_start = re.compile(r"<[^/].*?>")
-    result = []
-    count, max_count = 1, len(docs)
-    for doc in docs:
-        print("Removal of documents without valid timestamp:", count, "/", max_count, end="\n", flush=True)
-        count += 1
-        tags = re.findall(tag_start, doc["text"])
-        for tag in tags:
-            if Timestamp.from_HeidelTimeTag(tag).year:
-                result.append(doc)
-                break
-    return result
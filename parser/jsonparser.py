@@ -7,11 +7,21 @@ import typing
 import os
 
 
-def parseJson(filepath: str, output_folder: str) -> typing.List[dict]:
+# Characters that cannot be processed in later steps, e.g., "<" and ">", since they conflict with the design of TIMEX3
+# tags. Data sets with different needs can provide their own replacements (see loadCharReplacements).
+DEFAULT_CHAR_REPLACEMENTS = [("&", " "), ("<", " "), (">", " "), (r"\u0007", ""), (r"\b", ""), ("–", "-")]
+
+
+def parseJson(filepath: str, output_folder: str, char_replacements: typing.List[typing.Tuple[str, str]] = None,
+              first_id: int = 1, shard: typing.Tuple[int, int] = None) -> typing.List[dict]:
     """
     Read and preprocess document input json, e.g., removal of certain characters.
     @param filepath: path to json file
     @param output_folder: The folder in which the result is stored
+    @param char_replacements: (old, new) pairs applied to every text, defaults to DEFAULT_CHAR_REPLACEMENTS
+    @param first_id: ID of the first document. If larger than 1, the documents are appended to the indexed documents of
+    a previous run.
+    @param shard: (index, number of shards), only the documents of this shard are kept, see selectShard
     @return: Read and processed json file.
     """
     with open(filepath, "r") as f:
@@ -23,18 +33,37 @@ def parseJson(filepath: str, output_folder: str) -> typing.List[dict]:
             raise KeyError("Key \"text\" not in input json file.")
 
     # add a unique index to each document
-    data, output_data = _jsonAddIndex(data)
+    data, output_data = _jsonAddIndex(data, first_id)
+    if shard is not None:
+        data = selectShard(data, shard)
+        output_data = {d["id"]: d for d in data}
 
     # save the indexed files in a separate json for later visualization in the web api
     output_file = os.path.join(output_folder, "indexed_documents.json")
+    if first_id > 1 and os.path.isfile(output_file):
+        with open(output_file, "r") as f:
+            previous_data = json.load(f)
+        previous_data.update(output_data)
+        output_data = previous_data
     with open(output_file, "w") as f:
         json.dump(output_data, f, indent=2, ensure_ascii=False)
 
-    data = _preprocessJson(data)
+    data = _preprocessJson(data, createCharReplacer(char_replacements))
 
     return data
 
 
+def selectShard(data: typing.List[dict], shard: typing.Tuple[int, int]) -> typing.List[dict]:
+    """
+    Partitions the documents by their ID, see mapreduce.py.
+    @param data: Documents with field "id"
+    @param shard: (index, number of shards)
+    @return: The documents of the shard
+    """
+    index, count = shard
+    return [d for d in data if d["id"] % count == index]
+
+
 def storeJson(data: typing.List[dict], filepath: str) -> None:
     """
     Write a json file
@@ -57,27 +86,71 @@ def loadJson(filepath: str) -> typing.List[dict]:
     return data
 
 
-def _preprocessJson(data: typing.List[dict]) -> typing.List[dict]:
+def loadCharReplacements(filepath: str) -> typing.List[typing.Tuple[str, str]]:
+    """
+    Load data set specific character replacements from a json file. The file either contains an object mapping the
+    strings to be replaced to their replacement, or a list of [old, new] pairs.
+    @param filepath: path to json file
+    @return: list of (old, new) pairs
+    """
+    with open(filepath, "r") as f:
+        data = json.load(f)
+
+    if isinstance(data, dict):
+        data = list(data.items())
+    return [(old, new) for old, new in data]
+
+
+def createCharReplacer(char_replacements: typing.List[typing.Tuple[str, str]] = None) -> typing.Callable[[str], str]:
+    """
+    Compiles a list of replacements once per data set into a function that cleans a single text. The replacements are
+    applied with str.replace, which scans the text in C and does not copy it if a pattern does not occur; a translation
+    table or a combined regular expression took 1.5 to 15 times as long in CPython on the synthetic corpora of
+    benchmarks/preprocessing.py.
+    Patterns that cannot occur in a text are skipped, e.g., non-ASCII patterns in ASCII texts.
+    @param char_replacements: (old, new) pairs, defaults to DEFAULT_CHAR_REPLACEMENTS
+    @return: Function that applies all replacements to a text
+    """
+    if char_replacements is None:
+        char_replacements = DEFAULT_CHAR_REPLACEMENTS
+    replacements = tuple((old, new) for old, new in char_replacements if old and old != new)
+    ascii_replacements = tuple((old, new) for old, new in replacements if old.isascii())
+
+    # If a replacement introduces non-ASCII characters, later non-ASCII patterns might match again
+    if not all(new.isascii() for _, new in replacements):
+        ascii_replacements = replacements
+
+    def replace(text: str) -> str:
+        for old, new in (ascii_replacements if text.isascii() else replacements):
+            text = text.replace(old, new)
+        return text
+
+    return replace
+
+
+def _preprocessJson(data: typing.List[dict], replacer: typing.Callable[[str], str] = None) -> typing.List[dict]:
     """
     Necessary preprocessing steps. At the moment, this removes certain characters that cannot be processed in later
     steps, e.g., "<" and ">", since they conflict with the design of TIMEX3 tags.
-    @param data:
-    @return:
+    @param data: documents with field "text"
+    @param replacer: Function created by createCharReplacer, defaults to the default replacements
+    @return: The documents with cleaned texts
     """
-    char_replace = [("&", " "), ("<", " "), (">", " "), (r"\u0007", ""), (r"\b", ""), ("–", "-")]
+    if replacer is None:
+        replacer = createCharReplacer()
     for d in data:
-        for y0, y1 in char_replace:
-            d["text"] = d["text"].replace(y0, y1)
+        d["text"] = replacer(d["text"])
     return data
 
 
-def _jsonAddIndex(data: typing.List[dict]) -> (typing.List[dict], typing.Dict[int, dict]):
+def _jsonAddIndex(data: typing.List[dict], first_id: int = 1) -> (typing.List[dict], typing.Dict[int, dict]):
     """
     Adds an index to each document in the json list.
     @param data: Input document json
+    @param first_id: ID of the first document
     @return: Input data with additional field "id" which stores a unique ID for each document
     """
-    curr_index = 1
+    curr_index = first_id
     output_data = {}
     for d in data:
         output_data[curr_index] = d
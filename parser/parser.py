@@ -6,11 +6,14 @@ import parser.jsonparser as jsonparser
 import parser.heideltimeparser as heideltimeparser
 
 
-def readAndHeidelTimeJson(path: str, args: argparse.Namespace) -> typing.List[dict]:
+def readAndHeidelTimeJson(path: str, args: argparse.Namespace, first_id: int = 1,
+                          shard: typing.Tuple[int, int] = None) -> typing.List[dict]:
     """
     Reads input document json, preprocessed documents, and tags them with HeidelTime.
     @param path: path to input file
     @param args: arguments created by argparser that can be passed via command line arguments
+    @param first_id: ID of the first document, see jsonparser.parseJson
+    @param shard: (index, number of shards), only the documents of this shard are processed, see mapreduce.py
     @return: json with processed documents
     """
     if args.hskip:
@@ -18,12 +21,16 @@ def readAndHeidelTimeJson(path: str, args: argparse.Namespace) -> typing.List[di
         return [{}]
     if args.hload:
         print("Loaded documents already preprocessed with HeidelTime.")
-        return jsonparser.loadJson(path)
+        data = jsonparser.loadJson(path)
+        data = [doc for doc in data if heideltimeparser.hasUsableTimestamp(doc["text"], args.start_year, args.end_year)]
+        return jsonparser.selectShard(data, shard) if shard is not None else data
 
     # standard case: data has to be loaded, preprocessed and processed by HeidelTime
-    data = jsonparser.parseJson(path, args.output)
+    char_replacements = jsonparser.loadCharReplacements(args.char_replacements) if args.char_replacements else None
+    data = jsonparser.parseJson(path, args.output, char_replacements, first_id, shard)
     settings = heideltimeparser.createHeidelTimeSettings(args.hlang, args.htype)
-    data = heideltimeparser.heidelTimeParseJson(data, settings, disable_tqdm=args.disable_tqdm)
+    data = heideltimeparser.heidelTimeParseJson(data, settings, disable_tqdm=args.disable_tqdm,
+                                                start_year=args.start_year, end_year=args.end_year)
     heideltimeparser.storeProcessedDocuments(data, os.path.join(args.output, "heideltimed_documents.json"))
 
     return data
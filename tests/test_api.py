@@ -0,0 +1,263 @@
+"""
+Tests of the API handlers, served from a FileGraphStore, an InMemoryGraphStore and a MongoGraphStore on a mongomock
+database. Run from the repository root with "python -m pytest tests".
+"""
+
+import contextlib
+import importlib
+import json
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+API_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+# API modules named like modules of the pipeline, which are tested in the same process
+SHADOWED_MODULES = ("config", "documents")
+_api_modules = {}
+
+
+@contextlib.contextmanager
+def api_imports():
+    """
+    The API imports its modules from its own folder. Within this context, the folder is searched first, and the shadowed
+    modules of the pipeline are replaced by the modules of the API.
+    """
+    def shadowed() -> list:
+        return [name for name in sys.modules if name.split(".")[0] in SHADOWED_MODULES]
+
+    pipeline_modules = {name: sys.modules.pop(name) for name in shadowed()}
+    sys.modules.update(_api_modules)
+    sys.path.insert(0, API_FOLDER)
+    try:
+        yield
+    finally:
+        sys.path.remove(API_FOLDER)
+        _api_modules.update((name, sys.modules.pop(name)) for name in shadowed())
+        sys.modules.update(pipeline_modules)
+
+
+with api_imports():
+    import config
+    import index
+    import store
+
+GRAPHS = {
+    "1990": {"nodes": [{"id": 1, "label": "berlin", "value": 3.0},
+                       {"id": 2, "label": "wall", "value": 2.0},
+                       {"id": 3, "label": "border", "value": 1.0}],
+             "edges": [{"id": 10, "from": 1, "to": 2, "value": 2},
+                       {"id": 11, "from": 2, "to": 3, "value": 1}]},
+    "1990-11": {"nodes": [{"id": 4, "label": "berlin", "value": 1.0}],
+                "edges": []},
+}
+
+PROVENANCE = {
+    "10": [{"doc_id": 1, "sentence1": [0, 10], "sentence2": [11, 20]},
+           {"doc_id": 1, "sentence1": [21, 30], "sentence2": [31, 40]},
+           {"doc_id": 2, "sentence1": [0, 12], "sentence2": [0, 12]}],
+    "11": [{"doc_id": 2, "sentence1": [13, 20], "sentence2": [21, 30]}],
+}
+
+DOCUMENTS = {
+    "1": {"text": "The wall fell in Berlin.", "article_title": "Wall", "title": "Wall", "url": "http://example.org/1"},
+    "2": {"text": "The border opened.", "article_title": "Border", "title": "Border", "url": "http://example.org/2"},
+}
+
+
+def _write_json(path, content) -> str:
+    with open(str(path), "w") as f:
+        json.dump(content, f)
+    return str(path)
+
+
+def _fill_mongo_database(uri: str, database_name: str) -> None:
+    # the documents written by database/database.py create_database
+    import pymongo
+    database = pymongo.MongoClient(uri)[database_name]
+    database.graphs.insert_many([{"_id": timestamp, "nodes": graph["nodes"], "edges": graph["edges"]}
+                                 for timestamp, graph in json.loads(json.dumps(GRAPHS)).items()])
+    database.provenance.insert_many([{"_id": int(edge_id), "count": len(sentences), "sentences": sentences}
+                                     for edge_id, sentences in PROVENANCE.items()])
+    database.meta.insert_one({"_id": "graphs", "fingerprint": "test"})
+
+
+@pytest.fixture(scope="module", params=["file", "memory", "mongo"])
+def client(request, tmp_path_factory):
+    folder = tmp_path_factory.mktemp("api")
+    settings = {"GRAPH_STORE": "file",
+                "GRAPHS_FILE_PATH": _write_json(folder / "timecentricgraphs.json", GRAPHS),
+                "PROVENANCE_FILE_PATH": _write_json(folder / "timecentricprovenance.json", PROVENANCE),
+                "INDEXED_DOCUMENTS_PATH": _write_json(folder / "indexed_documents.json", DOCUMENTS),
+                "DOCUMENT_STORE_PATH": str(folder / "indexed_documents.sqlite"),
+                "API_INDEX_PATH": "",
+                "TRAJECTORY_TABLE_PATH": "",
+                "MONGO_URI": config.MONGO_URI,
+                "DATABASE_NAME": config.DATABASE_NAME}
+    previous = {name: getattr(config, name) for name in settings}
+    for name, value in settings.items():
+        setattr(config, name, value)
+    create_store = store.create_store
+    mongo_patch = None
+    if request.param == "memory":
+        store.create_store = lambda backend, **backend_settings: store.InMemoryGraphStore(
+            json.loads(json.dumps(GRAPHS)), json.loads(json.dumps(PROVENANCE)))
+    elif request.param == "mongo":
+        mongomock = pytest.importorskip("mongomock")
+        config.GRAPH_STORE = "mongo"
+        config.MONGO_URI = "mongodb://localhost:27017/"
+        config.DATABASE_NAME = "TICCO_TEST_DB"
+        mongo_patch = mongomock.patch(servers=(("localhost", 27017),))
+        mongo_patch.start()
+        _fill_mongo_database(config.MONGO_URI, config.DATABASE_NAME)
+    # static files are served relative to the API folder
+    working_directory = os.getcwd()
+    os.chdir(API_FOLDER)
+    try:
+        sys.modules.pop("API", None)
+        with api_imports():
+            api = importlib.import_module("API")
+        with TestClient(api.app) as test_client:
+            yield test_client
+    finally:
+        if mongo_patch is not None:
+            mongo_patch.stop()
+        store.create_store = create_store
+        os.chdir(working_directory)
+        for name, value in previous.items():
+            setattr(config, name, value)
+
+
+def test_get_graph(client):
+    response = client.get("/graphs/1990", params={"limit": 2})
+    assert response.status_code == 200
+    graph = response.json()
+    assert [node["label"] for node in graph["nodes"]] == ["berlin", "wall"]
+    assert [edge["id"] for edge in graph["edges"]] == [10]
+    assert "sent_functionality" not in graph["edges"][0]
+
+
+def test_get_graph_columnar(client):
+    graph = client.get("/graphs/1990", params={"limit": 3, "format": "columnar"}).json()
+    assert graph["format"] == "columnar"
+    assert graph["nodes"]["label"] == ["berlin", "wall", "border"]
+    assert graph["edges"]["id"] == [10, 11]
+
+
+def test_get_graph_conditional_request(client):
+    response = client.get("/graphs/1990")
+    assert response.headers.get("etag")
+    repeated = client.get("/graphs/1990", headers={"If-None-Match": response.headers["etag"]})
+    assert repeated.status_code == 304
+
+
+def test_get_missing_graph_is_empty(client):
+    response = client.get("/graphs/1800")
+    assert response.status_code == 200
+    assert response.json() == {"nodes": [], "edges": []}
+
+
+def test_get_graph_unknown_format(client):
+    assert client.get("/graphs/1990", params={"format": "xml"}).status_code == 400
+
+
+def test_provenance_paging(client):
+    first = client.get("/edges/10/provenance", params={"offset": 0, "limit": 2}).json()
+    assert first["count"] == 3
+    assert first["sentences"] == PROVENANCE["10"][:2]
+    second = client.get("/edges/10/provenance", params={"offset": 2, "limit": 2}).json()
+    assert second["count"] == 3
+    assert second["sentences"] == PROVENANCE["10"][2:]
+    beyond = client.get("/edges/10/provenance", params={"offset": 5}).json()
+    assert beyond["sentences"] == []
+
+
+def test_provenance_missing_edge(client):
+    response = client.get("/edges/99/provenance")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Edge not found"
+
+
+def test_provenance_invalid_page(client):
+    assert client.get("/edges/10/provenance", params={"offset": -1}).status_code == 422
+    assert client.get("/edges/10/provenance", params={"limit": 0}).status_code == 422
+
+
+def test_neighbourhood(client):
+    neighbourhood = client.get("/graphs/1990/neighbourhood/wall").json()
+    assert sorted(node["label"] for node in neighbourhood["nodes"]) == ["berlin", "border", "wall"]
+
+
+def test_neighbourhood_not_found(client):
+    assert client.get("/graphs/1990/neighbourhood/unknown").status_code == 404
+    assert client.get("/graphs/1800/neighbourhood/wall").status_code == 404
+
+
+def test_documents(client):
+    assert client.get("/text_title/1").json() == "Wall - Summary"
+    assert client.get("/text_link/2").json() == "http://example.org/2"
+    assert client.get("/text/99").status_code == 404
+    assert client.get("/text_link/99").status_code == 404
+    assert client.get("/text_title/99").status_code == 404
+
+
+def test_query_graph_nodes(client):
+    response = client.get("/query/query_graph_nodes/", params={"query_terms": ["Berlin", "wall"]})
+    assert response.json() == ["1990"]
+    response = client.get("/query/query_graph_nodes/", params={"query_terms": ["border", "reunification"],
+                                                                 "mode": "or"})
+    assert response.json() == ["1990"]
+
+
+def test_query_graph_nodes_unknown_mode(client):
+    response = client.get("/query/query_graph_nodes/", params={"query_terms": ["berlin", "wall"], "mode": "OR"})
+    assert response.status_code == 400
+
+
+def test_suggest(client):
+    assert client.get("/query/suggest/er").json() == ["berlin", "border"]
+    assert client.get("/query/suggest/b", params={"mode": "prefix", "limit": 1}).json() == ["berlin"]
+
+
+def test_suggest_invalid_parameters(client):
+    assert client.get("/query/suggest/b", params={"mode": "infix"}).status_code == 422
+    assert client.get("/query/suggest/b", params={"limit": -1}).status_code == 422
+
+
+def test_trajectory_not_configured(client):
+    assert client.get("/query/trajectory/berlin").status_code == 404
+
+
+def test_in_memory_store_splits_inline_provenance():
+    graphs = {"1990": {"nodes": GRAPHS["1990"]["nodes"],
+                       "edges": [dict(edge, sent_functionality=PROVENANCE[str(edge["id"])])
+                                 for edge in GRAPHS["1990"]["edges"]]}}
+    graph_store = store.InMemoryGraphStore(graphs)
+    assert all("sent_functionality" not in edge for edge in graph_store.get_graph("1990")["edges"])
+    assert graph_store.get_provenance(10, 1, 1) == {"count": 3, "sentences": PROVENANCE["10"][1:2]}
+    assert graph_store.get_provenance(99, 0, 10) is None
+    assert graph_store.get_graph("1800") is None
+    assert graph_store.count() == 1
+
+
+def test_graph_store_is_abstract():
+    with pytest.raises(TypeError):
+        store.GraphStore()
+
+
+def test_index_snapshot_is_rebuilt_for_changed_graphs(tmp_path):
+    path = str(tmp_path / "api_index.pickle")
+    graph_store = store.InMemoryGraphStore(json.loads(json.dumps(GRAPHS)))
+    built = index.load_or_build(path, graph_store.fingerprint(), graph_store.iter_graphs())
+    assert built.timeline_dates == ["1990", "1990-11"]
+    assert index.load_or_build(path, graph_store.fingerprint(), []).created == built.created
+
+    # same number of graphs, but other nodes, as after main.py --append
+    changed = json.loads(json.dumps(GRAPHS))
+    changed["1990-11"]["nodes"][0]["label"] = "reunification"
+    changed_store = store.InMemoryGraphStore(changed)
+    rebuilt = index.load_or_build(path, changed_store.fingerprint(), changed_store.iter_graphs())
+    assert rebuilt.search.query(["reunification"], []) == ["1990-11"]
+    # without a fingerprint, the snapshot is not trusted
+    assert index.load_or_build(path, None, graph_store.iter_graphs()).search.query(["reunification"], []) == []
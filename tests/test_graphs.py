@@ -0,0 +1,315 @@
+"""
+Tests of the graph construction modes of GraphManager, which have to create the same graphs as the default, in-memory
+construction. Run from the repository root with "python -m pytest tests".
+"""
+
+import argparse
+import collections
+import copy
+import json
+import os
+import re
+
+import pytest
+
+from benchmarks.corpus import createSentences, createTaggedCorpus
+from cooccurrences.cooccurrences import extract_cooccurrence_records_by_distance, select_cooccurrence_records
+from documents.Documents import DocumentCollection
+from documents.DocumentsCreator import DocumentsCreator
+from documents.Timestamps import Timestamp
+from graphs.Graph import Graph
+from graphs.GraphManager import GraphManager
+import graphs.counts as counts
+import graphs.trajectories as trajectories
+import metrics.metrics as metrics
+
+# number of highest weighted nodes kept per graph, as in main.py
+NODES_PER_GRAPH = 25
+
+INDEXED_TIMESTAMPS = [Timestamp(1990), Timestamp(1990, 3), Timestamp(1990, 3, 5), Timestamp(1990, 3, 28),
+                      Timestamp(1990, 11), Timestamp(1991), Timestamp(1991, 1), Timestamp(1995), Timestamp(1995, 7),
+                      Timestamp(1995, 7, 1)]
+
+
+def _manager(timestamps) -> GraphManager:
+    graphs = collections.defaultdict(None)
+    for timestamp in timestamps:
+        graphs[timestamp] = Graph(timestamp)
+    return GraphManager(graphs)
+
+
+def _timestamps(graphs) -> list:
+    return [str(graph.timestamp) for graph in graphs]
+
+
+def test_iter_chronological():
+    manager = _manager(reversed(INDEXED_TIMESTAMPS))
+    assert _timestamps(manager.iter_chronological()) == [str(timestamp) for timestamp in INDEXED_TIMESTAMPS]
+    assert _timestamps(manager.iter_chronological("M")) == ["1990-03", "1990-11", "1991-01", "1995-07"]
+
+
+def test_graphs_in_range():
+    manager = _manager(INDEXED_TIMESTAMPS)
+    assert _timestamps(manager.graphs_in_range(Timestamp(1990, 3), Timestamp(1995), "M")) == \
+        ["1990-03", "1990-11", "1991-01", "1995-07"]
+    assert _timestamps(manager.graphs_in_range(Timestamp(1990, 4), Timestamp(1991, 1), "M")) == ["1990-11", "1991-01"]
+    assert _timestamps(manager.graphs_in_range(Timestamp(1990, 3, 6), Timestamp(1991))) == \
+        ["1990-03-28", "1990-11", "1991", "1991-01"]
+    assert manager.graphs_in_range(Timestamp(1992), Timestamp(1994)) == []
+
+
+def test_children_and_parent():
+    manager = _manager(INDEXED_TIMESTAMPS)
+    assert _timestamps(manager.children(Timestamp(1990))) == ["1990-03", "1990-11"]
+    assert _timestamps(manager.children(Timestamp(1990, 3))) == ["1990-03-05", "1990-03-28"]
+    assert manager.children(Timestamp(1990, 3, 5)) == []
+    assert manager.children(Timestamp(1992)) == []
+    assert manager.parent(Timestamp(1990, 3, 5)).timestamp == Timestamp(1990, 3)
+    assert manager.parent(Timestamp(1995, 7)).timestamp == Timestamp(1995)
+    assert manager.parent(Timestamp(1990)) is None
+    assert manager.parent(Timestamp(1992, 1)) is None
+
+
+def test_index_follows_add_and_remove():
+    manager = _manager(INDEXED_TIMESTAMPS)
+    manager.add_graph(Graph(Timestamp(1990, 6)))
+    assert manager.remove_graph(Timestamp(1990, 11)).timestamp == Timestamp(1990, 11)
+    assert manager.remove_graph(Timestamp(1992)) is None
+    assert _timestamps(manager.children(Timestamp(1990))) == ["1990-03", "1990-06"]
+
+
+def test_index_is_rebuilt_after_direct_changes():
+    manager = _manager(INDEXED_TIMESTAMPS)
+    assert _timestamps(manager.children(Timestamp(1990))) == ["1990-03", "1990-11"]
+    # the number of graphs stays the same
+    del manager.graphs[Timestamp(1990, 11)]
+    manager.graphs[Timestamp(1990, 6)] = Graph(Timestamp(1990, 6))
+    assert _timestamps(manager.children(Timestamp(1990))) == ["1990-03", "1990-06"]
+    assert _timestamps(manager.iter_chronological("M")) == ["1990-03", "1990-06", "1991-01", "1995-07"]
+
+
+# sentences that consist of a date only, s.t. the window of size 0 around the date has no co-occurrences
+LONE_DATES = [{"id": 1, "text": '<TIMEX3 tid="t1" type="DATE" value="1960">1960</TIMEX3>. alpha beta. gamma. '
+                                '<TIMEX3 tid="t2" type="DATE" value="1990-05">May 1990</TIMEX3>. delta epsilon. '
+                                'beta <TIMEX3 tid="t3" type="DATE" value="1990-05-03">3 May 1990</TIMEX3> zeta.'},
+              {"id": 2, "text": 'alpha. <TIMEX3 tid="t4" type="DATE" value="1990">1990</TIMEX3>. gamma delta.'}]
+
+
+def _parse(corpus: list) -> DocumentCollection:
+    """
+    @return: The documents, with sentences split at periods instead of by spaCy
+    """
+    creator = DocumentsCreator.__new__(DocumentsCreator)
+    creator.tag_start = re.compile(r"<[^/].*?>")
+    creator.tag_end = re.compile(r"</.*?>")
+    return DocumentCollection([createSentences(creator.__parse_HeidelTimeTags__(doc)) for doc in copy.deepcopy(corpus)])
+
+
+def _documents(first_document: int = 0, last_document: int = 150) -> DocumentCollection:
+    """
+    @return: Documents of a synthetic corpus
+    """
+    corpus = createTaggedCorpus(150, sentences_per_document=10, words_per_sentence=5)
+    return _parse(corpus[first_document:last_document])
+
+
+def _arguments(temp_folder: str = None) -> argparse.Namespace:
+    return argparse.Namespace(window_size=1, start_year=-float("inf"), end_year=float("inf"), disable_tqdm=True,
+                              spill_records=None, heavy_hitters=None, processes=1, append=False,
+                              temp_folder=temp_folder)
+
+
+@pytest.fixture
+def args(tmp_path) -> argparse.Namespace:
+    return _arguments(str(tmp_path / "temp"))
+
+
+def _default_graphs(documents: DocumentCollection, args: argparse.Namespace) -> GraphManager:
+    # the graphs of main.py without --processes and --spill-records, before pruning
+    manager = GraphManager.from_DocumentCollection(documents, args)
+    manager.weight_graph_nodes(weighting="tf_itf_per_granularity")
+    return manager
+
+
+def _contents(manager: GraphManager) -> dict:
+    """
+    @return: Count of every node and co-occurring sentences of every edge by timestamp, independent of their ids
+    """
+    return {str(timestamp): ({node.label: node.count for node in graph.nodes()},
+                             {tuple(sorted((edge.source.label, edge.target.label))):
+                              sorted((sentence["doc_id"], tuple(sentence["sentence1"]), tuple(sentence["sentence2"]))
+                                     for sentence in edge.sent_functionality)
+                              for edge in graph.edges()})
+            for timestamp, graph in manager.graphs.items()}
+
+
+def _weights(manager: GraphManager) -> dict:
+    return {(str(timestamp), node.label): node.weight for timestamp, graph in manager.graphs.items()
+            for node in graph.nodes()}
+
+
+def _entries(entries: dict) -> dict:
+    # the order of the trajectory entries of a graph follows its nodes
+    return {str(timestamp): sorted(graph_entries) for timestamp, graph_entries in entries.items()}
+
+
+@pytest.fixture(scope="module")
+def expected() -> dict:
+    """
+    @return: Contents and trajectory entries of the weighted graphs of all documents, created by the default path, and
+    contents and weights of the pruned graphs
+    """
+    manager = _default_graphs(_documents(), _arguments())
+    result = {"contents": _contents(manager),
+              "entries": _entries({timestamp: trajectories.graph_entries(graph)
+                                   for timestamp, graph in manager.graphs.items()})}
+    manager.reduce_to_highest_weighted_nodes(NODES_PER_GRAPH)
+    result["pruned_contents"] = _contents(manager)
+    result["pruned_weights"] = _weights(manager)
+    return result
+
+
+def _assert_equal_pruned_graphs(manager: GraphManager, expected: dict) -> None:
+    assert list(_contents(manager).keys()) == list(expected["pruned_contents"].keys())
+    assert _contents(manager) == expected["pruned_contents"]
+    assert _weights(manager) == pytest.approx(expected["pruned_weights"])
+
+
+def _assert_unique_ids(manager: GraphManager) -> None:
+    node_ids = [node.id for graph in manager.graphs.values() for node in graph.nodes()]
+    edge_ids = [edge.id for graph in manager.graphs.values() for edge in graph.edges()]
+    assert len(set(node_ids)) == len(node_ids)
+    assert len(set(edge_ids)) == len(edge_ids)
+
+
+def test_parallel_graphs_equal_default_graphs(args, tmp_path, expected):
+    args.processes = 2
+    counts_folder = str(tmp_path / "counts")
+    manager, entries = GraphManager.from_DocumentCollection_in_parallel(_documents(), args, NODES_PER_GRAPH,
+                                                                        counts_folder)
+    _assert_equal_pruned_graphs(manager, expected)
+    assert _entries(entries) == expected["entries"]
+    _assert_unique_ids(manager)
+
+    # the raw counts stored by the workers have the ids of the graphs
+    stored = GraphManager.from_counts([counts_folder])
+    _assert_unique_ids(stored)
+    stored_ids = {edge.id: (str(timestamp), edge.source.label, edge.target.label)
+                  for timestamp, graph in stored.graphs.items() for edge in graph.edges()}
+    assert all(stored_ids[edge.id] == (str(timestamp), edge.source.label, edge.target.label)
+               for timestamp, graph in manager.graphs.items() for edge in graph.edges())
+
+
+def test_spilled_graphs_equal_default_graphs(args, tmp_path, expected):
+    # a small buffer, s.t. the co-occurrences are spilled in many runs
+    args.spill_records = 5000
+    counts_folder = str(tmp_path / "counts")
+    metrics.configure()
+    manager, entries = GraphManager.from_DocumentCollection_in_runs(_documents(), args, NODES_PER_GRAPH, counts_folder)
+    assert metrics.report()["counters"]["spilled_runs"] > 10
+    _assert_equal_pruned_graphs(manager, expected)
+    assert _entries(entries) == expected["entries"]
+    _assert_unique_ids(manager)
+    # the raw counts are stored before pruning, and the runs are deleted
+    assert _contents(GraphManager.from_counts([counts_folder])) == expected["contents"]
+    assert os.listdir(args.temp_folder) == []
+
+
+@pytest.mark.parametrize("spill_records", [None, 5000])
+def test_appended_graphs_equal_graphs_of_all_documents(args, tmp_path, expected, spill_records):
+    counts_folder = str(tmp_path / "counts")
+    first = _default_graphs(_documents(0, 75), args)
+    counts.save_counts(first.graphs, counts_folder)
+    first.reduce_to_highest_weighted_nodes(NODES_PER_GRAPH)
+    state = counts.new_state(args)
+    counts.changed_graphs(first.create_graphs_json(), state)
+
+    args.spill_records = spill_records
+    manager = GraphManager.from_counts([counts_folder])
+    changed_timestamps = manager.merge_DocumentCollection(_documents(75, 150), args)
+    assert _contents(manager) == expected["contents"]
+    # the graphs of all windows of the appended documents
+    assert changed_timestamps == set(_default_graphs(_documents(75, 150), args).graphs.keys())
+
+    manager.weight_graph_nodes(weighting="tf_itf_per_granularity")
+    manager.reduce_to_highest_weighted_nodes(NODES_PER_GRAPH)
+    _assert_equal_pruned_graphs(manager, expected)
+    _assert_unique_ids(manager)
+
+    # graphs without appended documents change with the weights of their granularity as well
+    first_json = first.create_graphs_json()
+    appended_json = manager.create_graphs_json()
+    changed = counts.changed_graphs(appended_json, state)
+    assert set(str(timestamp) for timestamp in changed_timestamps) <= set(changed)
+    assert set(changed) == set(timestamp for timestamp, graph in appended_json.items()
+                               if first_json.get(timestamp) != graph)
+    assert counts.changed_graphs(appended_json, state) == []
+
+
+def test_update_files_hold_the_changed_graphs(args, tmp_path):
+    pytest.importorskip("python_heideltime")
+    import main
+
+    args.output = str(tmp_path)
+    counts_folder = str(tmp_path / "counts")
+    state = counts.new_state(args)
+    main.store_graphs(GraphManager.from_DocumentCollection(_documents(0, 75), args), args, state)
+    with open(os.path.join(args.output, "timecentricgraphs.json"), "r") as f:
+        first_json = json.load(f)
+
+    args.append = True
+    state = counts.load_state(counts_folder, args)
+    manager = GraphManager.from_counts([counts_folder])
+    changed_timestamps = manager.merge_DocumentCollection(_documents(75, 150), args)
+    main.store_graphs(manager, args, state, changed_timestamps)
+
+    outputs = {}
+    for name in ("timecentricgraphs", "timecentricprovenance", "timecentricgraphs_update",
+                 "timecentricprovenance_update"):
+        with open(os.path.join(args.output, name + ".json"), "r") as f:
+            outputs[name] = json.load(f)
+    graphs_json = outputs["timecentricgraphs"]
+    assert outputs["timecentricgraphs_update"] == {timestamp: graph for timestamp, graph in graphs_json.items()
+                                                   if first_json.get(timestamp) != graph}
+    assert outputs["timecentricprovenance_update"] == \
+        {str(edge["id"]): outputs["timecentricprovenance"][str(edge["id"])]
+         for graph in outputs["timecentricgraphs_update"].values() for edge in graph["edges"]}
+    assert outputs["timecentricgraphs_update"]
+
+
+def test_merged_shard_counts_equal_graphs_of_all_documents(args, tmp_path, expected):
+    # disjoint shards of the documents, as created by mapreduce.py
+    folders = []
+    for shard in range(2):
+        documents = _documents()
+        documents.documents = [doc for doc in documents.documents if doc.idx % 2 == shard]
+        folders.append(str(tmp_path / "shard-{}".format(shard)))
+        counts.save_counts(GraphManager.from_DocumentCollection(documents, args).graphs, folders[-1])
+
+    manager = GraphManager.from_counts(folders)
+    assert _contents(manager) == expected["contents"]
+    _assert_unique_ids(manager)
+    manager.weight_graph_nodes(weighting="tf_itf_per_granularity")
+    manager.reduce_to_highest_weighted_nodes(NODES_PER_GRAPH)
+    _assert_equal_pruned_graphs(manager, expected)
+
+
+@pytest.mark.parametrize("corpus", ["synthetic", "lone dates"])
+def test_sweep_configurations_equal_single_runs(args, corpus):
+    documents = _documents() if corpus == "synthetic" else _parse(LONE_DATES)
+    # extracted once for the largest window size and all years, as by main.sweep
+    args.window_size = 2
+    timestamps, pairs, words = extract_cooccurrence_records_by_distance(documents, args)
+    pairs = sorted(pairs.items())
+    words = sorted(words.items())
+
+    for window_size, start_year, end_year in [(0, -float("inf"), float("inf")), (1, -float("inf"), float("inf")),
+                                              (2, -float("inf"), 1949), (1, 1950, float("inf"))]:
+        manager = GraphManager.from_cooccurrence_records(
+            *select_cooccurrence_records(timestamps, pairs, words, window_size, start_year, end_year))
+        single_args = copy.copy(args)
+        single_args.window_size = window_size
+        single_args.start_year = start_year
+        single_args.end_year = end_year
+        expected = GraphManager.from_DocumentCollection(documents, single_args)
+        assert _contents(manager) == _contents(expected), (window_size, start_year, end_year)